@@ -1,2 +1,2 @@
 # noinspection PyUnresolvedReferences
-from pycubexr.parsers import CubexParser
+from pycubexr.parsers import CubexParser, AsyncCubexParser, load_experiments
@@ -1,7 +1,10 @@
+from pycubexr.classes.call_tree import CallTree
 from pycubexr.classes.cnode import CNode
 from pycubexr.classes.location import Location
 from pycubexr.classes.location_group import LocationGroup
+from pycubexr.classes.system_tree_node import SystemTreeNode
+from pycubexr.classes.location_table import LocationTable
 from pycubexr.classes.metric import Metric
 from pycubexr.classes.metric_values import MetricValues
+from pycubexr.classes.lazy_metric_values import LazyMetricValues
 from pycubexr.classes.region import Region
-from pycubexr.classes.system_tree_node import SystemTreeNode
@@ -0,0 +1,216 @@
+from typing import List, Dict, Any, Optional, Iterator
+
+import numpy as np
+
+from pycubexr.classes.cnode import CNode
+from pycubexr.classes.region import Region
+from pycubexr.utils.caching import cached_property
+
+_ITER_CHUNK_SIZE = 1024
+
+
+class CallTree(object):
+    """
+    Array representation of the call tree. All arrays are indexed by cnode id.
+    CNode objects are views of this representation, which are created on demand.
+    """
+
+    def __init__(
+            self,
+            *,
+            parents: np.ndarray,
+            depths: np.ndarray,
+            child_ranks: np.ndarray,
+            preorder: np.ndarray,
+            enter: np.ndarray,
+            exit: np.ndarray,
+            callee_region_ids: Optional[np.ndarray] = None,
+            first_children: Optional[np.ndarray] = None,
+            next_siblings: Optional[np.ndarray] = None,
+            parameters: Optional[Dict[int, Dict[str, Any]]] = None
+    ):
+        # id of the parent cnode, -1 for root cnodes
+        self.parents = parents
+        # distance to the root cnode
+        self.depths = depths
+        # position of the cnode in the children of its parent
+        self.child_ranks = child_ranks
+        # cnode ids in pre-order (depth-first) order
+        self.preorder = preorder
+        # The subtree of a cnode occupies the positions [enter, exit) of the pre-order, -1 for unused ids
+        self.enter = enter
+        self.exit = exit
+        # id of the called region, -1 for unused ids
+        self.callee_region_ids = callee_region_ids if callee_region_ids is not None else np.full_like(parents, -1)
+        # id of the first child and the next sibling of each cnode, -1 if there is none
+        self.first_children = first_children if first_children is not None else np.full_like(parents, -1)
+        self.next_siblings = next_siblings if next_siblings is not None else np.full_like(parents, -1)
+        # parameters of the cnodes that have parameters
+        self.parameters = parameters if parameters is not None else {}
+        # regions by id, used to resolve the regions of cnodes
+        self.regions_by_id: Dict[int, Region] = {}
+        self._make_read_only()
+
+    def _make_read_only(self):
+        # the arrays are shared with the cnode views and the metrics, so writing into them would corrupt the tree
+        for array in (self.parents, self.depths, self.child_ranks, self.preorder, self.enter, self.exit,
+                      self.callee_region_ids, self.first_children, self.next_siblings):
+            array.flags.writeable = False
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # unpickled arrays are writeable again
+        self._make_read_only()
+
+    def __len__(self):
+        return len(self.parents)
+
+    @cached_property
+    def roots(self) -> np.ndarray:
+        """
+        The ids of the root cnodes.
+        """
+        return self.preorder[self.parents[self.preorder] < 0]
+
+    def cnode(self, cnode_id: int) -> Optional[CNode]:
+        """
+        :return: A view of the cnode or None if there is no cnode with the id.
+        """
+        if not 0 <= cnode_id < len(self) or self.enter[cnode_id] < 0:
+            return None
+        return CNode(self, int(cnode_id))
+
+    def children(self, cnode_id: int) -> List[int]:
+        """
+        :return: The ids of the children of the cnode in order.
+        """
+        children = []
+        child_id = self.first_children[cnode_id]
+        while child_id >= 0:
+            children.append(int(child_id))
+            child_id = self.next_siblings[child_id]
+        return children
+
+    def is_in_subtree(self, cnode_id, root_id):
+        """
+        Checks whether the cnode is part of the subtree of the root cnode. Both ids can also be arrays.
+        """
+        position = self.enter[cnode_id]
+        return (self.enter[root_id] <= position) & (position < self.exit[root_id]) & (position >= 0)
+
+    def is_ancestor(self, ancestor_id, cnode_id):
+        """
+        Checks whether the ancestor is a (transitive) parent of the cnode. Both ids can also be arrays.
+        """
+        return self.is_in_subtree(cnode_id, ancestor_id) & (np.asarray(cnode_id) != np.asarray(ancestor_id))
+
+    def iter_subtree(self, cnode_id: int) -> Iterator[int]:
+        """
+        Iterates over the ids of all cnodes in the subtree of the cnode in pre-order, starting with the cnode itself.
+        """
+        enter, exit_ = int(self.enter[cnode_id]), int(self.exit[cnode_id])
+        # converting small chunks is much faster than accessing single elements and keeps the allocations bounded
+        for start in range(enter, exit_, _ITER_CHUNK_SIZE):
+            yield from self.preorder[start:min(start + _ITER_CHUNK_SIZE, exit_)].tolist()
+
+    def subtree(self, cnode_id: int) -> np.ndarray:
+        """
+        :return: The ids of all cnodes in the subtree of the cnode in pre-order, starting with the cnode itself.
+        """
+        return self.preorder[self.enter[cnode_id]:self.exit[cnode_id]]
+
+    @cached_property
+    def levels(self) -> List[np.ndarray]:
+        """
+        The cnode ids grouped by their depth, starting with the root cnodes.
+        """
+        order = np.argsort(self.depths, kind='stable')
+        bounds = np.searchsorted(self.depths[order], np.arange(self.depths.max(initial=0) + 2))
+        return [order[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    @cached_property
+    def child_rank_groups(self) -> List[np.ndarray]:
+        """
+        The ids of all non-root cnodes grouped by their position in the children of their parent.
+        Each group contains at most one child of each parent.
+        """
+        non_roots = np.flatnonzero(self.parents >= 0)
+        ranks = self.child_ranks[non_roots]
+        order = np.argsort(ranks, kind='stable')
+        bounds = np.searchsorted(ranks[order], np.arange(ranks.max(initial=-1) + 2))
+        return [non_roots[order[start:end]] for start, end in zip(bounds, bounds[1:])]
+
+    def __repr__(self):
+        return 'CallTree<{} cnodes>'.format(len(self))
+
+
+class CallTreeBuilder(object):
+    """
+    Builds a CallTree from the cnodes in pre-order. Each cnode is started, then its subtree is added and then it
+    is ended, which matches the order of the start and end tags in the anchor.xml file.
+    """
+
+    def __init__(self):
+        # the lists are indexed by the pre-order position
+        self._ids: List[int] = []
+        self._callee_region_ids: List[int] = []
+        self._parents: List[int] = []
+        self._depths: List[int] = []
+        self._child_ranks: List[int] = []
+        self._exits: List[int] = []
+        self._next_siblings: List[int] = []
+        self._first_children: List[int] = []
+        self._parameters: Dict[int, Dict[str, Any]] = {}
+        # [position, number of children, position of the last child] of the open cnodes, starting with a virtual root
+        self._stack = [[-1, 0, -1]]
+
+    def start_cnode(self, cnode_id: int, callee_region_id: int):
+        position = len(self._ids)
+        parent_frame = self._stack[-1]
+        parent_position, rank, previous_sibling = parent_frame
+        self._ids.append(cnode_id)
+        self._callee_region_ids.append(callee_region_id)
+        self._parents.append(self._ids[parent_position] if parent_position >= 0 else -1)
+        self._depths.append(len(self._stack) - 1)
+        self._child_ranks.append(rank)
+        self._exits.append(-1)
+        self._next_siblings.append(-1)
+        self._first_children.append(-1)
+        if previous_sibling >= 0:
+            self._next_siblings[previous_sibling] = cnode_id
+        elif parent_position >= 0:
+            self._first_children[parent_position] = cnode_id
+        parent_frame[1] = rank + 1
+        parent_frame[2] = position
+        self._stack.append([position, 0, -1])
+
+    def add_parameter(self, key: str, value: Any):
+        position = self._stack[-1][0]
+        self._parameters.setdefault(self._ids[position], {})[key] = value
+
+    def end_cnode(self):
+        position = self._stack.pop()[0]
+        self._exits[position] = len(self._ids)
+
+    def build(self) -> CallTree:
+        assert len(self._stack) == 1, 'not all cnodes have been ended'
+        ids = np.array(self._ids, dtype=np.int64)
+        size = int(ids.max(initial=-1)) + 1
+
+        def by_id(values, fill):
+            array = np.full(size, fill, dtype=np.int64)
+            array[ids] = values
+            return array
+
+        return CallTree(
+            parents=by_id(self._parents, -1),
+            depths=by_id(self._depths, 0),
+            child_ranks=by_id(self._child_ranks, 0),
+            preorder=ids,
+            enter=by_id(np.arange(len(ids)), -1),
+            exit=by_id(self._exits, -1),
+            callee_region_ids=by_id(self._callee_region_ids, -1),
+            first_children=by_id(self._first_children, -1),
+            next_siblings=by_id(self._next_siblings, -1),
+            parameters=self._parameters
+        )
@@ -1,40 +1,93 @@
-from typing import List, Optional
+from types import MappingProxyType
+from typing import List, Optional, Any, Iterator, Union, Mapping, TYPE_CHECKING
 
 from pycubexr.classes.region import Region
 
+if TYPE_CHECKING:
+    from pycubexr.classes.call_tree import CallTree
+
+_NO_PARAMETERS = {}
+
 
 class CNode(object):
-    _children: List['CNode']
-
-    def __init__(
-            self,
-            *,
-            _id: int,
-            callee_region_id: int
-    ):
-        self._children = []
+    """
+    A view of a single cnode of a CallTree. Views are created on demand and compare equal if they refer to the same
+    cnode of the same call tree.
+    """
+    __slots__ = ('_call_tree', 'id')
+
+    def __init__(self, call_tree: Optional['CallTree'], _id: int):
+        self._call_tree = call_tree
         self.id = _id
-        self.callee_region_id = callee_region_id
-        self.region: Optional[Region] = None
-        self.parameters = {}
-        self.parent: Optional['CNode'] = None
 
-    def get_children(self):
-        return self._children
+    @property
+    def callee_region_id(self) -> int:
+        return int(self._call_tree.callee_region_ids[self.id])
+
+    @property
+    def region(self) -> Optional[Region]:
+        return self._call_tree.regions_by_id.get(self.callee_region_id)
+
+    @property
+    def parameters(self) -> Mapping[str, Any]:
+        """
+        The parameters of the cnode, read-only, because they are stored in the call tree.
+        """
+        return MappingProxyType(self._call_tree.parameters.get(self.id, _NO_PARAMETERS))
+
+    @property
+    def parent(self) -> Optional['CNode']:
+        parent_id = self._call_tree.parents[self.id]
+        if parent_id < 0:
+            return None
+        return CNode(self._call_tree, int(parent_id))
 
     def add_child(self, child: 'CNode'):
-        self._children.append(child)
+        raise TypeError('CNodes are read-only views of a CallTree, build call trees with a CallTreeBuilder instead.')
+
+    def get_children(self) -> List['CNode']:
+        return [CNode(self._call_tree, child_id) for child_id in self._call_tree.children(self.id)]
 
     def get_all_children(self, with_self=True) -> List['CNode']:
-        cnodes = []
-        if with_self:
-            cnodes.append(self)
-        for child in self._children:
-            cnodes += child.get_all_children()
-        return cnodes
+        subtree = self._call_tree.subtree(self.id).tolist()
+        if not with_self:
+            subtree = subtree[1:]
+        return [CNode(self._call_tree, cnode_id) for cnode_id in subtree]
+
+    def iter_subtree(self, with_self=True) -> Iterator['CNode']:
+        """
+        Iterates over the subtree of the cnode in pre-order without creating intermediate lists.
+        """
+        cnode_ids = self._call_tree.iter_subtree(self.id)
+        if not with_self:
+            next(cnode_ids)
+        for cnode_id in cnode_ids:
+            yield CNode(self._call_tree, cnode_id)
+
+    def __eq__(self, other):
+        return isinstance(other, CNode) and self.id == other.id and self._call_tree is other._call_tree
+
+    def __hash__(self):
+        return hash(self.id)
 
     def __repr__(self):
-        if self.region is None:
-            return f'CNode<{self.id}, region_id:{self.callee_region_id}, children:{self._children}>'
-        else:
-            return f'CNode<{self.id}, region:<{self.callee_region_id}, {self.region.name}>, children:{self._children}>'
+        # built iteratively, so that deep call trees do not exceed the recursion limit
+        parts = []
+        stack: List[Union['CNode', str]] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            region = item.region
+            if region is None:
+                parts.append(f'CNode<{item.id}, region_id:{item.callee_region_id}, children:[')
+            else:
+                parts.append(f'CNode<{item.id}, region:<{item.callee_region_id}, {region.name}>, children:[')
+            stack.append(']>')
+            children = item.get_children()
+            for i, child in enumerate(reversed(children)):
+                stack.append(child)
+                if i < len(children) - 1:
+                    stack.append(', ')
+        return ''.join(parts)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+import numpy as np
+
+from pycubexr.classes.call_tree import CallTree
+from pycubexr.classes.location_table import LocationTable, Level, Operation, LocationSelection
+from pycubexr.classes.metric import Metric
+from pycubexr.classes.metric_values import MetricValues, _nbytes
+from pycubexr.classes.values import CubeValues
+
+if TYPE_CHECKING:
+    from pycubexr.parsers.data_parser import CompressedData
+
+
+class LazyMetricValues(MetricValues):
+    """
+    Metric values of compressed data, which only inflates the segments of the cnodes that are accessed.
+    Accessing values inflates all segments at once.
+    """
+
+    def __init__(
+            self,
+            *,
+            metric: Metric,
+            cnode_indices: Union[List[int], np.ndarray],
+            compressed_data: CompressedData,
+            max_workers: Optional[int] = None,
+            call_tree: Optional[CallTree] = None,
+            location_table: Optional[LocationTable] = None
+    ):
+        assert len(compressed_data) == len(cnode_indices)
+        super().__init__(
+            metric=metric,
+            cnode_indices=cnode_indices,
+            values=None,
+            call_tree=call_tree,
+            location_table=location_table
+        )
+        self._compressed_data = compressed_data
+        self._max_workers = max_workers
+        self._segment_values: Dict[int, object] = {}
+        self._values = None
+        # the sizes are tracked when segments are inflated, so that nbytes does not iterate over all segments
+        self._compressed_nbytes = sum(segment.nbytes for segment in compressed_data.segments)
+        self._segment_nbytes = 0
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = self._compressed_data.all_values(self._max_workers)
+            self._segment_values.clear()
+            self._segment_nbytes = 0
+        return self._values
+
+    def reduce_locations(self, level: Level = 0, op: Operation = 'sum') -> MetricValues:
+        """
+        Reduces the values like MetricValues.reduce_locations, but inflates and reduces one segment at a time, so
+        that the values of all locations are never held in memory at once.
+        """
+        if self._values is not None:
+            return super().reduce_locations(level, op)
+        return self._with_values(self._map_segments(lambda values: self._reduce_rows(values, level, op)))
+
+    def select_locations(self, locations: LocationSelection) -> MetricValues:
+        """
+        Selects the locations like MetricValues.select_locations, but inflates and compacts one segment at a time.
+        """
+        if self._values is not None:
+            return super().select_locations(locations)
+        location_table = self._require_location_table()
+        positions = location_table.positions(locations)
+        return self._with_values(self._map_segments(lambda values: values[positions]),
+                                 location_table.subset(positions))
+
+    def _map_segments(self, function):
+        # applies the function to the values of each segment and stacks the results to a (cnodes x columns) matrix
+        def map_segment(index):
+            values = self._segment_values.get(index)
+            if values is None:
+                values = self._compressed_data.segment_values(index)
+            return function(values)
+
+        results = self._compressed_data.map_segments(map_segment, self._max_workers)
+        if results and isinstance(results[0], CubeValues):
+            return type(results[0])(np.stack([values._values for values in results]))
+        return np.stack(results)
+
+    def num_locations(self):
+        if self._num_locations is None:
+            if self._values is not None:
+                self._num_locations = len(self._values) // len(self.cnode_indices)
+            else:
+                self._num_locations = len(self._values_at(0))
+        return self._num_locations
+
+    def _values_at(self, index: int):
+        if self._values is not None:
+            return super()._values_at(index)
+        values = self._segment_values.get(index)
+        if values is None:
+            inflated = self._compressed_data.segment_values(index)
+            values = self._segment_values.setdefault(index, inflated)
+            if values is inflated:
+                self._segment_nbytes += _nbytes(values)
+        return values
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes of the compressed data and of the values that were inflated so far.
+        """
+        nbytes = self._compressed_nbytes + self._segment_nbytes
+        if self._values is not None:
+            nbytes += super().nbytes
+        return nbytes
+
+    def _dtype(self):
+        return self._compressed_data.dtype
@@ -16,9 +16,12 @@ class LocationGroup(object):
         self.type = _type
 
     def all_locations(self):
-        locations = [x for x in self._locations]
-        for location_group in self._location_groups:
-            locations += location_group.all_locations()
+        locations = []
+        stack = [self]
+        while stack:
+            location_group = stack.pop()
+            locations += location_group._locations
+            stack.extend(reversed(location_group._location_groups))
         return locations
 
     def add_location_group(self, child: 'LocationGroup'):
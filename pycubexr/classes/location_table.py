@@ -0,0 +1,233 @@
+from typing import List, Union, Tuple, Callable, Optional, Sequence
+
+import numpy as np
+
+from pycubexr.classes import Location, LocationGroup, SystemTreeNode
+
+# the levels are 'location', 'location_group', 'system_tree_node' or the depth of the system tree nodes
+Level = Union[str, int]
+# a boolean mask, a slice of positions, location ids or Location objects
+LocationSelection = Union[np.ndarray, slice, Sequence[Union[int, Location]]]
+# the operations are 'sum', 'max', 'min', 'mean' or the corresponding Python or NumPy function
+Operation = Union[str, Callable]
+
+_OPERATIONS = {
+    'sum': np.add,
+    'max': np.maximum,
+    'min': np.minimum,
+    'mean': 'mean',
+    sum: np.add,
+    max: np.maximum,
+    min: np.minimum,
+    np.sum: np.add,
+    np.max: np.maximum,
+    np.amax: np.maximum,
+    np.min: np.minimum,
+    np.amin: np.minimum,
+    np.mean: 'mean',
+}
+
+
+class LocationTable(object):
+    """
+    Columnar representation of the locations of the system tree. The location arrays are in the order of the
+    locations, which is also the order of the columns of metric values.
+    """
+
+    def __init__(
+            self,
+            *,
+            locations: List[Location],
+            ids: np.ndarray,
+            ranks: np.ndarray,
+            type_codes: np.ndarray,
+            type_names: List[str],
+            location_group_indices: np.ndarray,
+            system_tree_node_indices: np.ndarray,
+            location_groups: List[LocationGroup],
+            location_group_system_tree_node_indices: np.ndarray,
+            system_tree_nodes: List[SystemTreeNode],
+            system_tree_node_parents: np.ndarray,
+            system_tree_node_depths: np.ndarray
+    ):
+        self.locations = locations
+        self.ids = ids
+        # rank of the location, -1 if it is not an integer
+        self.ranks = ranks
+        # index of the type name in type_names
+        self.type_codes = type_codes
+        self.type_names = type_names
+        # index of the innermost location group of each location
+        self.location_group_indices = location_group_indices
+        # index of the system tree node that contains the location group of each location
+        self.system_tree_node_indices = system_tree_node_indices
+        self.location_groups = location_groups
+        self.location_group_system_tree_node_indices = location_group_system_tree_node_indices
+        # system tree nodes in pre-order, with the index of their parent (-1 for the root) and their depth
+        self.system_tree_nodes = system_tree_nodes
+        self.system_tree_node_parents = system_tree_node_parents
+        self.system_tree_node_depths = system_tree_node_depths
+        self._segments = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def type_mask(self, type_name: str) -> np.ndarray:
+        """
+        :return: A boolean mask of the locations with the type, e.g., 'thread' or 'gpu'.
+        """
+        if type_name not in self.type_names:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_codes == self.type_names.index(type_name)
+
+    def positions(self, locations: LocationSelection) -> np.ndarray:
+        """
+        Finds the positions of the selected locations in the table, which are also the columns of metric values.
+        :param locations: A boolean mask over the locations, a slice of positions, or location ids or Location
+            objects in the order in which they are selected.
+        """
+        if isinstance(locations, slice):
+            return np.arange(len(self))[locations]
+        if not isinstance(locations, np.ndarray):
+            locations = np.array([location.id if isinstance(location, Location) else location
+                                  for location in locations], dtype=np.int64)
+        if locations.dtype == bool:
+            if len(locations) != len(self):
+                raise ValueError('Expected a mask of {} locations, got {}.'.format(len(self), len(locations)))
+            return np.flatnonzero(locations)
+        locations = locations.astype(np.int64, copy=False)
+        if len(self) == 0:
+            unknown = np.ones(len(locations), dtype=bool)
+        else:
+            sorter = np.argsort(self.ids, kind='stable')
+            positions = sorter[np.minimum(np.searchsorted(self.ids, locations, sorter=sorter), len(self) - 1)]
+            unknown = self.ids[positions] != locations
+        if np.any(unknown):
+            raise KeyError('Unknown location ids: {}'.format(locations[unknown].tolist()))
+        return positions
+
+    def subset(self, positions: np.ndarray) -> 'LocationTable':
+        """
+        :return: A table of the locations at the positions, with the same groups and system tree nodes.
+        """
+        return LocationTable(
+            locations=[self.locations[position] for position in positions.tolist()],
+            ids=self.ids[positions],
+            ranks=self.ranks[positions],
+            type_codes=self.type_codes[positions],
+            type_names=self.type_names,
+            location_group_indices=self.location_group_indices[positions],
+            system_tree_node_indices=self.system_tree_node_indices[positions],
+            location_groups=self.location_groups,
+            location_group_system_tree_node_indices=self.location_group_system_tree_node_indices,
+            system_tree_nodes=self.system_tree_nodes,
+            system_tree_node_parents=self.system_tree_node_parents,
+            system_tree_node_depths=self.system_tree_node_depths
+        )
+
+    def groups(self, level: Level = 'location_group') -> Tuple[np.ndarray, list]:
+        """
+        Assigns the locations to the groups of a level.
+        :param level: 'location', 'location_group' (the innermost group of each location), 'system_tree_node' (the
+            node that contains the location group) or the depth of the system tree nodes, where each location belongs
+            to the node at that depth above it. Locations above the depth belong to no group.
+        :return: The index of the group of each location, -1 for no group, and the groups.
+        """
+        if level == 'location':
+            return np.arange(len(self)), self.locations
+        elif level == 'location_group':
+            return self.location_group_indices, self.location_groups
+        elif level == 'system_tree_node':
+            return self.system_tree_node_indices, self.system_tree_nodes
+        elif isinstance(level, (int, np.integer)) and not isinstance(level, bool) and level >= 0:
+            depths = self.system_tree_node_depths
+            ancestors = np.arange(len(self.system_tree_nodes))
+            for _ in range(int(depths.max(initial=0)) - level):
+                ancestors = np.where(depths[ancestors] > level, self.system_tree_node_parents[ancestors], ancestors)
+            at_level = np.flatnonzero(depths == level)
+            group_of_node = np.full(len(self.system_tree_nodes), -1, dtype=np.int64)
+            group_of_node[at_level] = np.arange(len(at_level))
+            return (np.where(depths[ancestors] == level, group_of_node[ancestors], -1)[self.system_tree_node_indices],
+                    [self.system_tree_nodes[i] for i in at_level.tolist()])
+        raise ValueError('Unknown level of the system tree: {!r}'.format(level))
+
+    def _segments_of(self, level: Level):
+        # the order of the locations that makes the groups contiguous, None if they already are, the start of each
+        # non-empty group and the number of locations in each group
+        if level not in self._segments:
+            group_indices, groups = self.groups(level)
+            counts = np.bincount(group_indices[group_indices >= 0], minlength=len(groups))
+            order: Optional[np.ndarray] = np.argsort(group_indices, kind='stable')
+            order = order[group_indices[order] >= 0]
+            if len(order) == len(self) and np.array_equal(order, np.arange(len(self))):
+                order = None
+            non_empty = np.flatnonzero(counts)
+            starts = (np.cumsum(counts) - counts)[non_empty]
+            self._segments[level] = order, non_empty, starts, counts
+        return self._segments[level]
+
+    def reduce(self, values: np.ndarray, level: Level = 'location_group', op: Operation = 'sum') -> np.ndarray:
+        """
+        Reduces the values of the locations of each group with a single vectorized operation per level.
+        :param values: An array whose last axis contains the values of the locations.
+        :param level: The groups of the locations, see groups.
+        :param op: 'sum', 'max', 'min' or 'mean'.
+        :return: An array whose last axis contains the values of the groups. Groups without locations are 0, or NaN
+            for the mean. Integer sums are calculated without overflows, if a sum exceeds 64 bits the result contains
+            Python integers.
+        """
+        try:
+            operation = _OPERATIONS[op]
+        except (KeyError, TypeError):
+            raise ValueError('Unknown operation: {!r}'.format(op))
+        values = np.asarray(values)
+        if values.shape[-1] != len(self):
+            raise ValueError('Expected values of {} locations, got {}.'.format(len(self), values.shape[-1]))
+        order, non_empty, starts, counts = self._segments_of(level)
+        if order is not None:
+            values = values[..., order]
+
+        shape = values.shape[:-1] + (len(counts),)
+        if operation == 'mean':
+            result = np.full(shape, np.nan)
+            if len(starts):
+                result[..., non_empty] = np.add.reduceat(values, starts, axis=-1, dtype=float) / counts[non_empty]
+        else:
+            if len(starts) and operation is np.add and np.issubdtype(values.dtype, np.integer):
+                # integer sums are calculated without overflows, like MetricValues.values_all
+                reduced = _exact_sums(values, starts)
+            elif len(starts):
+                reduced = operation.reduceat(values, starts, axis=-1)
+            else:
+                reduced = values[..., :0]
+            result = np.zeros(shape, dtype=reduced.dtype)
+            result[..., non_empty] = reduced
+        return result
+
+    def __repr__(self):
+        return 'LocationTable<{} locations, {} location groups, {} system tree nodes>'.format(
+            len(self), len(self.location_groups), len(self.system_tree_nodes))
+
+
+def _exact_sums(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Sums the segments of the last axis of integer values that begin at the starts, like np.add.reduceat, but without
+    overflows, by summing the high and the low 32 bits of the values separately. Returns an array of Python integers
+    if any sum does not fit into 64 bits.
+    """
+    signed = np.issubdtype(values.dtype, np.signedinteger)
+    values = values.astype(np.int64 if signed else np.uint64, copy=False)
+    low_sums = np.add.reduceat(values & 0xFFFF_FFFF, starts, axis=-1, dtype=np.uint64)
+    high_sums = np.add.reduceat(values >> 32, starts, axis=-1, dtype=values.dtype)
+    # carry of the low sums
+    high_sums = high_sums + (low_sums >> np.uint64(32)).astype(values.dtype)
+    low_sums &= np.uint64(0xFFFF_FFFF)
+
+    if signed:
+        fits = (high_sums >= -2 ** 31) & (high_sums < 2 ** 31)
+    else:
+        fits = high_sums < 2 ** 32
+    if np.all(fits):
+        return (high_sums << high_sums.dtype.type(32)) + low_sums.astype(values.dtype)
+    return np.frompyfunc(lambda high_sum, low_sum: (high_sum << 32) + low_sum, 2, 1)(
+        high_sums.astype(object), low_sums.astype(object))
@@ -1,5 +1,7 @@
 import warnings
-from typing import List
+from typing import List, Optional, Callable
+
+import numpy as np
 
 
 class MetricType(object):
@@ -31,23 +33,41 @@ class Metric(object):
         self.data_type = data_type
         self.units = units
         self.url = url
-        self.tree_index_to_cid_map: dict = None
+        self._tree_index_to_cid_map: Optional[np.ndarray] = None
+        # parses the call tree if the metric was parsed without it
+        self._load_call_tree: Optional[Callable[[], None]] = None
         self.childs = childs
 
+    @property
+    def tree_index_to_cid_map(self) -> Optional[np.ndarray]:
+        """
+        Maps the tree indices used in the index files to cnode ids. It is an array indexed by the tree index, older
+        versions used a dict.
+        """
+        if self._tree_index_to_cid_map is None and self._load_call_tree is not None:
+            self._load_call_tree()
+        return self._tree_index_to_cid_map
+
+    @tree_index_to_cid_map.setter
+    def tree_index_to_cid_map(self, value: Optional[np.ndarray]):
+        self._tree_index_to_cid_map = value
+        self._load_call_tree = None
+
     @property
     def tree_enumeration(self):
         warnings.warn('Accessing the tree enumeration is deprecated. Use cnode ids directly.', DeprecationWarning)
         if self.tree_index_to_cid_map is None:
             return None
-        return {cid: tid for tid, cid in self.tree_index_to_cid_map.items()}
+        return {cid: tid for tid, cid in enumerate(self.tree_index_to_cid_map.tolist())}
 
     def __repr__(self):
         return 'Metric<{}>'.format(self.__dict__)
 
     def get_all_children(self, with_self=True) -> List['Metric']:
         metrics = []
-        if with_self:
-            metrics.append(self)
-        for child in self.childs:
-            metrics += child.get_all_children()
-        return metrics
+        stack = [self]
+        while stack:
+            metric = stack.pop()
+            metrics.append(metric)
+            stack.extend(reversed(metric.childs))
+        return metrics if with_self else metrics[1:]
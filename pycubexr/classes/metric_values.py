@@ -1,12 +1,14 @@
 import logging
 import warnings
-from typing import List
+from typing import List, Union, Dict, Optional
 
 import numpy as np
 
-from pycubexr.classes import CNode, Metric
+from pycubexr.classes import CNode, Metric, CallTree, LocationTable
+from pycubexr.classes.location_table import Level, Operation, LocationSelection, _exact_sums
 from pycubexr.classes.metric import MetricType
-from pycubexr.classes.values import CubeValues
+from pycubexr.classes.values import CubeValues, MinMaxValues
+from pycubexr.utils.caching import cached_property
 from pycubexr.utils.exceptions import InvalidConversionInstructionError
 
 
@@ -16,14 +18,22 @@ class MetricValues(object):
             self,
             *,
             metric: Metric,
-            cnode_indices: List[int],
-            values: np.ndarray
+            cnode_indices: Union[List[int], np.ndarray],
+            values: Optional[np.ndarray],
+            call_tree: Optional[CallTree] = None,
+            location_table: Optional[LocationTable] = None
     ):
         self.metric = metric
-        self.values = values
-        self.cnode_indices = {cid: i for i, cid in enumerate(cnode_indices)}
-        self._num_locations = int(len(self.values) / len(self.cnode_indices))
-        assert len(self.values) % len(self.cnode_indices) == 0
+        self.cnode_indices = _index_cnodes(cnode_indices)
+        self.call_tree = call_tree
+        self.location_table = location_table
+        self._converted_matrices = {}
+        self._num_locations = None
+        # None if a subclass provides the values on demand
+        if values is not None:
+            self.values = values
+            self._num_locations = int(len(self.values) / len(self.cnode_indices))
+            assert len(self.values) % len(self.cnode_indices) == 0
 
     def num_locations(self):
         return self._num_locations
@@ -33,7 +43,7 @@ class MetricValues(object):
             warnings.warn('Calling with Cnode ID is deprecated use Cnode directly.', DeprecationWarning)
             if convert_to_inclusive or convert_to_exclusive:
                 raise InvalidConversionInstructionError('Conversion is not supported when passing a Cnode ID.')
-            cnode = CNode(_id=cnode, callee_region_id=-1)
+            cnode = CNode(self.call_tree, cnode)
         else:
             if convert_to_inclusive and convert_to_exclusive:
                 raise InvalidConversionInstructionError()
@@ -41,18 +51,28 @@ class MetricValues(object):
 
         cid = cnode.id
         if cid not in self.cnode_indices:
-            values = np.zeros(self.num_locations(), dtype=self.values.dtype)
+            values = np.zeros(self.num_locations(), dtype=self._dtype())
         else:
-            start_index = int(self.cnode_indices[cid] * self.num_locations())
-            end_index = start_index + self.num_locations()
-            values = self.values[start_index: end_index]  # creates no copy
+            values = self._values_at(self.cnode_indices[cid])
 
         must_convert = ((convert_to_exclusive and self.metric.metric_type == MetricType.INCLUSIVE)
                         or (convert_to_inclusive and self.metric.metric_type == MetricType.EXCLUSIVE))
         if must_convert:
-            values = self._convert_values(cnode, values, to_inclusive=convert_to_inclusive)
+            matrix = self._converted_matrices.get(convert_to_inclusive)
+            if matrix is not None and cid < len(matrix):
+                values = matrix[cid].copy()
+            else:
+                values = self._convert_values(cnode, values, to_inclusive=convert_to_inclusive)
         return values
 
+    def _values_at(self, index: int):
+        start_index = int(index * self.num_locations())
+        end_index = start_index + self.num_locations()
+        return self.values[start_index: end_index]  # creates no copy
+
+    def _dtype(self):
+        return self.values.dtype
+
     def location_value(self, cnode: CNode, location_id: int, convert_to_inclusive=False, convert_to_exclusive=False):
         assert location_id < self.num_locations()
         return self.cnode_values(
@@ -84,36 +104,314 @@ class MetricValues(object):
         return b
 
     def _convert_values(self, cnode: CNode, values: np.ndarray, to_inclusive: bool = True):
-        # Go over all cnode children and add the metric values
+        if to_inclusive:
+            return self._accumulate_subtree(cnode, values)
+        # Go over all cnode children and subtract their inclusive metric values
         values = values.copy()
         for child_cnode in cnode.get_children():
             child_values = self.cnode_values(child_cnode,
                                              convert_to_inclusive=True,
                                              convert_to_exclusive=False)
-            if to_inclusive:
-                values += child_values
+            if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.integer):
+                child_values = self._detect_negative_overflow(values, child_values)
+            values -= child_values
+        return values
+
+    def _accumulate_subtree(self, cnode: CNode, values: np.ndarray):
+        # Adds the inclusive values of all children to the values of the cnode, like a recursion over the children
+        # would do, but with an explicit stack, so that deep call trees do not exceed the recursion limit.
+        matrix = self._converted_matrices.get(True)
+        # each frame holds the accumulated values of a cnode and an iterator over its remaining children
+        stack = [[values.copy(), iter(cnode.get_children())]]
+        while True:
+            frame = stack[-1]
+            child = next(frame[1], None)
+            if child is None:
+                stack.pop()
+                if not stack:
+                    return frame[0]
+                stack[-1][0] += frame[0]
+            elif matrix is not None and child.id < len(matrix):
+                frame[0] += matrix[child.id]
+            else:
+                stack.append([self.cnode_values(child).copy(), iter(child.get_children())])
+
+    def as_matrix(self):
+        """
+        Returns the values as a (cnodes x locations) matrix without copying them.
+        The rows are in the order of cnode_indices, use cnode_rows to find the row of a cnode.
+        """
+        if isinstance(self.values, CubeValues):
+            return type(self.values)(self.values._values.reshape(-1, self.num_locations()))
+        return self.values.reshape(-1, self.num_locations())
+
+    @cached_property
+    def cnode_rows(self) -> np.ndarray:
+        """
+        Maps cnode ids to rows of as_matrix. Cnodes without values are mapped to -1.
+        """
+        cnode_ids = np.fromiter(self.cnode_indices, dtype=np.int64, count=len(self.cnode_indices))
+        size = max(len(self.call_tree) if self.call_tree is not None else 0, cnode_ids.max(initial=-1) + 1)
+        cnode_rows = np.full(size, -1, dtype=np.int64)
+        cnode_rows[cnode_ids] = np.arange(len(cnode_ids))
+        return cnode_rows
+
+    def take(self, cnodes=None, locations=None):
+        """
+        Selects a submatrix of the values. Cnodes without values result in rows of zeros.
+        :param cnodes: CNodes or cnode ids, all cnodes with values if None.
+        :param locations: Location indices, a slice or a boolean mask. All locations if None.
+        :return: A (cnodes x locations) matrix.
+        """
+        matrix = self.as_matrix()
+        raw_matrix = matrix._values if isinstance(matrix, CubeValues) else matrix
+        if locations is None:
+            locations = slice(None)
+        if cnodes is None:
+            result = raw_matrix[:, locations]
+        else:
+            if isinstance(cnodes, np.ndarray):
+                cnode_ids = cnodes.astype(np.int64, copy=False)
+            else:
+                cnode_ids = np.array([c.id if isinstance(c, CNode) else c for c in cnodes], dtype=np.int64)
+            cnode_rows = self.cnode_rows
+            rows = np.full(len(cnode_ids), -1, dtype=np.int64)
+            known = cnode_ids < len(cnode_rows)
+            rows[known] = cnode_rows[cnode_ids[known]]
+            if isinstance(locations, slice):
+                result = raw_matrix[rows][:, locations]
             else:
-                if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.integer):
-                    child_values = self._detect_negative_overflow(values, child_values)
-                values -= child_values
+                locations = np.asarray(locations)
+                if locations.dtype == bool:
+                    locations = np.flatnonzero(locations)
+                result = raw_matrix[np.ix_(rows, locations)]
+            result[rows < 0] = 0
+        if isinstance(matrix, CubeValues):
+            return type(matrix)(result)
+        return result
+
+    def to_inclusive_matrix(self):
+        """
+        Converts the values of all cnodes to inclusive values in a single pass over the call tree.
+        The result is cached, subsequent conversions of single cnodes are taken from it.
+        :return: A (cnodes x locations) matrix, the row of each cnode is its id.
+        """
+        return self._converted_matrix(to_inclusive=True)
+
+    def to_exclusive_matrix(self):
+        """
+        Converts the values of all cnodes to exclusive values in a single pass over the call tree.
+        The result is cached, subsequent conversions of single cnodes are taken from it.
+        :return: A (cnodes x locations) matrix, the row of each cnode is its id.
+        """
+        return self._converted_matrix(to_inclusive=False)
+
+    def _converted_matrix(self, to_inclusive: bool):
+        if to_inclusive in self._converted_matrices:
+            return self._converted_matrices[to_inclusive]
+
+        matrix, values_type = self._cnode_matrix()
+        if to_inclusive and self.metric.metric_type == MetricType.EXCLUSIVE:
+            self._accumulate_inclusive(matrix, values_type)
+        elif not to_inclusive and self.metric.metric_type == MetricType.INCLUSIVE:
+            self._accumulate_exclusive(matrix, values_type)
+
+        if values_type is not None:
+            matrix = values_type(matrix)
+        self._converted_matrices[to_inclusive] = matrix
+        return matrix
+
+    def _cnode_matrix(self):
+        # creates a (cnodes x locations) matrix, the row of each cnode is its id
+        if self.call_tree is None:
+            raise ValueError('Processing all cnodes at once requires the call tree.')
+        values_type = type(self.values) if isinstance(self.values, CubeValues) else None
+        raw_values = self.values._values if values_type is not None else self.values
+        matrix = np.zeros((len(self.call_tree), self.num_locations()), dtype=raw_values.dtype)
+        cnode_ids = np.fromiter(self.cnode_indices, dtype=np.int64, count=len(self.cnode_indices))
+        matrix[cnode_ids] = raw_values.reshape(-1, self.num_locations())
+        return matrix, values_type
+
+    def subtree_values(self, cnode: CNode):
+        """
+        Calculates the inclusive values of the cnode from prefix sums over the pre-order of the call tree.
+        After the prefix sums are calculated once, each call takes constant time.
+        Minimum and maximum values cannot be subtracted, so their inclusive values are taken from to_inclusive_matrix.
+        :return: The inclusive values of the cnode for all locations.
+        """
+        if self.metric.metric_type == MetricType.INCLUSIVE:
+            return self.cnode_values(cnode)
+        if isinstance(self.values, MinMaxValues):
+            return self.to_inclusive_matrix()[cnode.id]
+        prefix_sums = self._prefix_sums
+        values = prefix_sums[self.call_tree.exit[cnode.id]] - prefix_sums[self.call_tree.enter[cnode.id]]
+        if isinstance(self.values, CubeValues):
+            return type(self.values)(values)
         return values
 
+    @cached_property
+    def _prefix_sums(self):
+        matrix, values_type = self._cnode_matrix()
+        if values_type is not None and issubclass(values_type, MinMaxValues):
+            raise TypeError('Prefix sums are not supported for minimum and maximum values.')
+        prefix_sums = np.zeros((len(self.call_tree.preorder) + 1, matrix.shape[1]), dtype=matrix.dtype)
+        # integer overflows cancel out when subtracting the prefix sums
+        np.cumsum(matrix[self.call_tree.preorder], axis=0, out=prefix_sums[1:])
+        return prefix_sums
+
+    def _accumulate_inclusive(self, matrix: np.ndarray, values_type):
+        parents = self.call_tree.parents
+        is_min_max = values_type is not None and issubclass(values_type, MinMaxValues)
+        aggregate = values_type.agg_command if is_min_max else np.add
+        # bottom-up, so that each level adds the already inclusive values of its children
+        for level in reversed(self.call_tree.levels[1:]):
+            if is_min_max:
+                # children without values are ignored, like in MinMaxValues
+                level = level[np.any(matrix[level] != 0, axis=1)]
+            aggregate.at(matrix, parents[level], matrix[level])
+
+    def _accumulate_exclusive(self, matrix: np.ndarray, values_type):
+        parents = self.call_tree.parents
+        inclusive = matrix.copy()
+        if values_type is not None and issubclass(values_type, MinMaxValues):
+            children = np.flatnonzero(parents >= 0)
+            children = children[np.any(inclusive[children] != 0, axis=1)]
+            values_type.agg_command.at(matrix, parents[children], inclusive[children])
+        elif np.issubdtype(matrix.dtype, np.integer):
+            # each group contains at most one child per parent, which allows subtracting the children in the same
+            # order as in _convert_values while detecting overflows
+            for children in self.call_tree.child_rank_groups:
+                children_parents = parents[children]
+                parent_values = matrix[children_parents]
+                child_values = self._detect_negative_overflow(parent_values, inclusive[children])
+                matrix[children_parents] = parent_values - child_values
+        else:
+            children = np.flatnonzero(parents >= 0)
+            np.subtract.at(matrix, parents[children], inclusive[children])
+
     def value(self, cnode: CNode, convert_to_exclusive: bool = False, convert_to_inclusive: bool = False):
         res = self.cnode_values(cnode, convert_to_exclusive, convert_to_inclusive)
         sum_ = res.sum()
         if isinstance(res, np.ndarray) and np.issubdtype(res.dtype, np.integer):
             if res.max() > np.iinfo(res.dtype).max // len(res):
                 logging.info("Used overflow prevention for {0} of {1}".format(self.metric.name, cnode.region.name))
-                # Overflow prevention, really slow
-                sum_ = 0
-                for r in res:
-                    sum_ += int(r)
+                sum_ = int(_exact_row_sums(res.reshape(1, -1))[0])
 
         if isinstance(sum_, CubeValues):
             return sum_.astype(float)
         else:
             return sum_
 
+    def values_all(self, convert_to_exclusive: bool = False, convert_to_inclusive: bool = False):
+        """
+        Calculates the value of every cnode at once, like value.
+        Integer sums are calculated without overflows, if a sum exceeds 64 bits the result contains Python integers.
+        :return: An array containing the value of each cnode at the position of its id.
+        """
+        return self._rows_all(_row_sums, convert_to_exclusive, convert_to_inclusive)
+
+    def means_all(self, convert_to_exclusive: bool = False, convert_to_inclusive: bool = False):
+        """
+        Calculates the mean of every cnode at once, like mean.
+        :return: An array containing the mean of each cnode at the position of its id.
+        """
+        return self._rows_all(_row_means, convert_to_exclusive, convert_to_inclusive)
+
+    def _rows_all(self, function, convert_to_exclusive: bool, convert_to_inclusive: bool):
+        # applies the function to the (cnodes x locations) matrix of all cnodes, the row of each cnode is its id
+        if convert_to_inclusive and convert_to_exclusive:
+            raise InvalidConversionInstructionError()
+        metric_type = self.metric.metric_type
+        to_inclusive = convert_to_inclusive or (not convert_to_exclusive and metric_type == MetricType.INCLUSIVE)
+        must_convert = ((to_inclusive and metric_type == MetricType.EXCLUSIVE)
+                        or (not to_inclusive and metric_type == MetricType.INCLUSIVE))
+        if must_convert or to_inclusive in self._converted_matrices:
+            return function(self._converted_matrix(to_inclusive))
+        if self.call_tree is None:
+            raise ValueError('Processing all cnodes at once requires the call tree.')
+
+        # without a conversion, the stored values are used directly instead of copying them into a matrix of all
+        # cnodes, and only the rows of the result are scattered to the ids of the cnodes
+        matrix = self.as_matrix()
+        if isinstance(matrix, CubeValues):
+            zeros = type(matrix)(np.zeros((1, self.num_locations()), dtype=matrix._values.dtype))
+        else:
+            zeros = np.zeros((1, self.num_locations()), dtype=matrix.dtype)
+        rows, empty_row = function(matrix), function(zeros)
+        result_type = type(rows) if isinstance(rows, CubeValues) else None
+        if result_type is not None:
+            rows, empty_row = rows._values, empty_row._values
+        result = np.empty((len(self.call_tree),) + rows.shape[1:], dtype=np.result_type(empty_row, rows))
+        result[:] = empty_row
+        result[np.fromiter(self.cnode_indices, dtype=np.int64, count=len(self.cnode_indices))] = rows
+        return result_type(result) if result_type is not None else result
+
+    def aggregate(
+            self,
+            level: Level = 'location_group',
+            op: Operation = 'sum',
+            convert_to_exclusive: bool = False,
+            convert_to_inclusive: bool = False
+    ):
+        """
+        Aggregates the values of the locations along the system tree, e.g., the threads of each process.
+        :param level: 'location_group', 'system_tree_node' or the depth of the system tree nodes, see
+            LocationTable.groups. The groups are the columns of the result.
+        :param op: 'sum', 'max', 'min' or 'mean'.
+        :return: A (cnodes x groups) matrix, the row of each cnode is its id.
+        """
+        return self._rows_all(lambda matrix: self._reduce_rows(matrix, level, op), convert_to_exclusive,
+                              convert_to_inclusive)
+
+    def reduce_locations(self, level: Level = 0, op: Operation = 'sum') -> 'MetricValues':
+        """
+        Reduces the values of each cnode to one value per group of locations, by default to a single value for all
+        locations. The result has one column per group instead of one per location and no location table, so its
+        columns cannot be selected or reduced again. The groups of the columns are returned by LocationTable.groups.
+        Conversions between inclusive and exclusive values of the result are only exact for sums.
+        :param level: 'location_group', 'system_tree_node' or the depth of the system tree nodes, see
+            LocationTable.groups.
+        :param op: 'sum', 'max', 'min' or 'mean'.
+        """
+        return self._with_values(self._reduce_rows(self.as_matrix(), level, op))
+
+    def select_locations(self, locations: LocationSelection) -> 'MetricValues':
+        """
+        Creates compact metric values that only contain the selected locations. The location table of the result
+        contains the selected locations, so that their ids are preserved.
+        :param locations: A boolean mask, a slice of positions, or location ids or Location objects, see
+            LocationTable.positions.
+        """
+        location_table = self._require_location_table()
+        positions = location_table.positions(locations)
+        return self._with_values(self.take(locations=positions), location_table.subset(positions))
+
+    def _require_location_table(self) -> LocationTable:
+        if self.location_table is None:
+            raise ValueError('Selecting or aggregating the locations requires the location table, '
+                             'which reduced values do not have.')
+        return self.location_table
+
+    def _reduce_rows(self, matrix, level: Level, op: Operation):
+        location_table = self._require_location_table()
+        if isinstance(matrix, CubeValues):
+            return type(matrix)(location_table.reduce(matrix._values, level, op))
+        return location_table.reduce(matrix, level, op)
+
+    def _with_values(self, matrix, location_table: Optional[LocationTable] = None) -> 'MetricValues':
+        # metric values of the same cnodes with other columns
+        if isinstance(matrix, CubeValues):
+            values = type(matrix)(matrix._values.reshape(-1))
+        else:
+            values = matrix.reshape(-1)
+        return MetricValues(
+            metric=self.metric,
+            cnode_indices=np.fromiter(self.cnode_indices, dtype=np.int64, count=len(self.cnode_indices)),
+            values=values,
+            call_tree=self.call_tree,
+            location_table=location_table
+        )
+
     def mean(self, cnode: CNode, convert_to_exclusive: bool = False, convert_to_inclusive: bool = False):
         res = self.cnode_values(cnode, convert_to_exclusive, convert_to_inclusive).mean()
         if isinstance(res, CubeValues):
@@ -121,5 +419,52 @@ class MetricValues(object):
         else:
             return res
 
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes of the values and of the matrices that were derived from them, e.g., by conversions.
+        """
+        nbytes = _nbytes(self.values) + sum(_nbytes(matrix) for matrix in self._converted_matrices.values())
+        if '_prefix_sums' in self.__dict__:
+            nbytes += _nbytes(self.__dict__['_prefix_sums'])
+        return nbytes
+
     def __repr__(self):
         return 'MetricValues<{}>'.format(self.__dict__)
+
+
+def _nbytes(values) -> int:
+    if isinstance(values, CubeValues):
+        values = values._values
+    return getattr(values, 'nbytes', 0)
+
+
+def _row_sums(matrix):
+    if isinstance(matrix, CubeValues):
+        return matrix.sum(axis=1).astype(float)
+    if np.issubdtype(matrix.dtype, np.integer):
+        return _exact_row_sums(matrix)
+    return matrix.sum(axis=1)
+
+
+def _row_means(matrix):
+    if isinstance(matrix, CubeValues):
+        return matrix.mean(axis=1).astype(float)
+    return matrix.mean(axis=1)
+
+
+def _exact_row_sums(matrix: np.ndarray) -> np.ndarray:
+    """
+    Sums the rows of an integer matrix without overflows, see location_table._exact_sums.
+    Returns an array of Python integers if any sum does not fit into 64 bits.
+    """
+    if matrix.shape[1] == 0:
+        return np.zeros(len(matrix), dtype=np.int64 if np.issubdtype(matrix.dtype, np.signedinteger) else np.uint64)
+    return _exact_sums(matrix, np.zeros(1, dtype=np.intp))[:, 0]
+
+
+def _index_cnodes(cnode_indices: Union[List[int], np.ndarray]) -> Dict[int, int]:
+    # maps each cnode id to its position in the values
+    if isinstance(cnode_indices, np.ndarray):
+        cnode_indices = cnode_indices.tolist()
+    return dict(zip(cnode_indices, range(len(cnode_indices))))
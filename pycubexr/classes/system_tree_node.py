@@ -24,9 +24,12 @@ class SystemTreeNode(object):
         self.attrs = attrs
 
     def all_location_groups(self) -> List[LocationGroup]:
-        location_groups = [x for x in self._location_group_children]
-        for system_tree_child in self._system_tree_node_children:
-            location_groups += system_tree_child.all_location_groups()
+        location_groups = []
+        stack = [self]
+        while stack:
+            system_tree_node = stack.pop()
+            location_groups += system_tree_node._location_group_children
+            stack.extend(reversed(system_tree_node._system_tree_node_children))
         return location_groups
 
     def all_locations(self) -> List[Location]:
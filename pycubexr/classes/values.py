@@ -34,11 +34,11 @@ class CubeValues:
     def __getitem__(self, item):
         return type(self)(self._values[item])
 
-    def sum(self):
-        return type(self)(np.sum(self._values))
+    def sum(self, axis=None):
+        return type(self)(np.sum(self._values, axis=axis))
 
-    def mean(self):
-        return type(self)(np.mean(self._values))
+    def mean(self, axis=None):
+        return type(self)(np.mean(self._values, axis=axis))
 
     def astype(self, type):
         return self._values.astype(type)
@@ -92,21 +92,21 @@ class MinMaxValues(CubeValues, ABC):
 class MinValues(MinMaxValues):
     agg_command = np.minimum
 
-    def sum(self):
-        return MinValues(self._values.min())
+    def sum(self, axis=None):
+        return MinValues(self._values.min(axis=axis))
 
-    def mean(self):
-        return MinValues(self._values.min())
+    def mean(self, axis=None):
+        return MinValues(self._values.min(axis=axis))
 
 
 class MaxValues(MinMaxValues):
     agg_command = np.maximum
 
-    def sum(self):
-        return MaxValues(self._values.max())
+    def sum(self, axis=None):
+        return MaxValues(self._values.max(axis=axis))
 
-    def mean(self):
-        return MaxValues(self._values.max())
+    def mean(self, axis=None):
+        return MaxValues(self._values.max(axis=axis))
 
 
 class ComplexValues(CubeValues):
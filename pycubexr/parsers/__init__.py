@@ -1 +1,3 @@
 from pycubexr.parsers.tar_parser import CubexParser
+from pycubexr.parsers.experiment_loader import load_experiments
+from pycubexr.parsers.async_parser import AsyncCubexParser
@@ -1,88 +1,328 @@
-from typing import Dict, List
+import threading
+from typing import Dict, List, BinaryIO, Optional, Callable, ContextManager, Mapping, Iterator
 from xml.etree import ElementTree
 
-from pycubexr.classes import Metric, Region, CNode, SystemTreeNode
+import numpy as np
+
+from pycubexr.classes import Metric, Region, CNode, SystemTreeNode, CallTree, LocationTable, LocationGroup
+from pycubexr.classes.call_tree import CallTreeBuilder
 from pycubexr.classes.metric import MetricType
 from pycubexr.parsers import xml_parser_helper
+from pycubexr.parsers.xml_stream_parser import AnchorStreamParser, SECTIONS
+from pycubexr.utils.caching import cached_property
+
+
+# opens the uncompressed anchor.xml file
+AnchorSource = Callable[[], ContextManager[BinaryIO]]
 
 
 class AnchorXMLParseResult(object):
+    """
+    The contents of the anchor.xml file. Sections that are not passed to the constructor are parsed from the source
+    when they are accessed for the first time, so that only the sections that are actually used are parsed.
+    """
 
     def __init__(
             self,
             *,
-            attrs: Dict[str, str],
-            metrics: List[Metric],
-            regions: List[Region],
-            cnodes: List[CNode],
-            system_tree_nodes: List[SystemTreeNode]
+            attrs: Optional[Dict[str, str]] = None,
+            metrics: Optional[List[Metric]] = None,
+            regions: Optional[List[Region]] = None,
+            call_tree: Optional[CallTree] = None,
+            system_tree_nodes: Optional[List[SystemTreeNode]] = None,
+            source: Optional[AnchorSource] = None
     ):
-        self.attrs = attrs
-        self.metrics = metrics
-        self.regions = regions
-        self.cnodes = cnodes
-        self.system_tree_nodes = system_tree_nodes
-        self.regions_by_id = {r.id: r for r in regions}
-        self.all_cnodes = {cnode.id: cnode for root_cnode in cnodes for cnode in root_cnode.get_all_children()}
+        self._attrs = attrs
+        self._metrics = metrics
+        self._regions = regions
+        self._call_tree = call_tree
+        self._system_tree_nodes = system_tree_nodes
+        self._source = source
+        self._section_offsets: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._program_linked = False
+        self._link_sections()
+
+    @property
+    def attrs(self) -> Dict[str, str]:
+        if self._attrs is None:
+            self._load(attrs=True)
+        return self._attrs
+
+    @property
+    def metrics(self) -> List[Metric]:
+        if self._metrics is None:
+            self._load('metrics')
+        return self._metrics
+
+    @property
+    def regions(self) -> List[Region]:
+        if self._regions is None:
+            self._load('program')
+        return self._regions
+
+    @property
+    def call_tree(self) -> CallTree:
+        if self._call_tree is None:
+            self._load('program')
+        return self._call_tree
+
+    @property
+    def cnodes(self) -> List[CNode]:
+        return [CNode(self.call_tree, cnode_id) for cnode_id in self.call_tree.roots.tolist()]
+
+    @property
+    def system_tree_nodes(self) -> List[SystemTreeNode]:
+        if self._system_tree_nodes is None:
+            self._load('system')
+        return self._system_tree_nodes
+
+    @cached_property
+    def regions_by_id(self) -> Dict[int, Region]:
+        return {r.id: r for r in self.regions}
+
+    @cached_property
+    def regions_by_name(self) -> Dict[str, List[Region]]:
+        return _group_regions(self.regions, lambda r: r.name)
+
+    @cached_property
+    def regions_by_mangled_name(self) -> Dict[str, List[Region]]:
+        return _group_regions(self.regions, lambda r: r.mangled_name)
+
+    @cached_property
+    def regions_by_module(self) -> Dict[str, List[Region]]:
+        return _group_regions(self.regions, lambda r: r.mod)
+
+    @cached_property
+    def cnode_ids_by_region(self) -> Dict[int, np.ndarray]:
+        """
+        The ids of the cnodes that call each region, in pre-order. The arrays are shared and read-only.
+        """
+        cnode_ids = self.call_tree.preorder
+        region_ids = self.call_tree.callee_region_ids[cnode_ids]
+        order = np.argsort(region_ids, kind='stable')
+        unique_region_ids, starts = np.unique(region_ids[order], return_index=True)
+        sorted_cnode_ids = cnode_ids[order]
+        sorted_cnode_ids.flags.writeable = False
+        return dict(zip(unique_region_ids.tolist(), np.split(sorted_cnode_ids, starts[1:])))
+
+    @cached_property
+    def all_cnodes(self) -> Mapping[int, CNode]:
+        return _CNodeMapping(self.call_tree)
+
+    @cached_property
+    def location_table(self) -> LocationTable:
+        return _build_location_table(self.system_tree_nodes[0])
+
+    def load_all(self):
+        """
+        Parses all sections that have not been accessed yet.
+        """
+        self._load(*SECTIONS, attrs=True)
+
+    def _load(self, *sections: str, attrs: bool = False):
+        with self._lock:
+            if 'program' in sections:
+                # the tree enumerations of the metrics are created together with the call tree
+                sections += ('metrics',)
+            loaded = {'metrics': self._metrics, 'program': self._call_tree, 'system': self._system_tree_nodes}
+            sections = {section for section in sections if loaded[section] is None}
+            attrs = attrs and self._attrs is None
+            if not sections and not attrs:
+                return
+            if self._source is None:
+                raise ValueError('The anchor has no source to parse the sections from.')
+
+            with self._source() as anchor_file:
+                stream_parser = AnchorStreamParser(sections, attrs=attrs, section_offsets=self._section_offsets)
+                stream_parser.parse(anchor_file)
+            if attrs:
+                self._attrs = stream_parser.attrs or {}
+            if 'metrics' in sections:
+                self._metrics = stream_parser.metrics or []
+            if 'program' in sections:
+                self._regions = stream_parser.regions or []
+                self._call_tree = stream_parser.call_tree or CallTreeBuilder().build()
+            if 'system' in sections:
+                self._system_tree_nodes = stream_parser.system_tree_nodes or []
+            self._link_sections()
+
+    def _link_sections(self):
+        if not self._program_linked and self._call_tree is not None and self._metrics is not None:
+            assert len(self._call_tree.roots) == 1
+            _metric_tree_enumerations(self)
+            self._call_tree.regions_by_id = self.regions_by_id
+            self._program_linked = True
+        elif not self._program_linked and self._metrics is not None and self._source is not None:
+            for metric in self._all_metrics():
+                metric._load_call_tree = self._load_program
+        if self._system_tree_nodes is not None:
+            assert len(self._system_tree_nodes) == 1
+
+    def _load_program(self):
+        self._load('program')
+
+    def _all_metrics(self) -> List[Metric]:
+        return [metric for root_metric in self._metrics for metric in root_metric.get_all_children()]
+
+    def __getstate__(self):
+        self.load_all()
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_source'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        # unpickled arrays are writeable again
+        for metric in self._all_metrics():
+            if metric.tree_index_to_cid_map is not None:
+                metric.tree_index_to_cid_map.flags.writeable = False
 
 
 def parse_anchor_xml(root: ElementTree):
-    result = AnchorXMLParseResult(
+    return AnchorXMLParseResult(
         attrs=xml_parser_helper.parse_attrs(root),
         metrics=xml_parser_helper.parse_metrics(root),
         regions=xml_parser_helper.parse_regions(root),
-        cnodes=xml_parser_helper.parse_cnodes(root),
+        call_tree=xml_parser_helper.parse_call_tree(root),
         system_tree_nodes=xml_parser_helper.parse_system_tree_nodes(root),
     )
-    assert len(result.cnodes) == 1
-    assert len(result.system_tree_nodes) == 1
-
-    _metric_tree_enumerations(result)
-    for cnode in result.all_cnodes.values():
-        cnode.region = result.regions_by_id[cnode.callee_region_id]
-    return result
-
-
-def _wide_enumeration(root_list: List[CNode]):
-    # does not implement breadth first search
-    visited = {}
-    stack = []
-    ctr = 0
-
-    for root_node in root_list:
-        visited[ctr] = root_node.id
-        ctr += 1
-        stack.append(root_node)
-        while stack:
-            node = stack.pop()
-            for child in node.get_children():
-                visited[ctr] = child.id
-                ctr += 1
-            for child in reversed(node.get_children()):
-                stack.append(child)
-    return visited
-
-
-def _deep_enumeration(root_list: List[CNode]):
-    visited = {}
-    stack = []
-    ctr = 0
-    for root_node in reversed(root_list):
-        stack.append(root_node)
-
-    while stack:
-        node = stack.pop()
-        visited[ctr] = node.id
-        ctr += 1
-        for child in reversed(node.get_children()):
-            stack.append(child)
-
-    return visited
+
+
+def parse_anchor_xml_file(anchor_file: BinaryIO):
+    """
+    Parses the anchor.xml file in a single streaming pass without building a DOM.
+    :param anchor_file: The uncompressed anchor.xml file.
+    """
+    stream_parser = AnchorStreamParser().parse(anchor_file)
+    return AnchorXMLParseResult(
+        attrs=stream_parser.attrs or {},
+        metrics=stream_parser.metrics or [],
+        regions=stream_parser.regions or [],
+        call_tree=stream_parser.call_tree or CallTreeBuilder().build(),
+        system_tree_nodes=stream_parser.system_tree_nodes or [],
+    )
+
+
+def parse_anchor_xml_lazily(source: AnchorSource):
+    """
+    Creates a result that parses each section of the anchor.xml file when it is accessed for the first time.
+    :param source: Opens the uncompressed anchor.xml file, it is called once for each parsed section.
+    """
+    return AnchorXMLParseResult(source=source)
+
+
+def _group_regions(regions: List[Region], key: Callable[[Region], str]) -> Dict[str, List[Region]]:
+    groups = {}
+    for region in regions:
+        groups.setdefault(key(region), []).append(region)
+    return groups
+
+
+def _build_location_table(root: SystemTreeNode) -> LocationTable:
+    # visits the locations in the same order as SystemTreeNode.all_locations
+    locations = []
+    location_group_indices = []
+    location_groups = []
+    location_group_system_tree_node_indices = []
+    system_tree_nodes = []
+    system_tree_node_parents = []
+    system_tree_node_depths = []
+    system_tree_node_stack = [(root, -1, 0)]
+    while system_tree_node_stack:
+        system_tree_node, parent, depth = system_tree_node_stack.pop()
+        system_tree_node_index = len(system_tree_nodes)
+        system_tree_nodes.append(system_tree_node)
+        system_tree_node_parents.append(parent)
+        system_tree_node_depths.append(depth)
+        location_group_stack: List[LocationGroup] = list(reversed(system_tree_node._location_group_children))
+        while location_group_stack:
+            location_group = location_group_stack.pop()
+            location_group_system_tree_node_indices.append(system_tree_node_index)
+            location_group_indices += [len(location_groups)] * len(location_group._locations)
+            location_groups.append(location_group)
+            locations += location_group._locations
+            location_group_stack.extend(reversed(location_group._location_groups))
+        system_tree_node_stack.extend((child, system_tree_node_index, depth + 1)
+                                      for child in reversed(system_tree_node._system_tree_node_children))
+
+    type_names: List[str] = []
+    type_codes: Dict[str, int] = {}
+    for location in locations:
+        if location.type not in type_codes:
+            type_codes[location.type] = len(type_names)
+            type_names.append(location.type)
+
+    location_group_indices = np.array(location_group_indices, dtype=np.int64)
+    location_group_system_tree_node_indices = np.array(location_group_system_tree_node_indices, dtype=np.int64)
+    return LocationTable(
+        locations=locations,
+        ids=np.array([location.id for location in locations], dtype=np.int64),
+        ranks=np.array([_parse_rank(location.rank) for location in locations], dtype=np.int64),
+        type_codes=np.array([type_codes[location.type] for location in locations], dtype=np.int32),
+        type_names=type_names,
+        location_group_indices=location_group_indices,
+        system_tree_node_indices=location_group_system_tree_node_indices[location_group_indices],
+        location_groups=location_groups,
+        location_group_system_tree_node_indices=location_group_system_tree_node_indices,
+        system_tree_nodes=system_tree_nodes,
+        system_tree_node_parents=np.array(system_tree_node_parents, dtype=np.int64),
+        system_tree_node_depths=np.array(system_tree_node_depths, dtype=np.int64)
+    )
+
+
+def _parse_rank(rank) -> int:
+    try:
+        return int(rank)
+    except (TypeError, ValueError):
+        return -1
+
+
+class _CNodeMapping(Mapping):
+    """
+    Maps cnode ids to views of the cnodes, in pre-order.
+    """
+
+    def __init__(self, call_tree: CallTree):
+        self._call_tree = call_tree
+        self._values: Optional[List[CNode]] = None
+
+    def __getitem__(self, cnode_id: int) -> CNode:
+        cnode = self._call_tree.cnode(cnode_id)
+        if cnode is None:
+            raise KeyError(cnode_id)
+        return cnode
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._call_tree.preorder.tolist())
+
+    def __len__(self):
+        return len(self._call_tree.preorder)
+
+    def values(self) -> List[CNode]:
+        # the views are created once, copy the list before modifying it
+        if self._values is None:
+            self._values = [CNode(self._call_tree, cnode_id) for cnode_id in self._call_tree.preorder.tolist()]
+        return self._values
+
+
+def _wide_enumeration(call_tree: CallTree) -> np.ndarray:
+    # Each root cnode is followed by the children of all cnodes of its subtree, where the cnodes are visited in
+    # pre-order. So the cnodes are sorted by the pre-order position of their parent and their child rank.
+    # Roots are placed before their children and after the previous subtree, whose last cnode is a leaf.
+    ids = call_tree.preorder
+    parents = call_tree.parents[ids]
+    keys = np.where(parents >= 0, 2 * call_tree.enter[parents] + 1, 2 * call_tree.enter[ids])
+    return ids[np.lexsort((call_tree.child_ranks[ids], keys))]
 
 
 def _metric_tree_enumerations(result):
-    deep_enumeration = _deep_enumeration(result.cnodes)
-    wide_enumeration = _wide_enumeration(result.cnodes)
+    # the depth-first enumeration is the pre-order of the call tree, both enumerations are shared and read-only
+    deep_enumeration = result.call_tree.preorder
+    wide_enumeration = _wide_enumeration(result.call_tree)
+    wide_enumeration.flags.writeable = False
 
     def walk_tree(childs):
         for metric in childs:
@@ -93,9 +333,3 @@ def _metric_tree_enumerations(result):
             walk_tree(metric.childs)
 
     walk_tree(result.metrics)
-
-
-def _assign_region(cnode, result):
-    cnode.region = [r for r in result.regions if r.id == cnode.callee_region_id][0]
-    for c in cnode.get_children():
-        _assign_region(c, result)
@@ -0,0 +1,195 @@
+import asyncio
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+from os import PathLike
+from typing import AsyncIterator, BinaryIO, Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
+
+from pycubexr.classes import Metric, MetricValues
+from pycubexr.classes.location_table import Level, Operation, LocationSelection
+from pycubexr.parsers.tar_parser import CubexParser
+from pycubexr.utils.exceptions import MissingMetricError
+
+
+class _SharedRequest(object):
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        # the number of callers awaiting the task
+        self.waiters = 0
+
+
+class AsyncCubexParser(object):
+    """
+    An asyncio front end of the CubexParser. Reading the archive and decompressing the metric values happen in an
+    executor, so that the event loop is never blocked. Concurrent requests for the same values share a single load,
+    and cancelling a request only cancels the load if no other request is waiting for it.
+    """
+
+    def __init__(
+            self,
+            cubex_filename: Union[str, PathLike, BinaryIO, bytes, memoryview], *,
+            executor: Optional[Executor] = None,
+            max_workers: Optional[int] = None,
+            decompression_workers: Optional[int] = 1,
+            **parser_options
+    ):
+        """
+        Creates an asynchronous parser for the specified cubex file.
+        :param cubex_filename: The cubex file, see CubexParser.
+        :param executor: The executor that loads the metric values. It must run its tasks in threads of the same
+            process, because they share the open archive. By default, a thread pool is created and shut down on exit.
+        :param max_workers: The number of threads of the default thread pool.
+        :param decompression_workers: The number of threads used to decompress the values of one metric. Requests are
+            already loaded concurrently by the executor, so each one is decompressed sequentially by default.
+        :param parser_options: Further options of the CubexParser, e.g., memory_map or disk_cache.
+        """
+        self._parser = CubexParser(cubex_filename, decompression_workers=decompression_workers, **parser_options)
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._max_workers = max_workers
+        self._requests: Dict[Hashable, _SharedRequest] = {}
+        self._running: Set[Future] = set()
+
+    @property
+    def parser(self) -> CubexParser:
+        """
+        The underlying parser. The anchor is completely parsed when entering, so accessing the metrics, the call tree
+        and the locations does not block.
+        """
+        return self._parser
+
+    async def __aenter__(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        await self._run(self._open_parser)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        for request in list(self._requests.values()):
+            request.task.cancel()
+        # loads that are already running cannot be interrupted, the archive is only closed after they are done
+        running = [asyncio.wrap_future(future) for future in list(self._running)]
+        if running:
+            await asyncio.wait(running)
+        try:
+            await self._run(self._parser.__exit__, exc_type, exc_val, exc_tb)
+        finally:
+            if self._owns_executor:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _open_parser(self):
+        self._parser.__enter__()
+        # parses the rest of the anchor and initializes the shared state before it is accessed concurrently
+        _ = (self._parser.all_metrics(), self._parser._num_locations, self._parser.get_call_tree(),
+             self._parser.get_location_table())
+
+    def get_metrics(self) -> List[Metric]:
+        return self._parser.get_metrics()
+
+    def get_metric_by_name(self, metric_name: str) -> Metric:
+        return self._parser.get_metric_by_name(metric_name)
+
+    async def get_metric_values(
+            self,
+            metric: Metric,
+            cache: bool = True, *,
+            allow_full_uint64_values: bool = False,
+            lazy: bool = False,
+            reduce: Optional[Union[Operation, Tuple[Level, Operation]]] = None,
+            locations: Optional[LocationSelection] = None
+    ) -> MetricValues:
+        """
+        Retrieves the values for the specified metric, see CubexParser.get_metric_values.
+        Concurrent requests with the same arguments share a single load.
+        """
+        key = (metric.id, cache, allow_full_uint64_values, lazy, reduce, locations)
+        try:
+            hash(key)
+        except TypeError:
+            # e.g., locations given as a mask, which cannot be compared cheaply
+            key = None
+        load = partial(self._parser.get_metric_values, metric, cache,
+                       allow_full_uint64_values=allow_full_uint64_values, lazy=lazy, reduce=reduce,
+                       locations=locations)
+        return await self._shared(key, load)
+
+    async def get_all_metric_values(
+            self,
+            metrics: Optional[Iterable[Metric]] = None, *,
+            cache: bool = True,
+            allow_full_uint64_values: bool = False,
+            lazy: bool = False,
+            reduce: Optional[Union[Operation, Tuple[Level, Operation]]] = None,
+            locations: Optional[LocationSelection] = None
+    ) -> Dict[Metric, MetricValues]:
+        """
+        Retrieves the values for multiple metrics concurrently, see CubexParser.get_all_metric_values.
+        Metrics without values in the cubex file are omitted from the result.
+        """
+        return {metric_values.metric: metric_values async for metric_values in self.iter_metric_values(
+            metrics, cache=cache, allow_full_uint64_values=allow_full_uint64_values, lazy=lazy, reduce=reduce,
+            locations=locations)}
+
+    async def iter_metric_values(
+            self,
+            metrics: Optional[Iterable[Metric]] = None, *,
+            cache: bool = True,
+            allow_full_uint64_values: bool = False,
+            lazy: bool = False,
+            reduce: Optional[Union[Operation, Tuple[Level, Operation]]] = None,
+            locations: Optional[LocationSelection] = None
+    ) -> AsyncIterator[MetricValues]:
+        """
+        Loads the values of multiple metrics concurrently and yields them in the order in which they are completed.
+        Metrics without values in the cubex file are omitted. The remaining loads are cancelled if the iteration
+        is stopped early.
+        :param metrics: The specified metrics, all metrics if None.
+        :return: The values of each metric, see get_metric_values for the other parameters.
+        """
+        if metrics is None:
+            metrics = self._parser.all_metrics()
+        tasks = [asyncio.ensure_future(self.get_metric_values(
+            metric, cache, allow_full_uint64_values=allow_full_uint64_values, lazy=lazy, reduce=reduce,
+            locations=locations)) for metric in metrics]
+        try:
+            for next_completed in asyncio.as_completed(tasks):
+                try:
+                    yield await next_completed
+                except MissingMetricError:
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _shared(self, key: Optional[Hashable], load):
+        if key is None:
+            return await self._run(load)
+        request = self._requests.get(key)
+        if request is None:
+            request = self._requests[key] = _SharedRequest(asyncio.ensure_future(self._run(load)))
+            request.task.add_done_callback(partial(self._remove_request, key, request))
+        request.waiters += 1
+        try:
+            # a cancelled caller must not cancel the load for the other callers
+            return await asyncio.shield(request.task)
+        finally:
+            request.waiters -= 1
+            if request.waiters == 0 and not request.task.done():
+                request.task.cancel()
+
+    def _remove_request(self, key: Hashable, request: _SharedRequest, _):
+        if self._requests.get(key) is request:
+            del self._requests[key]
+
+    async def _run(self, function, *args):
+        future = self._executor.submit(function, *args)
+        self._running.add(future)
+        future.add_done_callback(self._running.discard)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # the load is skipped if it has not started yet
+            future.cancel()
+            raise
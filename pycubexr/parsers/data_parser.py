@@ -1,11 +1,14 @@
 import re
 import struct
 import zlib
-from typing import List, BinaryIO, Any
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import List, BinaryIO, Any, Optional, Tuple, Union, Callable
 
 import numpy as np
 
 from pycubexr.classes.values import convert_type
+from pycubexr.utils.buffer_reader import BufferReader
 from pycubexr.utils.exceptions import UnsupportedMetricFormatError
 from pycubexr.utils.metric_formats import METRIC_FORMATS
 
@@ -21,25 +24,61 @@ def parse_data(
         # Either "<" or ">"
         endianness_format_char: str,
         allow_full_uint64_values: bool = False,
-        use_numpy=False
-) -> List[Any]:
+        use_numpy=False,
+        # (archive file name, offset of the member data in the archive, size of the member data)
+        memory_map: Optional[Tuple[Union[str, PathLike], int, int]] = None,
+        # Number of threads used to decompress compressed data, None selects the default of ThreadPoolExecutor
+        max_workers: Optional[int] = None,
+        # Returns the still compressed segments as CompressedData instead of decompressing them
+        lazy: bool = False
+) -> Union[List[Any], 'CompressedData']:
+    internal_data_type, parameters, binary_type = _get_metric_format(data_type)
+    if internal_data_type is None:
+        raise UnsupportedMetricFormatError(data_type)
+
+    dtype = np.dtype(binary_type).newbyteorder(endianness_format_char)
+
     # Verify the data file header
     header = data_file.read(len(DATA_HEADER))
     if header != DATA_HEADER:
         header = header + data_file.read(len(ZDATA_HEADER) - len(DATA_HEADER))
         assert header == ZDATA_HEADER
-        raw = decompress_data(data_file, endianness_format_char)
+        if lazy:
+            return CompressedData(
+                *_read_segments(data_file, endianness_format_char),
+                dtype=dtype,
+                internal_data_type=internal_data_type,
+                parameters=parameters,
+                allow_full_uint64_values=allow_full_uint64_values
+            )
+        raw = decompress_data(data_file, endianness_format_char, max_workers)
+        data = np.frombuffer(raw, dtype=dtype)
+    elif memory_map is not None:
+        data = _map_data(memory_map, dtype)
     else:
-        raw = data_file.read()
+        raw = _read_view(data_file)
+        data = np.frombuffer(raw, dtype=dtype)
 
-    internal_data_type, parameters, binary_type = _get_metric_format(data_type)
-    if internal_data_type is None:
-        raise UnsupportedMetricFormatError(data_type)
+    return convert_type(internal_data_type, parameters, data, allow_full_uint64_values)
 
-    dtype = np.dtype(binary_type).newbyteorder(endianness_format_char)
 
-    data = np.frombuffer(raw, dtype=dtype)
-    return convert_type(internal_data_type, parameters, data, allow_full_uint64_values)
+def _map_data(memory_map: Tuple[Union[str, PathLike], int, int], dtype: np.dtype) -> np.ndarray:
+    # Maps the uncompressed values directly from the archive, so that pages are only loaded when they are accessed
+    # and the page cache is shared between all processes reading the same file.
+    file_name, offset, size = memory_map
+    count = (size - len(DATA_HEADER)) // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    data = np.memmap(file_name, dtype=dtype, mode='r', offset=offset + len(DATA_HEADER), shape=(count,))
+    # plain ndarray view, the memmap is kept alive as its base
+    return data.view(np.ndarray)
+
+
+def _read_view(data_file: BinaryIO, size: int = -1) -> memoryview:
+    # Data in a buffer is used without copying it
+    if isinstance(data_file, BufferReader):
+        return data_file.readview(size)
+    return memoryview(data_file.read(size))
 
 
 def _get_metric_format(data_type):
@@ -64,7 +103,64 @@ def _get_metric_format(data_type):
     return data_type, parameters, metric_format
 
 
-def decompress_data(data_file: BinaryIO, endianness_format_char: str):
+def decompress_data(data_file: BinaryIO, endianness_format_char: str, max_workers: Optional[int] = None):
+    return _inflate_segments(*_read_segments(data_file, endianness_format_char), max_workers)
+
+
+def _inflate_segments(uncompressed_positions: List[int], segments: List[memoryview], max_workers: Optional[int]):
+    if not segments:
+        return bytes()
+
+    # The headers only contain the start of each uncompressed segment, so the size of the last segment is only known
+    # after inflating it. All other segments are inflated in parallel directly into their slot of the output buffer.
+    base_position = uncompressed_positions[0]
+    uncompressed_offsets = [position - base_position for position in uncompressed_positions]
+    last_segment = zlib.decompress(segments[-1])
+    uncompressed_offsets.append(uncompressed_offsets[-1] + len(last_segment))
+    if any(start > end for start, end in zip(uncompressed_offsets, uncompressed_offsets[1:])):
+        return _decompress_concatenated(segments[:-1], max_workers) + last_segment
+
+    decompressed = bytearray(uncompressed_offsets[-1])
+    output = memoryview(decompressed)
+    output[uncompressed_offsets[-2]:] = last_segment
+
+    def inflate(i):
+        # returns the inflated segment only if it does not fit into its slot
+        segment = zlib.decompress(segments[i])
+        start, end = uncompressed_offsets[i], uncompressed_offsets[i + 1]
+        if len(segment) != end - start:
+            return segment
+        output[start:end] = segment
+        return None
+
+    misfits = _map(inflate, range(len(segments) - 1), max_workers)
+    if any(segment is not None for segment in misfits):
+        # the positions in the headers do not describe the uncompressed layout, fall back to plain concatenation of
+        # the segments, which are already inflated
+        pieces = [output[start:end] if segment is None else segment
+                  for segment, start, end in zip(misfits, uncompressed_offsets, uncompressed_offsets[1:])]
+        return b''.join(pieces) + last_segment
+    return decompressed
+
+
+def _decompress_concatenated(segments: List[memoryview], max_workers: Optional[int]):
+    return b''.join(_map(zlib.decompress, segments, max_workers))
+
+
+def _map(function, items, max_workers: Optional[int]):
+    items = list(items)
+    if max_workers == 1 or len(items) < 2:
+        return [function(item) for item in items]
+    # zlib releases the GIL while inflating, so threads run in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(function, items))
+
+
+def _read_segments(data_file: BinaryIO, endianness_format_char: str) -> Tuple[List[int], List[memoryview]]:
+    """
+    Reads the segment headers and the compressed data of all non-empty segments.
+    :return: The uncompressed position and the compressed data of each segment.
+    """
     _sizeof_long_ = struct.calcsize('q')
 
     raw = data_file.read(_sizeof_long_)
@@ -75,12 +171,56 @@ def decompress_data(data_file: BinaryIO, endianness_format_char: str):
     raw_headers = struct.unpack(endianness_format_char + str(_num_infos_ * number_of_entries) + 'q', raw)
     entry_headers = (raw_headers[i:i + _num_infos_] for i in range(0, len(raw_headers), _num_infos_))
 
-    decompressed = bytes()
+    uncompressed_positions = []
+    compressed_offsets = [0]
     for uncompressed_pos, compressed_pos, compressed_size in entry_headers:
         if compressed_size == 0:
             continue
-
-        raw = data_file.read(compressed_size)
-        decompressed += zlib.decompress(raw)
-
-    return decompressed
+        uncompressed_positions.append(uncompressed_pos)
+        compressed_offsets.append(compressed_offsets[-1] + compressed_size)
+
+    compressed_data = _read_view(data_file, compressed_offsets[-1])
+    segments = [compressed_data[start:end] for start, end in zip(compressed_offsets, compressed_offsets[1:])]
+    return uncompressed_positions, segments
+
+
+class CompressedData(object):
+    """
+    The compressed segments of a data file. The CubeWriter stores one segment per cnode, which allows inflating the
+    values of single cnodes on demand.
+    """
+
+    def __init__(
+            self,
+            uncompressed_positions: List[int],
+            segments: List[memoryview],
+            *,
+            dtype: np.dtype,
+            internal_data_type: str,
+            parameters: Optional[List[str]],
+            allow_full_uint64_values: bool = False
+    ):
+        self.uncompressed_positions = uncompressed_positions
+        self.segments = segments
+        self.dtype = dtype
+        self._internal_data_type = internal_data_type
+        self._parameters = parameters
+        self._allow_full_uint64_values = allow_full_uint64_values
+
+    def __len__(self):
+        return len(self.segments)
+
+    def segment_values(self, index: int):
+        data = np.frombuffer(zlib.decompress(self.segments[index]), dtype=self.dtype)
+        return convert_type(self._internal_data_type, self._parameters, data, self._allow_full_uint64_values)
+
+    def map_segments(self, function: Callable[[int], Any], max_workers: Optional[int] = None) -> List[Any]:
+        """
+        Calls the function with the index of each segment, concurrently if more than one worker is used.
+        """
+        return _map(function, range(len(self.segments)), max_workers)
+
+    def all_values(self, max_workers: Optional[int] = None):
+        raw = _inflate_segments(self.uncompressed_positions, self.segments, max_workers)
+        data = np.frombuffer(raw, dtype=self.dtype)
+        return convert_type(self._internal_data_type, self._parameters, data, self._allow_full_uint64_values)
@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from os import PathLike
+from typing import Iterable, Optional, Callable, Any, Dict, Iterator, Tuple, Union, List
+
+from pycubexr.classes import Metric, MetricValues
+from pycubexr.parsers.tar_parser import CubexParser
+from pycubexr.utils.exceptions import MissingMetricError
+
+Reducer = Callable[[CubexParser, Metric, MetricValues], Any]
+
+
+def load_experiments(
+        paths: Iterable[Union[str, PathLike]],
+        metrics: Optional[Iterable[str]] = None,
+        reducer: Optional[Reducer] = None,
+        processes: Optional[int] = None,
+        *,
+        max_pending: Optional[int] = None,
+        allow_full_uint64_values: bool = False
+) -> Iterator[Tuple[Union[str, PathLike], Dict[str, Any]]]:
+    """
+    Loads many cubex files in a process pool and reduces the values of each metric inside the worker processes.
+    Each worker opens only one cubex file at a time and loads one metric at a time without caching it, so that only
+    the values of one metric and the reduced results of the file are held at once. There is no byte budget: the
+    memory of a worker grows with the largest metric of the files, which is loaded completely, and the memory of the
+    calling process grows with the reduced results of the pending files.
+    :param paths: The paths of the cubex files.
+    :param metrics: The names of the metrics that are loaded, all metrics if None. Metrics that are missing in a
+        file are omitted from its result.
+    :param reducer: Reduces the values of a metric to a compact result, e.g., NumPy arrays. It is called with the
+        parser, the metric and its values and must be picklable. By default, the value of each cnode is calculated
+        using MetricValues.values_all, or None if the values cannot be summed.
+    :param processes: The number of worker processes, by default the number of processors.
+        If 1, the files are loaded in the calling process.
+    :param max_pending: The maximum number of files that are processed or waiting to be collected at the same time,
+        by default twice the number of processes. It limits the number of files in flight, not their memory.
+    :param allow_full_uint64_values: Enables the usage of UINT64 values greater than 0xFFFF_FFFF_FFFF_FBFF.
+    :return: An iterator that yields the path and the reduced values, keyed by metric name, for each file in the
+        order of completion.
+    """
+    if metrics is not None:
+        metrics = list(metrics)
+    if reducer is None:
+        reducer = _values_all
+
+    if processes == 1:
+        for path in paths:
+            yield path, _load_experiment(path, metrics, reducer, allow_full_uint64_values)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * (processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        paths = iter(paths)
+        pending = {}
+        while True:
+            # only submit new files when there is capacity, so that finished results do not pile up
+            for path in paths:
+                future = executor.submit(_load_experiment, path, metrics, reducer, allow_full_uint64_values)
+                pending[future] = path
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+
+def _load_experiment(
+        path: Union[str, PathLike],
+        metric_names: Optional[List[str]],
+        reducer: Reducer,
+        allow_full_uint64_values: bool
+) -> Dict[str, Any]:
+    results = {}
+    with CubexParser(path) as cubex:
+        if metric_names is None:
+            metrics = cubex.all_metrics()
+        else:
+            metrics_by_name = {metric.name: metric for metric in cubex.all_metrics()}
+            metrics = [metrics_by_name[name] for name in metric_names if name in metrics_by_name]
+        for metric in metrics:
+            try:
+                metric_values = cubex.get_metric_values(metric, cache=False,
+                                                        allow_full_uint64_values=allow_full_uint64_values)
+            except MissingMetricError:
+                continue
+            results[metric.name] = reducer(cubex, metric, metric_values)
+    return results
+
+
+def _values_all(cubex: CubexParser, metric: Metric, metric_values: MetricValues):
+    try:
+        return metric_values.values_all()
+    except NotImplementedError:
+        return None
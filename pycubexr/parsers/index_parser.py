@@ -1,5 +1,7 @@
 import struct
-from typing import List, BinaryIO, Any
+from typing import BinaryIO
+
+import numpy as np
 
 from pycubexr.utils.exceptions import CorruptIndexError
 
@@ -8,7 +10,7 @@ INDEX_HEADER: bytes = b'CUBEX.INDEX'
 
 class IndexParseResult(object):
 
-    def __init__(self, endianness_format: str, tree_indices: List[Any]):
+    def __init__(self, endianness_format: str, tree_indices: np.ndarray):
         self.endianness_format = endianness_format
         self.tree_indices = tree_indices
 
@@ -45,9 +47,9 @@ def parse_index(index_file: BinaryIO) -> IndexParseResult:
             "The size of the index list should be equal to (size of one index value * number of nodes)."
         )
 
-    tree_indices = list(struct.unpack('{}{}i'.format(endianness_format, n_nodes), raw_index))
+    tree_indices = np.frombuffer(raw_index, dtype=np.dtype(np.int32).newbyteorder(endianness_format))
     assert len(tree_indices) > 0
-    assert index_file.peek() == b''
+    assert index_file.read(1) == b''
     return IndexParseResult(
         endianness_format=endianness_format,
         tree_indices=tree_indices
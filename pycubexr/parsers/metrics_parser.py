@@ -1,9 +1,12 @@
-from typing import BinaryIO
+from os import PathLike
+from typing import BinaryIO, Optional, Tuple, Union
 
-from pycubexr.classes import MetricValues, Metric
-from pycubexr.parsers.data_parser import parse_data
+import numpy as np
+
+from pycubexr.classes import MetricValues, Metric, LazyMetricValues, CallTree, LocationTable
+from pycubexr.parsers.data_parser import parse_data, CompressedData
 from pycubexr.parsers.index_parser import parse_index
-from pycubexr.utils.exceptions import UnsupportedMetricFormatError
+from pycubexr.utils.exceptions import UnsupportedMetricFormatError, CorruptIndexError
 
 
 def extract_metric_values(
@@ -11,7 +14,12 @@ def extract_metric_values(
         metric: Metric,
         index_file: BinaryIO,
         data_file: BinaryIO,
-        allow_full_uint64_values: bool = False
+        allow_full_uint64_values: bool = False,
+        memory_map: Optional[Tuple[Union[str, PathLike], int, int]] = None,
+        decompression_workers: Optional[int] = None,
+        lazy: bool = False,
+        call_tree: Optional[CallTree] = None,
+        location_table: Optional[LocationTable] = None
 ) -> MetricValues:
     index = parse_index(index_file=index_file)
     try:
@@ -20,12 +28,34 @@ def extract_metric_values(
             data_type=metric.data_type,
             endianness_format_char=index.endianness_format,
             allow_full_uint64_values=allow_full_uint64_values,
+            memory_map=memory_map,
+            max_workers=decompression_workers,
+            lazy=lazy
         )
     except UnsupportedMetricFormatError:
         raise UnsupportedMetricFormatError(metric.data_type, metric)
-    cnode_indices = [metric.tree_index_to_cid_map[tidx] for tidx in index.tree_indices]
+    tree_index_to_cid_map = metric.tree_index_to_cid_map
+    # negative indices would silently select other cnodes
+    if np.any((index.tree_indices < 0) | (index.tree_indices >= len(tree_index_to_cid_map))):
+        raise CorruptIndexError('The index of the metric {} contains tree indices outside of the call tree with {} '
+                                'cnodes.'.format(metric.name, len(tree_index_to_cid_map)))
+    cnode_indices = tree_index_to_cid_map[index.tree_indices]
+    if isinstance(values, CompressedData):
+        if len(values) == len(cnode_indices):
+            return LazyMetricValues(
+                metric=metric,
+                cnode_indices=cnode_indices,
+                compressed_data=values,
+                max_workers=decompression_workers,
+                call_tree=call_tree,
+                location_table=location_table
+            )
+        # segments do not correspond to cnodes
+        values = values.all_values(decompression_workers)
     return MetricValues(
         metric=metric,
         cnode_indices=cnode_indices,
-        values=values
+        values=values,
+        call_tree=call_tree,
+        location_table=location_table
     )
@@ -1,93 +1,512 @@
+import io
+import re
 import tarfile
+import threading
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
 from gzip import GzipFile
 from os import PathLike
-from tarfile import TarFile
-from typing import List, Dict, Tuple, Union
-from xml.etree import ElementTree
+from tarfile import TarFile, TarInfo
+from typing import List, Dict, Tuple, Union, Optional, Iterable, Iterator, BinaryIO
 
-from pycubexr.classes import Metric, MetricValues, Region, CNode, Location
-from pycubexr.parsers.anchor_xml_parser import parse_anchor_xml, AnchorXMLParseResult
+import numpy as np
+
+from pycubexr.classes import Metric, MetricValues, Region, CNode, Location, CallTree, LazyMetricValues, LocationTable
+from pycubexr.classes.location_table import Level, Operation, LocationSelection
+from pycubexr.classes.values import convert_type, CubeValues
+from pycubexr.parsers.anchor_xml_parser import parse_anchor_xml_lazily, parse_anchor_xml_file, AnchorXMLParseResult
+from pycubexr.parsers.data_parser import DATA_HEADER, _get_metric_format
 from pycubexr.parsers.metrics_parser import extract_metric_values
+from pycubexr.utils.buffer_reader import BufferReader
 from pycubexr.utils.caching import cached_property
 from pycubexr.utils.custom_tarinfo import TarInfoWithoutCheck
+from pycubexr.utils.disk_cache import DiskCache, DiskCacheEntry
+from pycubexr.utils.gzip_index import GzipIndex, GzipIndexedFile, GZIP_MAGIC, DEFAULT_SPACING
 from pycubexr.utils.exceptions import MissingMetricError
+from pycubexr.utils.metric_cache import MetricCache
+
+_METRIC_MEMBER_NAME = re.compile(r'(\d+)\.(index|data)')
+_NO_CNODE_IDS = np.empty(0, dtype=np.int64)
+_NO_CNODE_IDS.flags.writeable = False
 
 
 class CubexParser(object):
     _cubex_file: TarFile
-    _cubex_filename: Union[str, PathLike]
+    _cubex_filename: Union[str, PathLike, BinaryIO, bytes, memoryview]
     _anchor_result: AnchorXMLParseResult
-    _metric_values: Dict[Tuple[int, bool], MetricValues]
+    _metric_values: MetricCache
+    _tar_file_member_infos: Dict[str, TarInfo]
 
-    def __init__(self, cubex_filename: Union[str, PathLike]):
+    def __init__(
+            self,
+            cubex_filename: Union[str, PathLike, BinaryIO, bytes, memoryview], *,
+            memory_map: bool = False,
+            decompression_workers: Optional[int] = None,
+            disk_cache: Optional[DiskCache] = None,
+            gzip_checkpoint_spacing: int = DEFAULT_SPACING,
+            cache: Union[bool, MetricCache] = True
+    ):
+        """
+        Creates a parser for the specified cubex file.
+        :param cubex_filename: The path of the cubex file, a seekable binary file object, which is read from its
+            beginning and not closed by the parser, or a buffer containing the cubex file, e.g., bytes or a memoryview.
+            Uncompressed metric data is used directly from a buffer without copying it.
+        :param memory_map: Enables memory mapping of uncompressed metric data directly from the cubex file, instead of
+            reading it into memory. Only applies to uncompressed archives and uncompressed data files.
+        :param decompression_workers: The number of threads used to decompress compressed metric data.
+            By default, the number of threads depends on the number of processors.
+        :param disk_cache: Stores the parsed anchor and the decoded metric values persistently, so that reopening the
+            same cubex file only maps the cached data instead of parsing it again. Requires the path of the cubex file.
+            The cache directory must be trusted, see DiskCache.
+        :param gzip_checkpoint_spacing: The number of uncompressed bytes between the checkpoints in gzip-compressed
+            archives. Members are extracted by inflating the archive from the closest checkpoint, instead of its
+            beginning. Smaller values result in faster access and more memory for the checkpoints.
+            The checkpoints are recorded while the archive is read, so opening it inflates the whole archive once.
+            The checkpoints cannot be serialized, so they are not stored in the disk cache.
+        :param cache: The policy of the in-memory cache of the metric values, e.g., a MetricCache or an LFUMetricCache
+            with a budget of max_bytes. True caches all values until the parser is closed, False caches no values.
+            A given cache is not cleared when the parser is closed, so it can be reused by parsers of the same cubex
+            file. The keys are the ids of the metrics, so it must not be shared by parsers of different files.
+        """
         self._cubex_filename = cubex_filename
-        self._metric_values = {}
+        self._is_path = isinstance(cubex_filename, (str, PathLike))
+        self._buffer: Optional[memoryview] = None
+        if isinstance(cubex_filename, (bytes, bytearray, memoryview)):
+            self._buffer = memoryview(cubex_filename).cast('B')
+        if disk_cache is not None and not self._is_path:
+            raise ValueError('The disk cache requires the path of the cubex file.')
+        self._disk_cache = disk_cache
+        self._disk_cache_entry: Optional[DiskCacheEntry] = None
+        self._memory_map = memory_map
+        self._decompression_workers = decompression_workers
+        self._owns_metric_cache = not isinstance(cache, MetricCache)
+        if self._owns_metric_cache:
+            self._metric_values = MetricCache(None if cache else 0)
+        else:
+            self._metric_values = cache
+        self._tar_lock = threading.Lock()
+        self._gzip_checkpoint_spacing = gzip_checkpoint_spacing
+        self._gzip_file: Optional[GzipIndexedFile] = None
+        self._buffer_reader: Optional[BufferReader] = None
 
     def __enter__(self):
-        try:
-            self._cubex_file = tarfile.open(self._cubex_filename)
-        except tarfile.ReadError:
-            self._cubex_file = tarfile.open(self._cubex_filename, tarinfo=TarInfoWithoutCheck)
-
-        self._tar_file_member_list = [x.name for x in self._cubex_file.getmembers()]
+        if self._disk_cache is not None:
+            self._disk_cache_entry = self._disk_cache.entry(self._cubex_filename)
+        self._cubex_file = self._open_tar_file()
+        self._closed = False
+        # members can only be mapped or sliced if the archive itself is not compressed
+        self._is_mappable = (self._memory_map and self._is_path and self._gzip_file is None
+                             and isinstance(self._cubex_file.fileobj, io.BufferedReader))
+        self._is_sliceable = self._buffer_reader is not None and self._cubex_file.fileobj is self._buffer_reader
+
+        cached_anchor = None
+        if self._disk_cache_entry is not None:
+            cached_anchor = self._disk_cache_entry.load_object('anchor')
+        if cached_anchor is not None:
+            self._anchor_result, self._tar_file_member_infos = cached_anchor
+        else:
+            self._tar_file_member_infos = {x.name: x for x in self._cubex_file.getmembers()}
+            self._anchor_result = parse_anchor_xml_lazily(self._open_anchor)
+            if self._disk_cache_entry is not None:
+                self._disk_cache_entry.store_object('anchor', (self._anchor_result, self._tar_file_member_infos))
+        self._tar_file_member_list = list(self._tar_file_member_infos)
+        return self
 
-        with self._cubex_file.extractfile('anchor.xml') as anchor_file:
+    def _open_tar_file(self) -> TarFile:
+        if self._is_path:
+            cubex_file = open(self._cubex_filename, 'rb')
+        elif self._buffer is not None:
+            cubex_file = self._buffer_reader = BufferReader(self._buffer)
+        else:
+            cubex_file = self._cubex_filename
+            cubex_file.seek(0)
+        is_gzip = cubex_file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+        cubex_file.seek(0)
+        if not is_gzip and self._is_path:
+            cubex_file.close()
+            try:
+                return tarfile.open(self._cubex_filename)
+            except tarfile.ReadError:
+                return tarfile.open(self._cubex_filename, tarinfo=TarInfoWithoutCheck)
+
+        mode = 'r'
+        if is_gzip:
+            # Tarfile would inflate a gzip-compressed archive from its beginning for every member that is not after
+            # the previous one, so the archive is read from an indexed stream, which continues from the closest
+            # checkpoint. The checkpoints are recorded during the first pass.
+            # file objects of the caller are not closed
+            self._gzip_file = GzipIndexedFile(cubex_file, GzipIndex(self._gzip_checkpoint_spacing),
+                                              close_file=self._is_path)
+            cubex_file = io.BufferedReader(self._gzip_file)
+            mode = 'r:'
+        try:
+            try:
+                return tarfile.open(fileobj=cubex_file, mode=mode)
+            except tarfile.ReadError:
+                cubex_file.seek(0)
+                return tarfile.open(fileobj=cubex_file, mode=mode, tarinfo=TarInfoWithoutCheck)
+        except BaseException:
+            if self._gzip_file is not None:
+                self._gzip_file.close()
+                self._gzip_file = None
+            raise
+
+    @contextmanager
+    def _open_anchor(self):
+        # the sections of the anchor are parsed on demand, possibly while other threads read metric data
+        with self._tar_lock, self._open_archive() as cubex_file, \
+                cubex_file.extractfile(self._tar_file_member_infos['anchor.xml']) as anchor_file:
             xml_header = anchor_file.read(5)
             anchor_file.seek(0, 0)
             if xml_header != b"<?xml":
                 # if not starting with xml assume compressed
                 with GzipFile(fileobj=anchor_file) as compressed_anchor:
-                    anchor = ElementTree.parse(compressed_anchor)
-                    self._anchor_result = parse_anchor_xml(anchor)
+                    yield compressed_anchor
             else:
-                anchor = ElementTree.parse(anchor_file)
-                self._anchor_result = parse_anchor_xml(anchor)
-        return self
+                yield anchor_file
+
+    @contextmanager
+    def _open_archive(self):
+        if not self._closed:
+            yield self._cubex_file
+            return
+        # sections that are accessed after closing the parser are parsed from a temporarily reopened archive
+        if self._is_path:
+            open_options = {'name': self._cubex_filename}
+        elif self._buffer is not None:
+            open_options = {'fileobj': BufferReader(self._buffer)}
+        else:
+            raise ValueError('The parser is closed. The sections of the anchor that were not accessed before can only '
+                             'be parsed after closing the parser if the cubex file is given as a path or a buffer.')
+        try:
+            cubex_file = tarfile.open(**open_options)
+        except tarfile.ReadError:
+            if 'fileobj' in open_options:
+                open_options['fileobj'].seek(0)
+            cubex_file = tarfile.open(**open_options, tarinfo=TarInfoWithoutCheck)
+        with cubex_file:
+            yield cubex_file
+
+    def _extract_member(self, name: str):
+        # extracting by TarInfo avoids scanning the archive, which is necessary if the member infos come from the cache
+        return self._cubex_file.extractfile(self._tar_file_member_infos[name])
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._metric_values.clear()
-        self._cubex_file.close()
+        if self._owns_metric_cache:
+            self._metric_values.clear()
+        # sections of the anchor that are accessed later are parsed from a reopened archive, see _open_archive
+        with self._tar_lock:
+            self._closed = True
+        try:
+            self._cubex_file.close()
+            if self._gzip_file is not None:
+                self._gzip_file.close()
+        finally:
+            if self._disk_cache_entry is not None and self._disk_cache_entry.modified:
+                # evicting scans the whole cache directory, so it happens once instead of after every write
+                self._disk_cache.evict(keep=self._disk_cache_entry)
+
+    @classmethod
+    def stream(
+            cls,
+            cubex_file: Union[str, PathLike, BinaryIO, bytes, memoryview],
+            metrics: Optional[Iterable[Union[str, int]]] = None, *,
+            allow_full_uint64_values: bool = False,
+            decompression_workers: Optional[int] = None
+    ) -> Iterator[MetricValues]:
+        """
+        Reads the archive once in its stored order without seeking, e.g., from a pipe or a compressed archive, and
+        yields the values of each metric as soon as the anchor and both members of the metric have been read.
+        The values cannot be decoded without the anchor, and Cube writes anchor.xml as the last member of the archive.
+        So for files written by Cube, all values are yielded at the end and the members of the selected metrics are
+        held in memory until then. Selecting metrics by id limits the memory to the members of these metrics.
+        Selecting all metrics or any metric by name needs memory in the order of the whole archive, because the names
+        are only known from the anchor. Only archives that store the anchor first are processed incrementally.
+        :param cubex_file: The path of the cubex file, a readable binary file object or a buffer containing the cubex
+            file. The archive may be compressed with gzip, bzip2 or xz.
+        :param metrics: The names or ids of the metrics, all metrics if None.
+        :param allow_full_uint64_values: See get_metric_values.
+        :param decompression_workers: The number of threads used to decompress compressed metric data.
+        :return: The values of the metrics in the order in which they are completed. Metrics without values are
+            omitted. The values reference the call tree and the location table of the anchor.
+        """
+        selected = None if metrics is None else set(metrics)
+        # the ids of the requested metrics, None if they are only known after reading the anchor
+        metric_ids = None if selected is None or any(isinstance(m, str) for m in selected) else selected
+        anchor_result: Optional[AnchorXMLParseResult] = None
+        metrics_by_id: Dict[int, Metric] = {}
+        members: Dict[int, Dict[str, bytes]] = {}
+
+        def extract(metric_id: int) -> MetricValues:
+            metric_members = members.pop(metric_id)
+            return extract_metric_values(
+                metric=metrics_by_id[metric_id],
+                index_file=io.BytesIO(metric_members['index']),
+                data_file=io.BytesIO(metric_members['data']),
+                allow_full_uint64_values=allow_full_uint64_values,
+                decompression_workers=decompression_workers,
+                call_tree=anchor_result.call_tree,
+                location_table=anchor_result.location_table
+            )
+
+        with ExitStack() as stack:
+            if isinstance(cubex_file, (str, PathLike)):
+                cubex_file = stack.enter_context(open(cubex_file, 'rb'))
+            elif isinstance(cubex_file, (bytes, bytearray, memoryview)):
+                cubex_file = BufferReader(cubex_file)
+            # the checksums cannot be checked before reading the archive, because a stream cannot be read twice
+            tar_file = stack.enter_context(tarfile.open(fileobj=cubex_file, mode='r|*', tarinfo=TarInfoWithoutCheck))
+            for member in tar_file:
+                if member.name == 'anchor.xml':
+                    anchor = tar_file.extractfile(member).read()
+                    if not anchor.startswith(b'<?xml'):
+                        with GzipFile(fileobj=io.BytesIO(anchor)) as compressed_anchor:
+                            anchor = compressed_anchor.read()
+                    anchor_result = parse_anchor_xml_file(io.BytesIO(anchor))
+                    metrics_by_id = {metric.id: metric for root_metric in anchor_result.metrics
+                                     for metric in root_metric.get_all_children()}
+                    metric_ids = {metric.id for metric in metrics_by_id.values()
+                                  if selected is None or metric.id in selected or metric.name in selected}
+                    for metric_id in list(members):
+                        if metric_id not in metric_ids:
+                            del members[metric_id]
+                        elif len(members[metric_id]) == 2:
+                            yield extract(metric_id)
+                    continue
+
+                match = _METRIC_MEMBER_NAME.fullmatch(member.name)
+                if match is None:
+                    continue
+                metric_id, kind = int(match[1]), match[2]
+                if metric_ids is not None and metric_id not in metric_ids:
+                    continue
+                members.setdefault(metric_id, {})[kind] = tar_file.extractfile(member).read()
+                if anchor_result is not None and len(members[metric_id]) == 2:
+                    yield extract(metric_id)
 
     def get_metric_values(
             self,
             metric: Metric,
             cache: bool = True, *,
-            allow_full_uint64_values: bool = False
+            allow_full_uint64_values: bool = False,
+            lazy: bool = False,
+            reduce: Optional[Union[Operation, Tuple[Level, Operation]]] = None,
+            locations: Optional[LocationSelection] = None
     ) -> MetricValues:
         """
         Retrieves the values for the specified metric.
         :param metric: The specified metric
-        :param cache: Enables caching of the values to accelerate future accesses.
+        :param cache: Stores the values in the cache of the parser to accelerate future accesses, see __init__.
         :param allow_full_uint64_values: Enables the usage of UINT64 values greater than 0xFFFF_FFFF_FFFF_FBFF.
             Disabled by default to match the CubeLib behavior.
+        :param lazy: Defers the decompression of compressed data, so that only the values of accessed cnodes are
+            decompressed. Has no effect on uncompressed data.
+        :param reduce: Reduces the values of the locations while loading them, so that the values of all locations
+            are never held in memory at once for compressed data. Either an operation ('sum', 'max', 'min' or
+            'mean'), which reduces all locations to a single value per cnode, or a tuple of a level and an operation,
+            e.g., ('location_group', 'sum') for one value per process. See MetricValues.reduce_locations.
+        :param locations: Loads only the selected locations, given as a boolean mask, a slice of positions, or location
+            ids or Location objects. For compressed data each segment is compacted right after inflating it.
+            The location table of the result contains the selected locations. Selected values are not cached.
+            If reduce is given as well, only the selected locations are reduced.
         :return: The measured values for the specified metric.
         """
-        if (metric.id, allow_full_uint64_values) in self._metric_values:
-            return self._metric_values[metric.id, allow_full_uint64_values]
+        return self._load_metric_values(
+            metric,
+            cache,
+            allow_full_uint64_values=allow_full_uint64_values,
+            lazy=lazy,
+            decompression_workers=self._decompression_workers,
+            reduce=reduce,
+            locations=locations
+        )
+
+    def get_all_metric_values(
+            self,
+            metrics: Optional[Iterable[Metric]] = None,
+            max_workers: Optional[int] = None, *,
+            cache: bool = True,
+            allow_full_uint64_values: bool = False,
+            lazy: bool = False,
+            reduce: Optional[Union[Operation, Tuple[Level, Operation]]] = None,
+            locations: Optional[LocationSelection] = None
+    ) -> Dict[Metric, MetricValues]:
+        """
+        Retrieves the values for multiple metrics at once, using a thread pool to load the metrics concurrently.
+        Metrics without values in the cubex file are omitted from the result.
+        :param metrics: The specified metrics, all metrics if None.
+        :param max_workers: The number of threads, by default the number depends on the number of processors.
+        :param cache: Stores the values in the cache of the parser to accelerate future accesses, see __init__.
+        :param allow_full_uint64_values: Enables the usage of UINT64 values greater than 0xFFFF_FFFF_FFFF_FBFF.
+            Disabled by default to match the CubeLib behavior.
+        :param lazy: Defers the decompression of compressed data, see get_metric_values.
+        :param reduce: Reduces the values of the locations while loading them, see get_metric_values.
+        :param locations: Loads only the selected locations, see get_metric_values.
+        :return: The measured values for each of the specified metrics.
+        """
+        if metrics is None:
+            metrics = self.all_metrics()
+        metrics = list(metrics)
+        # initialize shared state before it is accessed concurrently
+        _ = self._num_locations, self._anchor_result.call_tree, self._anchor_result.location_table
+
+        def load(metric):
+            try:
+                # the metrics are already loaded in parallel, so each one is decompressed sequentially
+                return self._load_metric_values(metric, cache, allow_full_uint64_values=allow_full_uint64_values,
+                                                lazy=lazy, decompression_workers=1, reduce=reduce,
+                                                locations=locations)
+            except MissingMetricError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            all_metric_values = executor.map(load, metrics)
+            return {metric: metric_values for metric, metric_values in zip(metrics, all_metric_values)
+                    if metric_values is not None}
+
+    def _load_metric_values(
+            self,
+            metric: Metric,
+            cache: bool, *,
+            allow_full_uint64_values: bool,
+            lazy: bool,
+            decompression_workers: Optional[int],
+            reduce: Optional[Union[Operation, Tuple[Level, Operation]]] = None,
+            locations: Optional[LocationSelection] = None
+    ) -> MetricValues:
+        if reduce is not None or locations is not None:
+            return self._load_derived_metric_values(metric, cache, allow_full_uint64_values=allow_full_uint64_values,
+                                                    decompression_workers=decompression_workers, reduce=reduce,
+                                                    locations=locations)
+        metric_values = self._metric_values.get((metric.id, allow_full_uint64_values))
+        if metric_values is not None:
+            return metric_values
+        return self._read_metric_values(metric, cache, allow_full_uint64_values=allow_full_uint64_values, lazy=lazy,
+                                        decompression_workers=decompression_workers)
 
+    def _read_metric_values(
+            self,
+            metric: Metric,
+            cache: bool, *,
+            allow_full_uint64_values: bool,
+            lazy: bool,
+            decompression_workers: Optional[int]
+    ) -> MetricValues:
         index_file_name = '{}.index'.format(metric.id)
         data_file_name = '{}.data'.format(metric.id)
 
-        if index_file_name not in self._tar_file_members():
+        if index_file_name not in self._tar_file_member_infos:
             raise MissingMetricError(metric)
 
-        with self._cubex_file.extractfile(index_file_name) as index_file, \
-                self._cubex_file.extractfile(data_file_name) as data_file:
-            metric_values = extract_metric_values(
-                metric=metric,
-                index_file=index_file,
-                data_file=data_file,
-                allow_full_uint64_values=allow_full_uint64_values
-            )
-
-            assert metric_values.num_locations() == self._num_locations
-            if cache:
-                self._metric_values[metric.id, allow_full_uint64_values] = metric_values
-            return metric_values
+        if self._disk_cache_entry is not None:
+            metric_values = self._load_cached_metric_values(metric, allow_full_uint64_values)
+            if metric_values is not None:
+                if cache:
+                    self._metric_values.put((metric.id, allow_full_uint64_values), metric_values)
+                return metric_values
+
+        memory_map = None
+        if self._is_mappable:
+            data_info = self._tar_file_member_infos[data_file_name]
+            memory_map = self._cubex_filename, data_info.offset_data, data_info.size
+
+        # The members are read while holding the lock, because the tar file cannot be read concurrently.
+        # The parsing and decompression happen outside the lock.
+        with self._tar_lock:
+            with self._extract_member(index_file_name) as index_file:
+                index_file = io.BytesIO(index_file.read())
+            if self._is_sliceable:
+                # the data is used directly from the buffer of the archive
+                data_info = self._tar_file_member_infos[data_file_name]
+                data_file = BufferReader(self._buffer[data_info.offset_data:data_info.offset_data + data_info.size])
+            else:
+                with self._extract_member(data_file_name) as data_file:
+                    if memory_map is not None:
+                        header = data_file.read(len(DATA_HEADER))
+                        # only the header is needed if the data can be mapped
+                        data_file = io.BytesIO(header if header == DATA_HEADER else header + data_file.read())
+                    else:
+                        data_file = io.BytesIO(data_file.read())
+
+        metric_values = extract_metric_values(
+            metric=metric,
+            index_file=index_file,
+            data_file=data_file,
+            allow_full_uint64_values=allow_full_uint64_values,
+            memory_map=memory_map,
+            decompression_workers=decompression_workers,
+            lazy=lazy,
+            call_tree=self._anchor_result.call_tree,
+            location_table=self._anchor_result.location_table
+        )
+
+        assert metric_values.num_locations() == self._num_locations
+        if self._disk_cache_entry is not None and not isinstance(metric_values, LazyMetricValues):
+            self._store_cached_metric_values(metric_values, allow_full_uint64_values)
+        if cache:
+            self._metric_values.put((metric.id, allow_full_uint64_values), metric_values)
+        return metric_values
+
+    def _load_derived_metric_values(
+            self,
+            metric: Metric,
+            cache: bool, *,
+            allow_full_uint64_values: bool,
+            decompression_workers: Optional[int],
+            reduce: Optional[Union[Operation, Tuple[Level, Operation]]],
+            locations: Optional[LocationSelection]
+    ) -> MetricValues:
+        # selections of locations are not hashable, so only reduced values of all locations are cached
+        key = None
+        if reduce is not None:
+            level, op = reduce if isinstance(reduce, tuple) else (0, reduce)
+            if locations is None:
+                key = metric.id, allow_full_uint64_values, level, op
+                metric_values = self._metric_values.get(key)
+                if metric_values is not None:
+                    return metric_values
+        # cached values of all locations are reused, otherwise compressed data is loaded lazily, so that each segment
+        # is processed right after inflating it. A reduced request is only counted once, by the lookup of its key.
+        metric_values = self._metric_values.get((metric.id, allow_full_uint64_values), count=key is None)
+        if metric_values is None:
+            metric_values = self._read_metric_values(metric, False, allow_full_uint64_values=allow_full_uint64_values,
+                                                     lazy=True, decompression_workers=decompression_workers)
+        if locations is not None:
+            metric_values = metric_values.select_locations(locations)
+        if reduce is not None:
+            metric_values = metric_values.reduce_locations(level, op)
+        if cache and key is not None:
+            self._metric_values.put(key, metric_values)
+        return metric_values
+
+    def _load_cached_metric_values(self, metric: Metric, allow_full_uint64_values: bool) -> Optional[MetricValues]:
+        name = 'metric-{}-{}'.format(metric.id, int(allow_full_uint64_values))
+        cnode_indices = self._disk_cache_entry.load_array(name + '-cnodes', memory_map=False)
+        values = self._disk_cache_entry.load_array(name + '-values')
+        if cnode_indices is None or values is None:
+            return None
+        values = values.view(np.ndarray)
+        internal_data_type, parameters, _ = _get_metric_format(metric.data_type)
+        # the cached values are already converted, so values above the UINT64 limit are not checked again
+        return MetricValues(
+            metric=metric,
+            cnode_indices=cnode_indices,
+            values=convert_type(internal_data_type, parameters, values, allow_full_uint64_values=True),
+            call_tree=self._anchor_result.call_tree,
+            location_table=self._anchor_result.location_table
+        )
+
+    def _store_cached_metric_values(self, metric_values: MetricValues, allow_full_uint64_values: bool):
+        name = 'metric-{}-{}'.format(metric_values.metric.id, int(allow_full_uint64_values))
+        values = metric_values.values
+        if isinstance(values, CubeValues):
+            values = values._values
+        self._disk_cache_entry.store_array(name + '-values', np.asarray(values))
+        self._disk_cache_entry.store_array(name + '-cnodes', np.fromiter(metric_values.cnode_indices, dtype=np.int64))
 
     @cached_property
     def _num_locations(self):
-        return len(self.get_locations())
+        return len(self._anchor_result.location_table)
 
     def get_metrics(self):
         return self._anchor_result.metrics
@@ -119,42 +538,65 @@ class CubexParser(object):
     def get_root_cnodes(self) -> List[CNode]:
         return self._anchor_result.cnodes
 
+    def get_call_tree(self) -> CallTree:
+        return self._anchor_result.call_tree
+
     def get_region_by_name(self, name: str):
-        return [region for region in self._anchor_result.regions if region.name == name][0]
+        return self._anchor_result.regions_by_name.get(name, [])[0]
+
+    def get_regions_by_name(self, name: str) -> List[Region]:
+        return list(self._anchor_result.regions_by_name.get(name, []))
+
+    def get_regions_by_mangled_name(self, mangled_name: str) -> List[Region]:
+        return list(self._anchor_result.regions_by_mangled_name.get(mangled_name, []))
+
+    def get_regions_for_module(self, module: str) -> List[Region]:
+        return list(self._anchor_result.regions_by_module.get(module, []))
 
     def all_cnodes(self) -> List[CNode]:
         return list(self._anchor_result.all_cnodes.values())
 
+    def get_cnode_ids_for_region(self, region_id: int) -> np.ndarray:
+        """
+        :return: The ids of the cnodes that call the region, in pre-order. The array is shared and read-only.
+        """
+        return self._anchor_result.cnode_ids_by_region.get(region_id, _NO_CNODE_IDS)
+
     def get_cnodes_for_region(self, region_id: int):
-        return [cnode for cnode in self.all_cnodes() if cnode.callee_region_id == region_id]
+        call_tree = self._anchor_result.call_tree
+        return [CNode(call_tree, cnode_id) for cnode_id in self.get_cnode_ids_for_region(region_id).tolist()]
 
     def get_locations(self) -> List[Location]:
-        return self._anchor_result.system_tree_nodes[0].all_locations()
+        return list(self._anchor_result.location_table.locations)
 
-    def get_calltree(self, indent=0, cnode: CNode = None):
-        if cnode is None:
-            cnode = self._anchor_result.cnodes[0]
-        call_tree_string = ""
-        child_string = ""
-        child_string += "-" * indent + self.get_region(cnode).name
-        call_tree_string += child_string
-        call_tree_string += "\n"
+    def get_location_table(self) -> LocationTable:
+        """
+        :return: The locations as columns of ids, ranks, types, location groups and system tree nodes, in the order of
+        get_locations(). The table is built once and shared, do not modify its arrays.
+        """
+        return self._anchor_result.location_table
 
-        for child in cnode.get_children():
-            tmp = self.get_calltree(indent + 1, cnode=child)
-            if tmp is not None:
-                call_tree_string += tmp
+    def get_metric_cache(self) -> MetricCache:
+        """
+        :return: The in-memory cache of the metric values, e.g., to pin or evict metrics or to read its counters.
+        """
+        return self._metric_values
 
-        return call_tree_string
+    def get_calltree(self, indent=0, cnode: CNode = None):
+        return ''.join("-" * depth + self.get_region(c).name + "\n" for c, depth in self._walk_calltree(indent, cnode))
 
     def print_calltree(self, indent=0, cnode: CNode = None):
+        for c, depth in self._walk_calltree(indent, cnode):
+            print('\t' * depth, self.get_region(c).name)
+
+    def _walk_calltree(self, indent: int, cnode: Optional[CNode]) -> Iterator[Tuple[CNode, int]]:
+        # iterative, so that deep call trees do not exceed the recursion limit
         if cnode is None:
             cnode = self._anchor_result.cnodes[0]
-
-        print('\t' * indent, self.get_region(cnode).name)
-
-        for child in cnode.get_children():
-            self.print_calltree(indent + 1, cnode=child)
+        call_tree = self._anchor_result.call_tree
+        base_depth = call_tree.depths[cnode.id] - indent
+        for cnode_id in call_tree.iter_subtree(cnode.id):
+            yield CNode(call_tree, cnode_id), int(call_tree.depths[cnode_id] - base_depth)
 
     def _tar_file_members(self) -> List[str]:
         return self._tar_file_member_list
@@ -1,9 +1,14 @@
+from typing import Dict, List, Optional
 from xml.etree.ElementTree import Element as XMLNode, ElementTree
 
-from pycubexr.classes import CNode, Location, LocationGroup, Metric, Region, SystemTreeNode
+from pycubexr.classes import Location, LocationGroup, Metric, Region, SystemTreeNode
+from pycubexr.classes.call_tree import CallTreeBuilder
 
 
-def parse_metric(xml_node: XMLNode):
+# The parse functions only use get and findtext of the nodes, so that the streaming parser can use them with the
+# children that it has already created.
+
+def parse_metric(xml_node: XMLNode, childs: Optional[List[Metric]] = None):
     return Metric(
         name=xml_node.findtext('uniq_name'),
         _id=int(xml_node.get('id')),
@@ -13,7 +18,7 @@ def parse_metric(xml_node: XMLNode):
         data_type=xml_node.findtext('dtype'),
         units=xml_node.findtext('uom'),
         url=xml_node.findtext('url'),
-        childs=parse_metrics(xml_node)
+        childs=parse_metrics(xml_node) if childs is None else childs
     )
 
 
@@ -55,35 +60,35 @@ def parse_attrs(root: XMLNode):
     }
 
 
-def parse_cnode(xml_node: XMLNode):
-    cnode = CNode(
-        _id=int(xml_node.get('id')),
-        callee_region_id=int(xml_node.get('calleeId'))
-    )
-    for cnode_xml_child in xml_node.findall('cnode'):
-        cnode_child = parse_cnode(cnode_xml_child)
-        cnode_child.parent = cnode
-        cnode.add_child(cnode_child)
-    for parameter_xml in xml_node.findall('parameter'):
-        partype = parameter_xml.get('partype')
-        parkey = parameter_xml.get('parkey')
-        parvalue = parameter_xml.get('parvalue')
-        if partype == 'numeric':
-            try:
-                parvalue = int(parvalue)
-            except ValueError:
-                parvalue = float(parvalue)
-        elif partype == "string":
-            pass
-        cnode.parameters[parkey] = parvalue
-    return cnode
-
-
-def parse_cnodes(root: XMLNode):
-    return [
-        parse_cnode(cnode) for cnode
-        in root.find('program').findall('cnode')
-    ]
+def parse_parameter(xml_node: XMLNode):
+    partype = xml_node.get('partype')
+    parkey = xml_node.get('parkey')
+    parvalue = xml_node.get('parvalue')
+    if partype == 'numeric':
+        try:
+            parvalue = int(parvalue)
+        except ValueError:
+            parvalue = float(parvalue)
+    elif partype == "string":
+        pass
+    return parkey, parvalue
+
+
+def parse_call_tree(root: XMLNode):
+    builder = CallTreeBuilder()
+    # None marks the end of a cnode
+    stack = list(reversed(root.find('program').findall('cnode')))
+    while stack:
+        xml_node = stack.pop()
+        if xml_node is None:
+            builder.end_cnode()
+            continue
+        builder.start_cnode(int(xml_node.get('id')), int(xml_node.get('calleeId')))
+        for parameter_xml in xml_node.findall('parameter'):
+            builder.add_parameter(*parse_parameter(parameter_xml))
+        stack.append(None)
+        stack.extend(reversed(xml_node.findall('cnode')))
+    return builder.build()
 
 
 def parse_location(xml_node: XMLNode):
@@ -95,7 +100,11 @@ def parse_location(xml_node: XMLNode):
     )
 
 
-def parse_location_group(xml_node: XMLNode):
+def parse_location_group(
+        xml_node: XMLNode,
+        location_groups: Optional[List[LocationGroup]] = None,
+        locations: Optional[List[Location]] = None
+):
     location_group = LocationGroup(
         _id=int(xml_node.get('Id')),
         name=xml_node.findtext('name'),
@@ -103,28 +112,42 @@ def parse_location_group(xml_node: XMLNode):
         _type=xml_node.findtext('type')
     )
 
-    for xml_child_node in xml_node.findall('locationgroup'):
-        location_group.add_location_group(parse_location_group(xml_child_node))
+    if location_groups is None:
+        location_groups = [parse_location_group(xml_child_node) for xml_child_node in xml_node.findall('locationgroup')]
+    for child in location_groups:
+        location_group.add_location_group(child)
 
-    for xml_child_node in xml_node.findall('location'):
-        location_group.add_location(parse_location(xml_child_node))
+    if locations is None:
+        locations = [parse_location(xml_child_node) for xml_child_node in xml_node.findall('location')]
+    for child in locations:
+        location_group.add_location(child)
 
     return location_group
 
 
-def parse_system_tree_node(xml_node: XMLNode):
+def parse_system_tree_node(
+        xml_node: XMLNode,
+        attrs: Optional[Dict[str, str]] = None,
+        system_tree_nodes: Optional[List[SystemTreeNode]] = None,
+        location_groups: Optional[List[LocationGroup]] = None
+):
     system_tree_node = SystemTreeNode(
         _id=int(xml_node.get('Id')),
         _class=xml_node.get('class'),
         name=xml_node.findtext('name'),
-        attrs={x.get('key'): x.get('value') for x in xml_node.findall('attr')}
+        attrs=parse_attrs(xml_node) if attrs is None else attrs
     )
 
-    for xml_child_node in xml_node.findall('systemtreenode'):
-        system_tree_node.add_system_tree_node_child(parse_system_tree_node(xml_child_node))
+    if system_tree_nodes is None:
+        system_tree_nodes = [parse_system_tree_node(xml_child_node)
+                             for xml_child_node in xml_node.findall('systemtreenode')]
+    for child in system_tree_nodes:
+        system_tree_node.add_system_tree_node_child(child)
 
-    for xml_child_node in xml_node.findall('locationgroup'):
-        system_tree_node.add_location_group(parse_location_group(xml_child_node))
+    if location_groups is None:
+        location_groups = [parse_location_group(xml_child_node) for xml_child_node in xml_node.findall('locationgroup')]
+    for child in location_groups:
+        system_tree_node.add_location_group(child)
 
     return system_tree_node
 
@@ -0,0 +1,249 @@
+from typing import BinaryIO, Dict, List, Optional, Any, Callable
+from xml.parsers import expat
+
+from pycubexr.classes import CallTree, Metric, Region, SystemTreeNode
+from pycubexr.classes.call_tree import CallTreeBuilder
+from pycubexr.parsers.xml_parser_helper import parse_location, parse_location_group, parse_metric, parse_parameter, \
+    parse_region, parse_system_tree_node
+
+_BUFFER_SIZE = 1 << 16
+
+
+class _Element(object):
+    """
+    An open element whose direct children are needed to create an object.
+    """
+    __slots__ = ('tag', 'attrs', 'depth', 'texts', 'children')
+
+    def __init__(self, tag: str, attrs: Dict[str, str], depth: int):
+        self.tag = tag
+        self.attrs = attrs
+        self.depth = depth
+        # text of the first direct child element with the tag, like findtext
+        self.texts: Dict[str, str] = {}
+        # objects created from the direct child elements, grouped by tag
+        self.children: Dict[str, List[Any]] = {}
+
+    def children_of(self, tag: str) -> List[Any]:
+        return self.children.get(tag, [])
+
+    # the methods of XML nodes that are used by the parse functions of xml_parser_helper
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.attrs.get(key, default)
+
+    def findtext(self, tag: str, default: Optional[str] = None) -> Optional[str]:
+        return self.texts.get(tag, default)
+
+
+def _build_metric(element: _Element):
+    return parse_metric(element, childs=element.children_of('metric'))
+
+
+def _build_location_group(element: _Element):
+    return parse_location_group(element, location_groups=element.children_of('locationgroup'),
+                                locations=element.children_of('location'))
+
+
+def _build_system_tree_node(element: _Element):
+    return parse_system_tree_node(element, attrs=dict(element.children_of('attr')),
+                                  system_tree_nodes=element.children_of('systemtreenode'),
+                                  location_groups=element.children_of('locationgroup'))
+
+
+def _build_attr(element: _Element):
+    return element.attrs.get('key'), element.attrs.get('value')
+
+
+_BUILDERS: Dict[str, Callable[[_Element], Any]] = {
+    'metric': _build_metric,
+    'region': parse_region,
+    'location': parse_location,
+    'locationgroup': _build_location_group,
+    'systemtreenode': _build_system_tree_node,
+    'attr': _build_attr,
+}
+
+# top-level elements that contain the parts of the model, in the order they appear in the anchor
+SECTIONS = ('metrics', 'program', 'system')
+
+_SCAN_SIZE = 1 << 20
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class AnchorStreamParser(object):
+    """
+    Parses an anchor.xml file in a single pass with expat. Instead of building a DOM, the objects of the model are
+    created as soon as their element ends, so that only the elements on the current path are kept in memory.
+    The parser can be restricted to some sections, in which case it stops after the last of them and, if possible,
+    starts directly at the first of them, so that the bytes of the other sections are not parsed.
+    """
+
+    def __init__(self, sections=SECTIONS, *, attrs=True, section_offsets: Optional[Dict[str, int]] = None):
+        """
+        :param sections: The sections that are parsed.
+        :param attrs: Whether the attributes of the cube are parsed, which requires starting at the beginning.
+            The attributes are expected before the first section.
+        :param section_offsets: The byte offsets of the start tags of sections, which are found while parsing and
+            can be reused by later parsers of the same file.
+        """
+        self.attrs: Optional[Dict[str, str]] = None
+        self.metrics: Optional[List[Metric]] = None
+        self.regions: Optional[List[Region]] = None
+        self.call_tree: Optional[CallTree] = None
+        self.system_tree_nodes: Optional[List[SystemTreeNode]] = None
+        self.section_offsets = section_offsets if section_offsets is not None else {}
+        self._sections = set(sections)
+        self._parse_attrs = attrs
+        self._remaining_sections = set(sections)
+        self._open_elements: List[_Element] = []
+        self._depth = 0
+        self._skip_depth: Optional[int] = None
+        # cnodes are added to the call tree directly, without creating objects
+        self._call_tree_builder = CallTreeBuilder()
+        self._cnode_depths: List[int] = []
+        self._text: List[str] = []
+        self._base_offset = 0
+
+    def parse(self, anchor_file: BinaryIO) -> 'AnchorStreamParser':
+        first_section = min(self._sections, key=SECTIONS.index, default=None)
+        if self._parse_attrs or first_section is None or first_section == SECTIONS[0]:
+            self._parse(anchor_file, 0, b'')
+            return self
+
+        offset = self.section_offsets.get(first_section)
+        if offset is not None:
+            anchor_file.seek(offset)
+            data = anchor_file.read(_SCAN_SIZE)
+        else:
+            offset, data = _find_start_tag(anchor_file, first_section, self._scan_start(first_section))
+        if offset is not None and data.startswith(b'<' + first_section.encode()):
+            try:
+                # the section is parsed as part of an otherwise empty cube element
+                return self._parse(anchor_file, offset, data, prefix=b'<cube>')
+            except expat.ExpatError:
+                pass
+        # the start tag was not found, fall back to parsing from the beginning
+        anchor_file.seek(0)
+        self.__init__(self._sections, attrs=self._parse_attrs, section_offsets=self.section_offsets)
+        return self._parse(anchor_file, 0, b'')
+
+    def _scan_start(self, section: str) -> int:
+        previous_offsets = [self.section_offsets[s] for s in SECTIONS[:SECTIONS.index(section)]
+                            if s in self.section_offsets]
+        return max(previous_offsets, default=0)
+
+    def _parse(self, anchor_file: BinaryIO, offset: int, data: bytes, prefix: bytes = b''):
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.buffer_size = _BUFFER_SIZE
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self._text.append
+        self._parser = parser
+        self._base_offset = offset - len(prefix)
+        try:
+            parser.Parse(prefix + data, False)
+            while True:
+                data = anchor_file.read(_BUFFER_SIZE)
+                parser.Parse(data, not data)
+                if not data:
+                    break
+        except _StopParsing:
+            # the attributes precede all sections, so they are complete
+            if self._parse_attrs and self._open_elements:
+                self.attrs = dict(self._open_elements[0].children_of('attr'))
+        finally:
+            del self._parser
+        return self
+
+    def _start_element(self, tag: str, attrs: Dict[str, str]):
+        self._depth += 1
+        self._text.clear()
+        if self._skip_depth is not None:
+            return
+        if self._depth == 2 and tag in SECTIONS:
+            self.section_offsets.setdefault(tag, self._base_offset + self._parser.CurrentByteIndex)
+            if not self._remaining_sections:
+                raise _StopParsing()
+            if tag not in self._sections:
+                self._skip_depth = self._depth
+                return
+            self._open_elements.append(_Element(tag, attrs, self._depth))
+        elif tag == 'cnode' and self._in_call_tree():
+            self._call_tree_builder.start_cnode(int(attrs['id']), int(attrs['calleeId']))
+            self._cnode_depths.append(self._depth)
+        elif tag == 'parameter' and self._cnode_depths and self._cnode_depths[-1] == self._depth - 1:
+            self._call_tree_builder.add_parameter(*parse_parameter(attrs))
+        elif tag in _BUILDERS or (tag == 'cube' and self._depth == 1):
+            self._open_elements.append(_Element(tag, attrs, self._depth))
+
+    def _end_element(self, tag: str):
+        depth = self._depth
+        self._depth -= 1
+        if self._skip_depth is not None:
+            if self._skip_depth == depth:
+                self._skip_depth = None
+            return
+        if self._cnode_depths and self._cnode_depths[-1] == depth:
+            self._cnode_depths.pop()
+            self._call_tree_builder.end_cnode()
+            return
+        open_elements = self._open_elements
+        if open_elements and open_elements[-1].depth == depth:
+            element = open_elements.pop()
+            if depth <= 2 and element.tag in SECTIONS + ('cube',):
+                self._end_section(element)
+            elif open_elements and open_elements[-1].depth == depth - 1:
+                open_elements[-1].children.setdefault(tag, []).append(_BUILDERS[tag](element))
+        elif open_elements and open_elements[-1].depth == depth - 1:
+            open_elements[-1].texts.setdefault(tag, ''.join(self._text))
+        self._text.clear()
+
+    def _in_call_tree(self):
+        if self._cnode_depths:
+            return self._cnode_depths[-1] == self._depth - 1
+        open_elements = self._open_elements
+        return bool(open_elements) and open_elements[-1].tag == 'program' and open_elements[-1].depth == self._depth - 1
+
+    def _end_section(self, element: _Element):
+        if element.tag == 'cube':
+            if self._parse_attrs:
+                self.attrs = dict(element.children_of('attr'))
+            return
+        elif element.tag == 'metrics':
+            self.metrics = element.children_of('metric')
+        elif element.tag == 'program':
+            self.regions = element.children_of('region')
+            self.call_tree = self._call_tree_builder.build()
+        elif element.tag == 'system':
+            self.system_tree_nodes = element.children_of('systemtreenode')
+        self._remaining_sections.discard(element.tag)
+        if not self._remaining_sections:
+            raise _StopParsing()
+
+
+def _find_start_tag(anchor_file: BinaryIO, tag: str, offset: int):
+    """
+    Scans the raw bytes for the start tag, which is much faster than parsing them.
+    :return: The offset of the start tag and the data read from there, or None if the tag was not found.
+    """
+    anchor_file.seek(offset)
+    pattern = b'<' + tag.encode()
+    data = b''
+    while True:
+        chunk = anchor_file.read(_SCAN_SIZE)
+        if not chunk:
+            return None, b''
+        data += chunk
+        position = data.find(pattern)
+        while position >= 0 and position + len(pattern) < len(data):
+            if data[position + len(pattern)] in b' \t\r\n/>':
+                return offset + position, data[position:]
+            position = data.find(pattern, position + 1)
+        # keep the end of the data, which might contain the beginning of the tag
+        keep = min(len(pattern), len(data)) if position < 0 else len(data) - position
+        offset += len(data) - keep
+        data = data[len(data) - keep:]
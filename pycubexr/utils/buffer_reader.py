@@ -0,0 +1,50 @@
+import io
+from typing import Union
+
+
+class BufferReader(io.RawIOBase):
+    """
+    A seekable file that reads from a buffer, e.g., bytes or a memoryview, without copying the buffer.
+    Unlike BytesIO, a memoryview is not copied when the reader is created, and slices of the buffer can be
+    accessed directly with readview.
+    """
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview]):
+        super().__init__()
+        self._buffer = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readview(self, size: int = -1) -> memoryview:
+        """
+        Like read, but returns a view of the buffer instead of a copy.
+        """
+        end = len(self._buffer) if size is None or size < 0 else self._position + size
+        data = self._buffer[self._position:end]
+        self._position += len(data)
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        elif whence != io.SEEK_SET:
+            raise ValueError('Invalid whence: {}'.format(whence))
+        if offset < 0:
+            raise ValueError('Negative seek position {}'.format(offset))
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        data = self.readview(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from os import PathLike
+from pathlib import Path
+from typing import Optional, Union, Any
+
+import numpy as np
+
+from pycubexr.utils.logger import logger
+
+_SAMPLE_SIZE = 1024 * 1024
+
+
+class DiskCache(object):
+    """
+    A persistent cache for data derived from cubex files, e.g., the parsed anchor and decoded metric values.
+    Each cubex file gets its own entry, which is identified by the path, the size, the modification time and a hash
+    of the beginning and the end of the file. Arrays are stored as .npy files, which can be memory mapped.
+    If the total size exceeds max_size, the least recently used entries are evicted when a parser that stored new
+    data is closed. Writes are atomic, so multiple processes can share the same cache directory. Failed writes are
+    logged and ignored, because the cache only accelerates loading.
+    The parsed anchor is stored with pickle, so loading it can execute arbitrary code. Only use cache directories
+    that cannot be written by untrusted users.
+    """
+
+    def __init__(self, directory: Union[str, PathLike], max_size: Optional[int] = None):
+        """
+        :param directory: The directory of the cache, it is created if it does not exist.
+        :param max_size: The maximum size of the cache in bytes, unlimited if None.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+    def entry(self, cubex_filename: Union[str, PathLike]) -> 'DiskCacheEntry':
+        return DiskCacheEntry(self, self.directory / _file_key(cubex_filename))
+
+    def size(self) -> int:
+        return sum(_directory_size(entry) for entry in self._entries())
+
+    def evict(self, keep: Optional['DiskCacheEntry'] = None):
+        """
+        Evicts the least recently used entries until the cache is smaller than max_size.
+        :param keep: An entry that is not evicted.
+        """
+        if self.max_size is None:
+            return
+        entries = []
+        for entry in self._entries():
+            try:
+                entries.append((entry.stat().st_mtime, _directory_size(entry), entry))
+            except FileNotFoundError:
+                pass  # evicted concurrently
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total_size <= self.max_size:
+                break
+            if keep is not None and entry == keep.directory:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        for entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def _entries(self):
+        return [entry for entry in self.directory.iterdir() if entry.is_dir()]
+
+
+class DiskCacheEntry(object):
+    """
+    The cached data of a single cubex file.
+    """
+
+    def __init__(self, cache: DiskCache, directory: Path):
+        self.cache = cache
+        self.directory = directory
+        # whether data was stored, which may require evicting other entries
+        self.modified = False
+
+    def load_object(self, name: str) -> Optional[Any]:
+        try:
+            with open(self.directory / (name + '.pickle'), 'rb') as file:
+                result = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning('Could not load %s from the cache: %s', name, e)
+            return None
+        self._touch()
+        return result
+
+    def store_object(self, name: str, obj: Any):
+        self._store(name + '.pickle', lambda file: pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_array(self, name: str, memory_map: bool = True) -> Optional[np.ndarray]:
+        try:
+            result = np.load(self.directory / (name + '.npy'), mmap_mode='r' if memory_map else None,
+                             allow_pickle=False)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning('Could not load %s from the cache: %s', name, e)
+            return None
+        self._touch()
+        return result
+
+    def store_array(self, name: str, array: np.ndarray):
+        self._store(name + '.npy', lambda file: np.save(file, array, allow_pickle=False))
+
+    def _store(self, file_name: str, write):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first, so that concurrent readers never see partial files
+            fd, temp_name = tempfile.mkstemp(dir=self.directory, prefix='.' + file_name)
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    write(file)
+                os.replace(temp_name, self.directory / file_name)
+            except BaseException:
+                try:
+                    os.unlink(temp_name)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            # e.g., the disk is full or the entry was evicted concurrently
+            logger.warning('Could not store %s in the cache: %s', file_name, e)
+            return
+        self.modified = True
+        self._touch()
+
+    def _touch(self):
+        # the modification time of the entry directory tracks the last use
+        try:
+            os.utime(self.directory)
+        except FileNotFoundError:
+            pass
+
+
+def _file_key(cubex_filename: Union[str, PathLike]) -> str:
+    path = Path(cubex_filename).resolve()
+    stat = path.stat()
+    key = hashlib.blake2b(digest_size=20)
+    key.update(str(path).encode('utf-8'))
+    key.update(b'%d:%d' % (stat.st_size, stat.st_mtime_ns))
+    # hashing the whole file would take as long as parsing it, so only the beginning and the end are hashed
+    with open(path, 'rb') as file:
+        key.update(file.read(_SAMPLE_SIZE))
+        if stat.st_size > _SAMPLE_SIZE:
+            file.seek(max(_SAMPLE_SIZE, stat.st_size - _SAMPLE_SIZE))
+            key.update(file.read(_SAMPLE_SIZE))
+    return key.hexdigest()
+
+
+def _directory_size(directory: Path) -> int:
+    size = 0
+    for file in directory.iterdir():
+        try:
+            size += file.stat().st_size
+        except FileNotFoundError:
+            pass
+    return size
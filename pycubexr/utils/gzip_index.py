@@ -0,0 +1,189 @@
+import bisect
+import io
+import sys
+import zlib
+from typing import BinaryIO, List, Optional
+
+GZIP_MAGIC = b'\x1f\x8b'
+DEFAULT_SPACING = 8 * 1024 * 1024
+
+# decodes gzip headers and trailers
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_CHUNK_SIZE = 64 * 1024
+_OUTPUT_SIZE = 32 * 1024
+
+
+class _Checkpoint(object):
+    __slots__ = ('uncompressed', 'compressed', 'decompressor')
+
+    def __init__(self, uncompressed: int, compressed: int, decompressor):
+        self.uncompressed = uncompressed
+        self.compressed = compressed
+        # the state of the decompressor after consuming the compressed data before the checkpoint, None at the start
+        # of a gzip member
+        self.decompressor = decompressor
+
+
+class GzipIndex(object):
+    """
+    Checkpoints in a gzip stream, from which decompression can continue without inflating the stream from its
+    beginning. A checkpoint is recorded every spacing bytes of uncompressed data while the stream is read, so reaching
+    any position requires inflating at most about spacing bytes after the first pass.
+    The checkpoints inside gzip members hold a copy of the decompressor, which cannot be serialized, so the index
+    only exists in memory and is rebuilt whenever a stream is opened again.
+    """
+
+    def __init__(self, spacing: int = DEFAULT_SPACING):
+        """
+        :param spacing: The minimum number of uncompressed bytes between two checkpoints.
+        """
+        self.spacing = spacing
+        # the uncompressed size of the stream, once it is known
+        self.size: Optional[int] = None
+        self._offsets: List[int] = [0]
+        self._checkpoints: List[_Checkpoint] = [_Checkpoint(0, 0, None)]
+
+    def __len__(self):
+        return len(self._checkpoints)
+
+    def find(self, position: int) -> _Checkpoint:
+        """
+        :return: The last checkpoint at or before the uncompressed position.
+        """
+        return self._checkpoints[bisect.bisect_right(self._offsets, position) - 1]
+
+    def add(self, uncompressed: int, compressed: int, decompressor=None):
+        """
+        Adds a checkpoint if the previous one is at least spacing bytes before it. The starts of gzip members, where
+        decompressor is None, are always added.
+        """
+        index = bisect.bisect_right(self._offsets, uncompressed)
+        previous = self._offsets[index - 1]
+        if previous == uncompressed or (decompressor is not None and uncompressed - previous < self.spacing):
+            return
+        if decompressor is not None:
+            decompressor = decompressor.copy()
+        self._offsets.insert(index, uncompressed)
+        self._checkpoints.insert(index, _Checkpoint(uncompressed, compressed, decompressor))
+
+
+class GzipIndexedFile(io.RawIOBase):
+    """
+    A seekable file of the uncompressed data of a gzip stream. Seeking continues decompression from the closest
+    checkpoint of the index instead of the beginning of the stream, and new checkpoints are added to the index while
+    the stream is inflated. Like GzipFile, streams of multiple gzip members are read as their concatenation.
+    """
+
+    def __init__(self, fileobj: BinaryIO, index: Optional[GzipIndex] = None, *, close_file: bool = True):
+        """
+        :param fileobj: The seekable compressed file.
+        :param index: The index of the file, which is extended while reading. A new index is created if None.
+        :param close_file: Closes the compressed file when this file is closed.
+        """
+        super().__init__()
+        self.index = index if index is not None else GzipIndex()
+        self._file = fileobj
+        self._close_file = close_file
+        self._position = 0
+        # state of the decompression, the output starts at -1 until the first read
+        self._decompressor = None
+        # the position of the first compressed byte that was not consumed yet, which starts the input
+        self._compressed_position = 0
+        self._input = b''
+        self._output_position = -1
+        self._pending = b''
+        self._pending_position = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            if self.index.size is None:
+                self._inflate_to_end()
+            offset += self.index.size
+        elif whence != io.SEEK_SET:
+            raise ValueError('Invalid whence: {}'.format(whence))
+        if offset < 0:
+            raise ValueError('Negative seek position {}'.format(offset))
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        checkpoint = self.index.find(self._position)
+        if (self._output_position < 0 or self._position < self._pending_position
+                or checkpoint.uncompressed > self._output_position):
+            self._restart(checkpoint)
+        while self._position >= self._pending_position + len(self._pending):
+            if not self._inflate():
+                return 0
+        start = self._position - self._pending_position
+        size = min(len(buffer), len(self._pending) - start)
+        buffer[:size] = self._pending[start:start + size]
+        self._position += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._input = self._pending = b''
+            self._decompressor = None
+            if self._close_file:
+                self._file.close()
+        super().close()
+
+    def _restart(self, checkpoint: _Checkpoint):
+        self._decompressor = checkpoint.decompressor.copy() if checkpoint.decompressor is not None else None
+        self._compressed_position = checkpoint.compressed
+        self._output_position = checkpoint.uncompressed
+        self._input = b''
+        self._pending = b''
+        self._pending_position = checkpoint.uncompressed
+        self._eof = False
+
+    def _inflate(self) -> bool:
+        # inflates the next part of the stream into the pending data, returns False at the end of the stream
+        if self._eof:
+            return False
+        if not self._input:
+            self._file.seek(self._compressed_position)
+            self._input = self._file.read(_CHUNK_SIZE)
+        if self._decompressor is None:
+            # a new gzip member starts, anything else after the previous member is ignored like in GzipFile
+            if not self._input.startswith(GZIP_MAGIC):
+                self.index.size = self._output_position
+                self._eof = True
+                return False
+            self.index.add(self._output_position, self._compressed_position)
+            self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+        else:
+            self.index.add(self._output_position, self._compressed_position, self._decompressor)
+        if not self._input:
+            raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+        # the output is limited, so that checkpoints can be taken at the requested spacing
+        output = self._decompressor.decompress(self._input, _OUTPUT_SIZE)
+        remaining = self._decompressor.unused_data if self._decompressor.eof else self._decompressor.unconsumed_tail
+        self._compressed_position += len(self._input) - len(remaining)
+        self._input = remaining
+        if self._decompressor.eof:
+            self._decompressor = None
+        self._pending = output
+        self._pending_position = self._output_position
+        self._output_position += len(output)
+        return True
+
+    def _inflate_to_end(self):
+        checkpoint = self.index.find(sys.maxsize)
+        if self._output_position < 0 or checkpoint.uncompressed > self._output_position:
+            self._restart(checkpoint)
+        while self._inflate():
+            pass
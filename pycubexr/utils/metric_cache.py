@@ -0,0 +1,151 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Set, Union
+
+from pycubexr.classes import Metric, MetricValues
+
+
+class _Entry(object):
+    __slots__ = ('metric_values', 'nbytes', 'uses')
+
+    def __init__(self, metric_values: MetricValues):
+        self.metric_values = metric_values
+        self.nbytes = metric_values.nbytes
+        self.uses = 1
+
+
+class MetricCache(object):
+    """
+    The in-memory cache of the metric values of a CubexParser. The keys start with the id of the metric, followed by
+    the options that the values were loaded with.
+    If the values exceed max_bytes, the least recently used values are evicted, except for the values of pinned
+    metrics. The sizes are taken from MetricValues.nbytes and updated on every access, because values grow when they
+    are converted or inflated lazily. Memory-mapped values are counted like values in memory.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        :param max_bytes: The maximum number of bytes of the cached values, unlimited if None. Nothing is cached if 0.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._pinned: Set[int] = set()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes of the cached values.
+        """
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[MetricValues]:
+        """
+        :param count: Counts the access as a hit or a miss.
+        :return: The cached values, None if they are not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            if count:
+                self.hits += 1
+            entry.uses += 1
+            self._entries.move_to_end(key)
+            self._resize(entry)
+            self._evict_to_budget()
+            return entry.metric_values
+
+    def put(self, key: Hashable, metric_values: MetricValues):
+        with self._lock:
+            if self.max_bytes == 0 and key[0] not in self._pinned:
+                # the values would be evicted immediately
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._nbytes -= previous.nbytes
+            entry = self._entries[key] = _Entry(metric_values)
+            self._nbytes += entry.nbytes
+            self._evict_to_budget()
+
+    def pin(self, metric: Union[Metric, int]):
+        """
+        Keeps the values of the metric in the cache until they are unpinned or evicted explicitly, even if they exceed
+        max_bytes. Values of the metric that are loaded later are pinned as well.
+        """
+        with self._lock:
+            self._pinned.add(_metric_id(metric))
+
+    def unpin(self, metric: Union[Metric, int]):
+        with self._lock:
+            self._pinned.discard(_metric_id(metric))
+            self._evict_to_budget()
+
+    def evict(self, metric: Union[Metric, int]):
+        """
+        Removes all cached values of the metric, including pinned values. The metric stays pinned.
+        """
+        metric_id = _metric_id(metric)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == metric_id]:
+                self._nbytes -= self._entries.pop(key).nbytes
+
+    def clear(self):
+        """
+        Removes all cached values, the pins and the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _resize(self, entry: _Entry):
+        nbytes = entry.metric_values.nbytes
+        self._nbytes += nbytes - entry.nbytes
+        entry.nbytes = nbytes
+
+    def _evict_to_budget(self):
+        if self.max_bytes is None:
+            return
+        while self._nbytes > self.max_bytes:
+            key = self._victim()
+            if key is None:
+                # only pinned values are left
+                break
+            self._nbytes -= self._entries.pop(key).nbytes
+            self.evictions += 1
+
+    def _victim(self) -> Optional[Hashable]:
+        # the least recently used entry, the entries are ordered by their last access
+        return next((key for key in self._entries if key[0] not in self._pinned), None)
+
+    def __repr__(self):
+        return '{}<entries={}, nbytes={}, max_bytes={}, hits={}, misses={}, evictions={}>'.format(
+            type(self).__name__, len(self), self.nbytes, self.max_bytes, self.hits, self.misses, self.evictions)
+
+
+class LFUMetricCache(MetricCache):
+    """
+    A metric cache that evicts the least frequently used values first, and the least recently used values of these
+    if they were used equally often.
+    """
+
+    def _victim(self) -> Optional[Hashable]:
+        candidates = [(entry.uses, position, key) for position, (key, entry) in enumerate(self._entries.items())
+                      if key[0] not in self._pinned]
+        return min(candidates)[2] if candidates else None
+
+
+def _metric_id(metric: Union[Metric, int]) -> int:
+    return metric.id if isinstance(metric, Metric) else metric
@@ -0,0 +1,82 @@
+"""
+Benchmarks parsing and traversing synthetic call trees that are much deeper than the recursion limit.
+Run from the test directory: python benchmark_call_tree.py [--memory]
+With --memory, the peak memory is traced as well, which slows down all measurements considerably.
+"""
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+
+from pycubexr.classes import MetricValues
+from pycubexr.parsers.anchor_xml_parser import parse_anchor_xml_file
+
+
+def synthetic_anchor(depth: int, num_cnodes: int) -> bytes:
+    """
+    Creates an anchor.xml with a chain of depth cnodes, where the remaining cnodes are leaves distributed evenly
+    over the chain.
+    """
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<cube version="4.4">\n<metrics>\n'
+             '<metric id="0" type="EXCLUSIVE"><uniq_name>visits</uniq_name><dtype>UINT64</dtype></metric>\n'
+             '</metrics>\n<program>\n'
+             '<region id="0" begin="-1" end="-1"><name>chain</name></region>\n'
+             '<region id="1" begin="-1" end="-1"><name>leaf</name></region>\n']
+    leaves_per_level, extra_leaves = divmod(num_cnodes - depth, depth)
+    cnode_id = 0
+    for level in range(depth):
+        parts.append(f'<cnode id="{cnode_id}" calleeId="0">')
+        cnode_id += 1
+        for _ in range(leaves_per_level + (level < extra_leaves)):
+            parts.append(f'<cnode id="{cnode_id}" calleeId="1"></cnode>')
+            cnode_id += 1
+        parts.append('\n')
+    parts.append('</cnode>' * depth)
+    parts.append('\n</program>\n<system>\n<systemtreenode Id="0"><name>machine</name>'
+                 '<locationgroup Id="0"><name>process</name><rank>0</rank><type>process</type>'
+                 '<location Id="0"><name>thread</name><rank>0</rank><type>thread</type></location>'
+                 '</locationgroup></systemtreenode>\n</system>\n</cube>\n')
+    return ''.join(parts).encode()
+
+
+TRACE_MEMORY = '--memory' in sys.argv
+
+
+def _measure(name, function):
+    if TRACE_MEMORY:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    duration = time.perf_counter() - start
+    if TRACE_MEMORY:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{name:<40} {duration:8.3f} s {peak / 2 ** 20:10.1f} MiB')
+    else:
+        print(f'{name:<40} {duration:8.3f} s')
+    return result
+
+
+def benchmark(depth: int, num_cnodes: int):
+    print(f'depth {depth}, {num_cnodes} cnodes (recursion limit {sys.getrecursionlimit()})')
+    anchor = _measure('generate anchor.xml', lambda: synthetic_anchor(depth, num_cnodes))
+    result = _measure('parse anchor.xml', lambda: parse_anchor_xml_file(BytesIO(anchor)))
+    root = result.cnodes[0]
+    _measure('iter_subtree', lambda: sum(1 for _ in root.iter_subtree()))
+    _measure('get_all_children', lambda: len(root.get_all_children()))
+    metric_values = MetricValues(
+        metric=result.metrics[0],
+        cnode_indices=result.call_tree.preorder,
+        values=np.ones(num_cnodes, dtype=np.uint64),
+        call_tree=result.call_tree
+    )
+    _measure('inclusive value of the root', lambda: metric_values.value(root, convert_to_inclusive=True))
+    _measure('inclusive matrix', lambda: metric_values.to_inclusive_matrix())
+    print()
+
+
+if __name__ == '__main__':
+    benchmark(10_000, 100_000)
+    benchmark(10_000, 1_000_000)
@@ -0,0 +1,8 @@
+from pycubexr.classes.values import CubeValues
+
+
+def raw_values(values):
+    # the NumPy array of CubeValues, which can be compared with NumPy
+    if isinstance(values, CubeValues):
+        return values._values
+    return values
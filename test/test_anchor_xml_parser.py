@@ -0,0 +1,157 @@
+import tarfile
+import unittest
+from contextlib import contextmanager
+from gzip import GzipFile
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
+
+from pycubexr import CubexParser
+from pycubexr.classes import CNode
+from pycubexr.parsers import xml_stream_parser
+from pycubexr.parsers.anchor_xml_parser import parse_anchor_xml, parse_anchor_xml_file, parse_anchor_xml_lazily
+from pycubexr.utils.custom_tarinfo import TarInfoWithoutCheck
+
+PATHS = sorted(Path("../data").glob("**/*.cubex"))
+
+
+def read_anchor(path: Path) -> bytes:
+    try:
+        cubex_file = tarfile.open(path)
+    except tarfile.ReadError:
+        cubex_file = tarfile.open(path, tarinfo=TarInfoWithoutCheck)
+    with cubex_file, cubex_file.extractfile('anchor.xml') as anchor_file:
+        anchor = anchor_file.read()
+    if not anchor.startswith(b'<?xml'):
+        with GzipFile(fileobj=BytesIO(anchor)) as compressed_anchor:
+            anchor = compressed_anchor.read()
+    return anchor
+
+
+def describe(obj):
+    # compares the model objects by their attributes, ignoring links to parents and regions
+    if isinstance(obj, list):
+        return [describe(x) for x in obj]
+    if isinstance(obj, CNode):
+        return 'CNode', obj.id, obj.callee_region_id, obj.region.id, obj.parameters, describe(obj.get_children())
+    if isinstance(obj, dict):
+        return {k: describe(v) for k, v in obj.items()}
+    if hasattr(obj, '__dict__'):
+        return type(obj).__name__, {k: describe(v) for k, v in vars(obj).items()
+                                    if k not in ('parent', 'region', '_tree_index_to_cid_map', '_load_call_tree')}
+    return obj
+
+
+class TestAnchorXMLParser(unittest.TestCase):
+
+    def test_stream_parser_matches_dom_parser(self):
+        self.assertTrue(PATHS)
+        for path in PATHS:
+            with self.subTest(path=path.name):
+                anchor = read_anchor(path)
+                expected = parse_anchor_xml(ElementTree.parse(BytesIO(anchor)))
+                actual = parse_anchor_xml_file(BytesIO(anchor))
+                self.assertEqual(describe(expected.attrs), describe(actual.attrs))
+                self.assertEqual(describe(expected.metrics), describe(actual.metrics))
+                self.assertEqual(describe(expected.regions), describe(actual.regions))
+                self.assertEqual(describe(expected.cnodes), describe(actual.cnodes))
+                self.assertEqual(describe(expected.system_tree_nodes), describe(actual.system_tree_nodes))
+                for cnode in actual.all_cnodes.values():
+                    self.assertIs(actual.regions_by_id[cnode.callee_region_id], cnode.region)
+                    for child in cnode.get_children():
+                        self.assertEqual(cnode, child.parent)
+                for expected_metric, actual_metric in zip(expected.metrics, actual.metrics):
+                    self.assertEqual(expected_metric.tree_index_to_cid_map.tolist(),
+                                     actual_metric.tree_index_to_cid_map.tolist())
+
+    # small buffers, so that skipped sections are not read along with the parsed ones
+    @mock.patch.object(xml_stream_parser, '_BUFFER_SIZE', 256)
+    @mock.patch.object(xml_stream_parser, '_SCAN_SIZE', 256)
+    def test_lazy_sections(self):
+        for path in PATHS:
+            with self.subTest(path=path.name):
+                anchor = read_anchor(path)
+                expected = parse_anchor_xml_file(BytesIO(anchor))
+                read_sizes = []
+
+                @contextmanager
+                def source():
+                    anchor_file = BytesIO(anchor)
+                    yield anchor_file
+                    read_sizes.append(anchor_file.tell())
+
+                actual = parse_anchor_xml_lazily(source)
+                self.assertEqual([], read_sizes)
+
+                # the system tree is found without parsing the call tree
+                self.assertEqual(describe(expected.system_tree_nodes), describe(actual.system_tree_nodes))
+                self.assertIsNone(actual._call_tree)
+                self.assertIsNone(actual._metrics)
+                self.assertIsNone(actual._attrs)
+
+                self.assertEqual(describe(expected.metrics), describe(actual.metrics))
+                self.assertIsNone(actual._call_tree)
+                self.assertIsNone(actual.metrics[0]._tree_index_to_cid_map)
+                self.assertLess(read_sizes[-1], len(anchor))
+
+                self.assertEqual(describe(expected.attrs), describe(actual.attrs))
+                self.assertEqual(describe(expected.cnodes), describe(actual.cnodes))
+                self.assertEqual(describe(expected.regions), describe(actual.regions))
+                self.assertEqual(expected.metrics[0].tree_index_to_cid_map.tolist(),
+                                 actual.metrics[0].tree_index_to_cid_map.tolist())
+                self.assertIs(actual.regions_by_id[actual.cnodes[0].callee_region_id], actual.cnodes[0].region)
+                self.assertEqual(4, len(read_sizes))
+
+    def test_access_after_exit(self):
+        path = Path("../data/blast.p64.r1/profile.cubex")
+        with mock.patch('pycubexr.parsers.anchor_xml_parser.AnchorStreamParser',
+                        wraps=xml_stream_parser.AnchorStreamParser) as stream_parser:
+            with CubexParser(path) as cubex:
+                metrics = cubex.get_metrics()
+            # the sections that were not accessed are neither parsed inside the with block nor on exit
+            self.assertEqual([{'metrics'}], [set(call[0][0]) for call in stream_parser.call_args_list])
+            # they are parsed from the reopened archive when they are accessed later
+            self.assertEqual(metrics, cubex.get_metrics())
+            self.assertEqual(64, len(cubex.get_locations()))
+            self.assertEqual('main', cubex.get_region_by_name('main').name)
+            self.assertEqual(len(cubex.all_cnodes()), len(cubex.get_call_tree()))
+            self.assertEqual(3, stream_parser.call_count)
+        with path.open('rb') as cubex_file:
+            with CubexParser(cubex_file) as cubex:
+                cubex.get_metrics()
+            # file objects of the caller cannot be reopened
+            with self.assertRaises(ValueError):
+                cubex.get_locations()
+
+    def test_location_table(self):
+        for path in PATHS:
+            with self.subTest(path=path.name):
+                result = parse_anchor_xml_file(BytesIO(read_anchor(path)))
+                root = result.system_tree_nodes[0]
+                locations = root.all_locations()
+                table = result.location_table
+                self.assertIs(table, result.location_table)
+                self.assertEqual(len(locations), len(table))
+                self.assertEqual(locations, table.locations)
+                self.assertEqual([location.id for location in locations], table.ids.tolist())
+                self.assertEqual([int(location.rank) for location in locations], table.ranks.tolist())
+                self.assertEqual([location.type for location in locations],
+                                 [table.type_names[code] for code in table.type_codes])
+                self.assertEqual(len(locations), sum(table.type_mask(name).sum() for name in table.type_names))
+                self.assertIs(root, table.system_tree_nodes[0])
+                self.assertEqual(-1, table.system_tree_node_parents[0])
+                for location, group_index, node_index in zip(locations, table.location_group_indices,
+                                                             table.system_tree_node_indices):
+                    self.assertIn(location, table.location_groups[group_index].all_locations())
+                    node = table.system_tree_nodes[node_index]
+                    self.assertIn(location, [loc for group in node._location_group_children
+                                             for loc in group.all_locations()])
+                for index, parent in enumerate(table.system_tree_node_parents.tolist()[1:], 1):
+                    self.assertIn(table.system_tree_nodes[index],
+                                  table.system_tree_nodes[parent]._system_tree_node_children)
+                    self.assertEqual(table.system_tree_node_depths[parent] + 1, table.system_tree_node_depths[index])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from pycubexr import AsyncCubexParser, CubexParser
+from pycubexr.utils.exceptions import MissingMetricError
+
+from helpers import raw_values
+
+
+class TestAsyncCubexParser(unittest.TestCase):
+    cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+
+    def setUp(self):
+        self.cubex = CubexParser(self.cubex_file_path).__enter__()
+
+    def tearDown(self):
+        self.cubex.__exit__(None, None, None)
+
+    def assert_values_equal(self, metric_values):
+        expected = self.cubex.get_metric_values(self.cubex.get_metric_by_name(metric_values.metric.name))
+        self.assertEqual(expected.cnode_indices, metric_values.cnode_indices)
+        np.testing.assert_array_equal(raw_values(expected.values), raw_values(metric_values.values))
+
+    def test_metric_values(self):
+        async def load():
+            async with AsyncCubexParser(self.cubex_file_path, max_workers=4) as cubex:
+                metric = cubex.get_metric_by_name('time')
+                metric_values = await cubex.get_metric_values(metric)
+                self.assertIs(metric_values, await cubex.get_metric_values(metric))
+                reduced = await cubex.get_metric_values(metric, reduce='sum')
+                self.assertEqual(1, reduced.num_locations())
+                selected = await cubex.get_metric_values(metric, locations=np.arange(64) < 8)
+                self.assertEqual(8, selected.num_locations())
+                return metric_values, [metric_values async for metric_values in cubex.iter_metric_values()]
+
+        metric_values, all_metric_values = asyncio.run(load())
+        self.assert_values_equal(metric_values)
+        expected_names = set()
+        for metric in self.cubex.get_metrics():
+            try:
+                self.cubex.get_metric_values(metric)
+                expected_names.add(metric.name)
+            except MissingMetricError:
+                pass
+        self.assertEqual(expected_names, {metric_values.metric.name for metric_values in all_metric_values})
+        for metric_values in all_metric_values:
+            self.assert_values_equal(metric_values)
+
+    def test_shared_requests(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        release = threading.Event()
+
+        async def load():
+            async with AsyncCubexParser(self.cubex_file_path, executor=executor) as cubex:
+                loads = []
+                load_metric_values = cubex.parser._load_metric_values
+
+                def counting_load(metric, *args, **kwargs):
+                    loads.append(metric.name)
+                    return load_metric_values(metric, *args, **kwargs)
+
+                cubex.parser._load_metric_values = counting_load
+                # blocks the only worker, so that the requests are pending
+                blocker = asyncio.wrap_future(executor.submit(release.wait))
+                time, visits = cubex.get_metric_by_name('time'), cubex.get_metric_by_name('visits')
+                requests = [asyncio.ensure_future(cubex.get_metric_values(time)) for _ in range(100)]
+                cancelled_request = asyncio.ensure_future(cubex.get_metric_values(visits))
+                await asyncio.sleep(0)
+                self.assertEqual(2, len(cubex._requests))
+
+                cancelled_load = next(request.task for key, request in cubex._requests.items() if key[0] == visits.id)
+                # cancelling one of the shared requests does not cancel the others
+                requests[0].cancel()
+                cancelled_request.cancel()
+                await asyncio.wait([cancelled_load])
+                release.set()
+                await blocker
+                results = await asyncio.gather(*requests[1:])
+                self.assertTrue(all(result is results[0] for result in results))
+                self.assertTrue(requests[0].cancelled() and cancelled_request.cancelled())
+                self.assertEqual(['time'], loads)
+                self.assertEqual(0, len(cubex._requests))
+                return results[0]
+
+        try:
+            self.assert_values_equal(asyncio.run(load()))
+        finally:
+            executor.shutdown()
+
+    def test_missing_metric(self):
+        async def load():
+            async with AsyncCubexParser(self.cubex_file_path) as cubex:
+                for metric in cubex.get_metrics():
+                    try:
+                        self.cubex.get_metric_values(self.cubex.get_metric_by_name(metric.name))
+                    except MissingMetricError:
+                        with self.assertRaises(MissingMetricError):
+                            await cubex.get_metric_values(metric)
+                        return True
+            return False
+
+        self.assertTrue(asyncio.run(load()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import gzip
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from pycubexr import CubexParser
+from pycubexr.utils.disk_cache import DiskCache
+from pycubexr.utils.exceptions import MissingMetricError
+
+from helpers import raw_values
+
+
+class TestBufferInput(unittest.TestCase):
+    cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+
+    def assert_same_values(self, cubex_file):
+        with CubexParser(self.cubex_file_path) as cubex, CubexParser(cubex_file) as other_cubex:
+            self.assertEqual(cubex.get_calltree(), other_cubex.get_calltree())
+            for metric in cubex.get_metrics():
+                with self.subTest(metric=metric.name):
+                    try:
+                        expected = cubex.get_metric_values(metric)
+                    except MissingMetricError:
+                        continue
+                    actual = other_cubex.get_metric_values(other_cubex.get_metric_by_name(metric.name))
+                    self.assertEqual(expected.cnode_indices, actual.cnode_indices)
+                    np.testing.assert_array_equal(raw_values(expected.values), raw_values(actual.values))
+
+    def test_bytes(self):
+        data = self.cubex_file_path.read_bytes()
+        self.assert_same_values(data)
+        self.assert_same_values(memoryview(bytearray(data)))
+        self.assert_same_values(gzip.compress(data))
+
+    def test_file_object(self):
+        with open(self.cubex_file_path, 'rb') as cubex_file:
+            cubex_file.read(100)
+            self.assert_same_values(cubex_file)
+            # the file of the caller is not closed
+            self.assertFalse(cubex_file.closed)
+        self.assert_same_values(io.BytesIO(gzip.compress(self.cubex_file_path.read_bytes())))
+
+    def test_zero_copy(self):
+        data = bytearray(self.cubex_file_path.read_bytes())
+        with CubexParser(memoryview(data)) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('visits'))
+            self.assertTrue(np.shares_memory(raw_values(metric_values.values), np.frombuffer(data, dtype=np.uint8)))
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir, self.assertRaises(ValueError):
+            CubexParser(self.cubex_file_path.read_bytes(), disk_cache=DiskCache(cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
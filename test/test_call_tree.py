@@ -1,11 +1,58 @@
 import unittest
+from io import BytesIO
 from pathlib import Path
+from xml.etree import ElementTree
+
+import numpy as np
+
+from benchmark_call_tree import synthetic_anchor
 
 from pycubexr import CubexParser
+from pycubexr.classes import MetricValues
 from pycubexr.classes.metric import MetricType
+from pycubexr.classes.values import MinValues, MaxValues
+from pycubexr.parsers.anchor_xml_parser import parse_anchor_xml_file, parse_anchor_xml
 from pycubexr.utils.exceptions import MissingMetricError
 
 
+class TestDeepCallTree(unittest.TestCase):
+    # deeper than the default recursion limit
+    DEPTH = 3000
+    NUM_CNODES = 6000
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.anchor = synthetic_anchor(cls.DEPTH, cls.NUM_CNODES)
+        cls.result = parse_anchor_xml_file(BytesIO(cls.anchor))
+
+    def test_parse(self):
+        call_tree = self.result.call_tree
+        self.assertEqual(self.NUM_CNODES, len(call_tree.preorder))
+        self.assertEqual(self.DEPTH, call_tree.depths.max())
+        dom_call_tree = parse_anchor_xml(ElementTree.parse(BytesIO(self.anchor))).call_tree
+        for name in ['parents', 'depths', 'child_ranks', 'preorder', 'enter', 'exit', 'callee_region_ids',
+                     'first_children', 'next_siblings']:
+            np.testing.assert_array_equal(getattr(call_tree, name), getattr(dom_call_tree, name), err_msg=name)
+
+    def test_traversal(self):
+        root = self.result.cnodes[0]
+        self.assertEqual([c.id for c in root.get_all_children()], [c.id for c in root.iter_subtree()])
+        self.assertEqual(self.NUM_CNODES - 1, sum(1 for _ in root.iter_subtree(with_self=False)))
+        self.assertTrue(repr(root).startswith('CNode<0, region:<0, chain>, children:[CNode<1, region:<1, leaf>'))
+        self.assertTrue(repr(root).endswith(']>' * self.DEPTH))
+
+    def test_inclusive_values(self):
+        metric_values = MetricValues(
+            metric=self.result.metrics[0],
+            cnode_indices=self.result.call_tree.preorder,
+            values=np.ones(self.NUM_CNODES, dtype=np.uint64),
+            call_tree=self.result.call_tree
+        )
+        root = self.result.cnodes[0]
+        self.assertEqual(self.NUM_CNODES, metric_values.value(root, convert_to_inclusive=True))
+        self.assertEqual(self.NUM_CNODES, metric_values.to_inclusive_matrix()[0, 0])
+
+
 class TestBasicCallTree(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -72,6 +119,95 @@ class TestBasicCallTree(unittest.TestCase):
             cnode = self.cubex.get_cnode(i)
             self.assertEqual(v, cnode.region.mangled_name)
 
+    def test_call_tree_intervals(self):
+        call_tree = self.cubex.get_call_tree()
+        self.assertEqual(list(range(18)), call_tree.subtree(0).tolist())
+        self.assertEqual([2, 3, 4, 5], call_tree.subtree(2).tolist())
+        self.assertEqual([17], call_tree.subtree(17).tolist())
+        for cnode in self.cubex.all_cnodes():
+            descendants = {c.id for c in cnode.get_all_children()}
+            self.assertEqual(descendants, set(call_tree.subtree(cnode.id).tolist()))
+            for other in self.cubex.all_cnodes():
+                self.assertEqual(other.id in descendants, call_tree.is_in_subtree(other.id, cnode.id))
+                self.assertEqual(other.id in descendants and other.id != cnode.id,
+                                 call_tree.is_ancestor(cnode.id, other.id))
+        self.assertEqual([True, False, True], call_tree.is_ancestor(6, [7, 10, 9]).tolist())
+
+    def test_cnode_views(self):
+        call_tree = self.cubex.get_call_tree()
+        self.assertEqual([0], call_tree.roots.tolist())
+        self.assertEqual([1], call_tree.children(0))
+        self.assertEqual([2, 6, 10, 14], call_tree.children(1))
+        self.assertEqual([], call_tree.children(17))
+        self.assertEqual(6, call_tree.next_siblings[2])
+        self.assertEqual(-1, call_tree.next_siblings[14])
+        self.assertIsNone(call_tree.cnode(18))
+
+        cnode = self.cubex.get_cnode(6)
+        self.assertEqual(cnode, call_tree.cnode(6))
+        self.assertNotEqual(cnode, call_tree.cnode(7))
+        self.assertEqual(self.cubex.get_cnode(1), cnode.parent)
+        self.assertIsNone(self.cubex.get_root_cnodes()[0].parent)
+        self.assertEqual('b', cnode.region.mangled_name)
+        self.assertEqual(call_tree.callee_region_ids[6], cnode.region.id)
+        self.assertFalse(hasattr(cnode, '__dict__'))
+        # views cannot be modified
+        with self.assertRaises(TypeError):
+            cnode.parameters['key'] = 'value'
+        with self.assertRaises(TypeError):
+            cnode.add_child(cnode)
+        # neither can the arrays of the call tree, which are shared with the metrics
+        with self.assertRaises(ValueError):
+            call_tree.preorder[0] = 1
+        for metric in self.cubex.all_metrics():
+            self.assertFalse(metric.tree_index_to_cid_map.flags.writeable)
+        for cnode in self.cubex.all_cnodes():
+            for child in cnode.get_children():
+                self.assertEqual(cnode, child.parent)
+
+    def test_indexed_lookups(self):
+        regions = self.cubex._anchor_result.regions
+        for region in regions:
+            expected_cnodes = [cnode for cnode in self.cubex.all_cnodes() if cnode.callee_region_id == region.id]
+            self.assertEqual(expected_cnodes, self.cubex.get_cnodes_for_region(region.id))
+            self.assertEqual([c.id for c in expected_cnodes], self.cubex.get_cnode_ids_for_region(region.id).tolist())
+            # the shared index cannot be modified by callers
+            with self.assertRaises(ValueError):
+                self.cubex.get_cnode_ids_for_region(region.id)[:] = -1
+            self.assertEqual([r for r in regions if r.name == region.name],
+                             self.cubex.get_regions_by_name(region.name))
+            self.assertIs(self.cubex.get_regions_by_name(region.name)[0], self.cubex.get_region_by_name(region.name))
+            self.assertEqual([r for r in regions if r.mangled_name == region.mangled_name],
+                             self.cubex.get_regions_by_mangled_name(region.mangled_name))
+            self.assertEqual([r for r in regions if r.mod == region.mod], self.cubex.get_regions_for_module(region.mod))
+        self.assertEqual([], self.cubex.get_cnodes_for_region(1))
+        self.assertEqual([], self.cubex.get_regions_by_name('unknown'))
+        self.assertRaises(IndexError, self.cubex.get_region_by_name, 'unknown')
+        self.assertEqual(self.cubex.all_cnodes(), self.cubex.all_cnodes())
+        self.assertIsNot(self.cubex.all_cnodes(), self.cubex.all_cnodes())
+
+    def test_print_calltree(self):
+        calltree = self.cubex.get_calltree()
+        self.assertTrue(calltree.startswith('test.x\n-main\n--signed char\n---a1\n---a2\n'))
+        self.assertEqual(18, calltree.count('\n'))
+        self.assertEqual('-bool\n--b1\n--b2\n--b3\n', self.cubex.get_calltree(1, self.cubex.get_cnode(6)))
+
+    def test_subtree_values(self):
+        metric_values = self.cubex.get_metric_values(self.cubex.get_metric_by_name('visits'), cache=False)
+        for cnode in self.cubex.all_cnodes():
+            self.assertEqual(metric_values.cnode_values(cnode, convert_to_inclusive=True).tolist(),
+                             metric_values.subtree_values(cnode).tolist())
+
+    def test_subtree_min_max_values(self):
+        visits = self.cubex.get_metric_values(self.cubex.get_metric_by_name('visits'), cache=False)
+        for values_type in [MinValues, MaxValues]:
+            metric_values = MetricValues(metric=visits.metric, cnode_indices=list(visits.cnode_indices),
+                                         values=values_type(visits.values.copy()), call_tree=visits.call_tree)
+            for cnode in self.cubex.all_cnodes():
+                self.assertEqual(
+                    metric_values.cnode_values(cnode, convert_to_inclusive=True)._values.tolist(),
+                    metric_values.subtree_values(cnode)._values.tolist())
+
     def _walk_cnode_tree(self, cnodes):
 
         callpaths = {}
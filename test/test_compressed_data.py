@@ -0,0 +1,200 @@
+import io
+import struct
+import tarfile
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from pycubexr import CubexParser
+from pycubexr.classes import LazyMetricValues
+from pycubexr.parsers.data_parser import DATA_HEADER, ZDATA_HEADER, decompress_data
+from pycubexr.parsers.index_parser import parse_index
+from pycubexr.utils.exceptions import MissingMetricError
+
+from helpers import raw_values
+
+
+def compress_data(raw: bytes, num_segments: int, endianness_format_char='<', positions_in_bytes=True):
+    # Creates a ZCUBEX.DATA file with one segment per cnode, like the CubeWriter does
+    segment_size = len(raw) // num_segments
+    segments = [zlib.compress(raw[i * segment_size:(i + 1) * segment_size]) for i in range(num_segments)]
+    headers = []
+    compressed_pos = 0
+    for i, segment in enumerate(segments):
+        uncompressed_pos = i * segment_size if positions_in_bytes else i
+        headers += [uncompressed_pos, compressed_pos, len(segment)]
+        compressed_pos += len(segment)
+    return (ZDATA_HEADER + struct.pack(endianness_format_char + 'q', num_segments) +
+            struct.pack(endianness_format_char + str(len(headers)) + 'q', *headers) + b''.join(segments))
+
+
+def compress_cube(source: Path, target: Path):
+    with tarfile.open(source) as source_file, tarfile.open(target, 'w') as target_file:
+        members = {member.name: member for member in source_file.getmembers()}
+        for name, member in members.items():
+            content = source_file.extractfile(member).read()
+            if name.endswith('.data'):
+                with source_file.extractfile(name[:-len('.data')] + '.index') as index_file:
+                    index = parse_index(index_file)
+                assert content.startswith(DATA_HEADER)
+                content = compress_data(content[len(DATA_HEADER):], len(index.tree_indices), index.endianness_format)
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            target_file.addfile(info, io.BytesIO(content))
+
+
+class TestCompressedData(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+        cls.compressed_file_path = Path(cls.temp_dir.name) / 'compressed.cubex'
+        compress_cube(cls.cubex_file_path, cls.compressed_file_path)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp_dir.cleanup()
+
+    def test_decompress_data(self):
+        raw = np.arange(6 * 64, dtype=np.float64).tobytes()
+        for max_workers in [1, 4, None]:
+            with self.subTest(max_workers=max_workers):
+                data_file = io.BytesIO(compress_data(raw, 6)[len(ZDATA_HEADER):])
+                self.assertEqual(raw, bytes(decompress_data(data_file, '<', max_workers)))
+
+    def test_decompress_data_unexpected_positions(self):
+        raw = np.arange(6 * 64, dtype=np.float64).tobytes()
+        for max_workers in [1, None]:
+            with self.subTest(max_workers=max_workers), \
+                    mock.patch('pycubexr.parsers.data_parser.zlib.decompress', wraps=zlib.decompress) as decompress:
+                data_file = io.BytesIO(compress_data(raw, 6, positions_in_bytes=False)[len(ZDATA_HEADER):])
+                self.assertEqual(raw, bytes(decompress_data(data_file, '<', max_workers)))
+                # the segments are not inflated again for the fallback
+                self.assertEqual(6, decompress.call_count)
+
+    def test_compressed_values(self):
+        with CubexParser(self.cubex_file_path) as cubex, \
+                CubexParser(self.compressed_file_path, decompression_workers=4) as compressed_cubex:
+            for metric in cubex.get_metrics():
+                with self.subTest(metric=metric.name):
+                    try:
+                        expected = cubex.get_metric_values(metric)
+                    except MissingMetricError:
+                        continue
+                    actual = compressed_cubex.get_metric_values(compressed_cubex.get_metric_by_name(metric.name))
+                    self.assertEqual(expected.cnode_indices, actual.cnode_indices)
+                    np.testing.assert_array_equal(raw_values(expected.values), raw_values(actual.values))
+
+    def test_lazy_values(self):
+        with CubexParser(self.cubex_file_path) as cubex, CubexParser(self.compressed_file_path) as compressed_cubex:
+            metric = cubex.get_metric_by_name('time')
+            expected = cubex.get_metric_values(metric)
+            actual = compressed_cubex.get_metric_values(compressed_cubex.get_metric_by_name('time'), lazy=True)
+            self.assertIsInstance(actual, LazyMetricValues)
+            self.assertEqual(expected.num_locations(), actual.num_locations())
+
+            cnode = compressed_cubex.get_root_cnodes()[0].get_children()[0]
+            np.testing.assert_array_equal(expected.cnode_values(cnode), actual.cnode_values(cnode))
+            self.assertLess(len(actual._segment_values), len(actual.cnode_indices))
+            for cnode in cubex.all_cnodes():
+                np.testing.assert_array_almost_equal(expected.cnode_values(cnode, convert_to_inclusive=True),
+                                                     actual.cnode_values(cnode, convert_to_inclusive=True))
+                self.assertAlmostEqual(expected.value(cnode), actual.value(cnode))
+
+            np.testing.assert_array_equal(expected.values, actual.values)
+            self.assertEqual(0, len(actual._segment_values))
+
+    def test_lazy_nbytes(self):
+        def expected_nbytes(metric_values):
+            # the sizes of all segments, as computed before they were tracked
+            nbytes = sum(segment.nbytes for segment in metric_values._compressed_data.segments)
+            nbytes += sum(raw_values(values).nbytes for values in metric_values._segment_values.values())
+            if metric_values._values is not None:
+                nbytes += raw_values(metric_values._values).nbytes
+            return nbytes
+
+        with CubexParser(self.compressed_file_path) as compressed_cubex:
+            metric_values = compressed_cubex.get_metric_values(compressed_cubex.get_metric_by_name('time'), lazy=True)
+            self.assertEqual(expected_nbytes(metric_values), metric_values.nbytes)
+
+            cnodes = compressed_cubex.all_cnodes()[:3]
+            for cnode in cnodes + cnodes:
+                metric_values.cnode_values(cnode)
+            self.assertEqual(expected_nbytes(metric_values), metric_values.nbytes)
+
+            metric_values.values
+            self.assertEqual(0, len(metric_values._segment_values))
+            self.assertEqual(expected_nbytes(metric_values), metric_values.nbytes)
+
+    def test_reduced_values(self):
+        with CubexParser(self.cubex_file_path) as cubex, \
+                CubexParser(self.compressed_file_path, decompression_workers=4) as compressed_cubex:
+            for metric in cubex.get_metrics():
+                with self.subTest(metric=metric.name):
+                    try:
+                        expected = cubex.get_metric_values(metric)
+                    except MissingMetricError:
+                        continue
+                    compressed_metric = compressed_cubex.get_metric_by_name(metric.name)
+                    matrix = raw_values(expected.as_matrix())
+                    actual = compressed_cubex.get_metric_values(compressed_metric, reduce='sum')
+                    self.assertEqual(1, actual.num_locations())
+                    self.assertEqual(expected.cnode_indices, actual.cnode_indices)
+                    np.testing.assert_allclose(matrix.sum(axis=1), raw_values(actual.values))
+                    self.assertIs(actual, compressed_cubex.get_metric_values(compressed_metric, reduce='sum'))
+
+                    actual = compressed_cubex.get_metric_values(compressed_metric, reduce=('location_group', 'max'))
+                    self.assertEqual(len(cubex.get_location_table().location_groups), actual.num_locations())
+                    np.testing.assert_array_equal(
+                        raw_values(expected.reduce_locations('location_group', 'max').values),
+                        raw_values(actual.values))
+                    # only the reduced values are kept
+                    self.assertNotIn((compressed_metric.id, False), compressed_cubex.get_metric_cache())
+
+            metric_values = compressed_cubex.get_metric_values(compressed_cubex.get_metric_by_name('time'),
+                                                               reduce='sum')
+            expected = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            for cnode in cubex.all_cnodes():
+                self.assertAlmostEqual(expected.value(cnode, convert_to_inclusive=True),
+                                       metric_values.value(cnode, convert_to_inclusive=True))
+
+    def test_selected_locations(self):
+        with CubexParser(self.cubex_file_path) as cubex, CubexParser(self.compressed_file_path) as compressed_cubex:
+            location_table = cubex.get_location_table()
+            mask = location_table.ranks % 8 == 0
+            selections = [([5, 3, 60], [5, 3, 60]), (mask, np.flatnonzero(mask)), (slice(10, 20), np.arange(10, 20)),
+                          (cubex.get_locations()[2:4], [2, 3])]
+            for metric in cubex.get_metrics():
+                for locations, positions in selections:
+                    with self.subTest(metric=metric.name, locations=locations):
+                        try:
+                            expected = cubex.get_metric_values(metric)
+                        except MissingMetricError:
+                            continue
+                        compressed_metric = compressed_cubex.get_metric_by_name(metric.name)
+                        actual = compressed_cubex.get_metric_values(compressed_metric, locations=locations)
+                        self.assertEqual(len(positions), actual.num_locations())
+                        self.assertEqual(location_table.ids[positions].tolist(), actual.location_table.ids.tolist())
+                        np.testing.assert_array_equal(raw_values(expected.as_matrix())[:, positions],
+                                                      raw_values(actual.as_matrix()))
+                        np.testing.assert_array_equal(
+                            raw_values(actual.as_matrix()),
+                            raw_values(cubex.get_metric_values(metric, locations=locations).as_matrix()))
+                        self.assertNotIn((compressed_metric.id, False), compressed_cubex.get_metric_cache())
+
+            metric = compressed_cubex.get_metric_by_name('time')
+            actual = compressed_cubex.get_metric_values(metric, locations=mask, reduce=('location_group', 'sum'))
+            expected = cubex.get_metric_values(cubex.get_metric_by_name('time')).reduce_locations('location_group')
+            group_indices = location_table.location_group_indices[mask]
+            np.testing.assert_allclose(raw_values(expected.as_matrix())[:, group_indices],
+                                       raw_values(actual.as_matrix())[:, group_indices])
+            with self.assertRaises(KeyError):
+                compressed_cubex.get_metric_values(metric, locations=[1000])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import errno
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from pycubexr import CubexParser
+from pycubexr.utils.disk_cache import DiskCache
+from pycubexr.utils.exceptions import MissingMetricError
+
+from helpers import raw_values
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(self.temp_dir.name)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_cached_values(self):
+        path = Path("../data/blast.p64.r1/profile.cubex")
+        with CubexParser(path) as cubex:
+            expected = {metric.name: metric_values
+                        for metric, metric_values in cubex.get_all_metric_values().items()}
+            expected_calltree = cubex.get_calltree()
+
+        for _ in range(2):
+            with CubexParser(path, disk_cache=self.cache) as cubex:
+                self.assertEqual(expected_calltree, cubex.get_calltree())
+                self.assertFalse(cubex.get_call_tree().preorder.flags.writeable)
+                for metric in cubex.get_metrics():
+                    try:
+                        actual = cubex.get_metric_values(metric)
+                    except MissingMetricError:
+                        self.assertNotIn(metric.name, expected)
+                        continue
+                    self.assertEqual(expected[metric.name].cnode_indices, actual.cnode_indices)
+                    self.assertEqual(type(expected[metric.name].values), type(actual.values))
+                    for cnode in cubex.all_cnodes():
+                        np.testing.assert_array_equal(raw_values(expected[metric.name].cnode_values(cnode)),
+                                                      raw_values(actual.cnode_values(cnode)))
+
+        entry = self.cache.entry(path)
+        self.assertIsNotNone(entry.load_object('anchor'))
+        self.assertIsInstance(entry.load_array('metric-0-0-values'), np.memmap)
+
+    def test_eviction(self):
+        self.cache.max_size = 1024
+        paths = [Path("../data/call_tree_test/call_tree_test.cubex"), Path("../data/blast.p64.r1/profile.cubex")]
+        for path in paths:
+            with CubexParser(path, disk_cache=self.cache) as cubex:
+                cubex.get_metric_values(cubex.get_metric_by_name('time'))
+        # only the most recently used entry is kept, even if it exceeds the maximum size
+        self.assertIsNone(self.cache.entry(paths[0]).load_object('anchor'))
+        self.assertIsNotNone(self.cache.entry(paths[1]).load_object('anchor'))
+
+    def test_evicted_once(self):
+        path = Path("../data/blast.p64.r1/profile.cubex")
+        with mock.patch.object(DiskCache, 'evict') as evict:
+            with CubexParser(path, disk_cache=self.cache) as cubex:
+                cubex.get_all_metric_values()
+                evict.assert_not_called()
+            evict.assert_called_once()
+            # nothing is stored when all data comes from the cache
+            with CubexParser(path, disk_cache=self.cache) as cubex:
+                cubex.get_all_metric_values()
+            evict.assert_called_once()
+
+    def test_failed_store(self):
+        path = Path("../data/blast.p64.r1/profile.cubex")
+        with mock.patch('pycubexr.utils.disk_cache.tempfile.mkstemp', side_effect=OSError(errno.ENOSPC, 'Full')):
+            with CubexParser(path, disk_cache=self.cache) as cubex, self.assertLogs(level='WARNING'):
+                # the values are loaded even if they cannot be stored
+                metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+        with CubexParser(path) as cubex:
+            np.testing.assert_array_equal(cubex.get_metric_values(cubex.get_metric_by_name('time')).values,
+                                          metric_values.values)
+        self.assertIsNone(self.cache.entry(path).load_object('anchor'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from pycubexr import CubexParser, load_experiments
+from pycubexr.utils.exceptions import MissingMetricError
+
+PATHS = [
+    Path("../data/blast.p64.r1/profile.cubex").resolve(),
+    Path("../data/kripke.p8.d2.g32.r1/profile.cubex").resolve(),
+    Path("../data/time.p4.n2000.x1.r0/profile.cubex").resolve(),
+    Path("../data/call_tree_test/call_tree_test.cubex").resolve(),
+]
+
+
+def sum_exclusive(cubex, metric, metric_values):
+    return metric_values.values_all(convert_to_exclusive=True)
+
+
+class TestExperimentLoader(unittest.TestCase):
+
+    def test_load_experiments(self):
+        for processes in [1, 2]:
+            with self.subTest(processes=processes):
+                results = dict(load_experiments(PATHS, ['time', 'visits', 'unknown'], sum_exclusive,
+                                                processes=processes, max_pending=2))
+                self.assertEqual(set(PATHS), set(results))
+                for path in PATHS:
+                    with CubexParser(path) as cubex:
+                        self.assertEqual({'time', 'visits'}, set(results[path]))
+                        for name, values in results[path].items():
+                            metric_values = cubex.get_metric_values(cubex.get_metric_by_name(name))
+                            for cnode in cubex.all_cnodes():
+                                self.assertAlmostEqual(metric_values.value(cnode, convert_to_exclusive=True),
+                                                       values[cnode.id])
+
+    def test_load_all_metrics(self):
+        path, results = next(load_experiments(PATHS[:1], processes=2))
+        with CubexParser(path) as cubex:
+            for metric in cubex.all_metrics():
+                try:
+                    metric_values = cubex.get_metric_values(metric)
+                except MissingMetricError:
+                    self.assertNotIn(metric.name, results)
+                    continue
+                np.testing.assert_allclose(metric_values.values_all(), results[metric.name].astype(float))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,7 +23,9 @@ class TestExtraPUseCase(unittest.TestCase):
                 # iterate over all metrics
                 for cube_metric in parsed.get_metrics():
                     try:
-                        metric_values = parsed.get_metric_values(metric=cube_metric, cache=False)
+                        # strong scaling only needs the sum over all locations, which is calculated while loading
+                        metric_values = parsed.get_metric_values(metric=cube_metric, cache=False,
+                                                                 reduce='sum' if scaling_type == 'strong' else None)
                         # create the metrics
                         metric = cube_metric.name
 
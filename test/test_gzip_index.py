@@ -0,0 +1,117 @@
+import gzip
+import io
+import random
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from pycubexr import CubexParser
+from pycubexr.utils.disk_cache import DiskCache
+from pycubexr.utils.exceptions import MissingMetricError
+from pycubexr.utils.gzip_index import GzipIndex, GzipIndexedFile
+
+from helpers import raw_values
+
+
+class CountingFile(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class TestGzipIndex(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        self.data = bytes(rng.getrandbits(8) for _ in range(200_000)) + bytes(100_000) + \
+            b''.join(str(i).encode() for i in range(50_000))
+        # two gzip members followed by padding
+        self.compressed = gzip.compress(self.data[:150_000]) + gzip.compress(self.data[150_000:]) + bytes(16)
+
+    def test_random_access(self):
+        compressed_file = CountingFile(self.compressed)
+        raw_file = GzipIndexedFile(compressed_file, GzipIndex(spacing=32 * 1024))
+        indexed_file = io.BufferedReader(raw_file)
+        self.assertEqual(self.data, indexed_file.read())
+        self.assertEqual(len(self.data), raw_file.index.size)
+        self.assertGreater(len(raw_file.index), len(self.data) // (64 * 1024))
+
+        rng = random.Random(0)
+        for _ in range(200):
+            position, size = rng.randrange(len(self.data) + 10), rng.randrange(10_000)
+            compressed_file.bytes_read = 0
+            indexed_file.seek(position)
+            self.assertEqual(self.data[position:position + size], indexed_file.read(size))
+            # only the data after the closest checkpoint is inflated, checkpoints are taken between chunks
+            self.assertLess(compressed_file.bytes_read, 4 * 32 * 1024 + size)
+        self.assertEqual(len(self.data), indexed_file.seek(0, io.SEEK_END))
+
+
+class TestGzipCompressedCube(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+        cls.gzip_file_path = Path(cls.temp_dir.name) / 'profile.cubex.gz'
+        cls.gzip_file_path.write_bytes(gzip.compress(cls.cubex_file_path.read_bytes()))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp_dir.cleanup()
+
+    def test_values(self):
+        with CubexParser(self.cubex_file_path) as cubex, \
+                CubexParser(self.gzip_file_path, gzip_checkpoint_spacing=16 * 1024) as gzip_cubex:
+            self.assertGreater(len(gzip_cubex._gzip_file.index), 5)
+            # reversed, so that every member is before the previous one
+            for metric in reversed(cubex.get_metrics()):
+                with self.subTest(metric=metric.name):
+                    try:
+                        expected = cubex.get_metric_values(metric)
+                    except MissingMetricError:
+                        continue
+                    actual = gzip_cubex.get_metric_values(gzip_cubex.get_metric_by_name(metric.name))
+                    self.assertEqual(expected.cnode_indices, actual.cnode_indices)
+                    np.testing.assert_array_equal(raw_values(expected.values), raw_values(actual.values))
+            self.assertEqual(cubex.get_calltree(), gzip_cubex.get_calltree())
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            disk_cache = DiskCache(cache_dir)
+            with CubexParser(self.gzip_file_path, disk_cache=disk_cache) as cubex:
+                cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            # the member table comes from the cache, the values are extracted with a new index
+            with CubexParser(self.cubex_file_path) as cubex, \
+                    CubexParser(self.gzip_file_path, disk_cache=disk_cache) as gzip_cubex:
+                expected = cubex.get_metric_values(cubex.get_metric_by_name('visits'))
+                actual = gzip_cubex.get_metric_values(gzip_cubex.get_metric_by_name('visits'))
+                self.assertEqual(expected.cnode_indices, actual.cnode_indices)
+                np.testing.assert_array_equal(raw_values(expected.values), raw_values(actual.values))
+
+    def test_invalid_archive(self):
+        invalid_file_path = Path(self.temp_dir.name) / 'invalid.cubex.gz'
+        invalid_file_path.write_bytes(gzip.compress(bytes(range(256)) * 16))
+        opened_files = []
+
+        def recording_open(*args, **kwargs):
+            opened_files.append(open(*args, **kwargs))
+            return opened_files[-1]
+
+        with mock.patch('pycubexr.parsers.tar_parser.open', recording_open, create=True):
+            # the fallback without checksums fails with a ValueError
+            with self.assertRaises((tarfile.ReadError, ValueError)):
+                CubexParser(invalid_file_path).__enter__()
+        self.assertEqual(1, len(opened_files))
+        self.assertTrue(opened_files[0].closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
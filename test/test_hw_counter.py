@@ -2,6 +2,7 @@ import unittest
 from pathlib import Path
 
 from pycubexr import CubexParser
+from pycubexr.utils.exceptions import MissingMetricError
 
 
 class TestHWCounterMeasurements1(unittest.TestCase):
@@ -49,6 +50,26 @@ class TestHWCounterMeasurements1(unittest.TestCase):
         values = [metric_values.value(cnode) for cnode in self.cubex.all_cnodes()]
         self.assertTrue(all(v >= 0 for v in values))
         self.assertTrue(any(v >= 0xFFFF_FFFF_FFFF_FFFF for v in values))
+        all_values = metric_values.values_all()
+        self.assertEqual(values, [all_values[cnode.id] for cnode in self.cubex.all_cnodes()])
+
+    def test_values_all(self):
+        for metric in self.cubex.get_metrics():
+            try:
+                metric_values = self.cubex.get_metric_values(metric, cache=False)
+            except MissingMetricError:
+                continue
+            for convert_to_exclusive, convert_to_inclusive in [(False, False), (True, False), (False, True)]:
+                with self.subTest(metric=metric.name, exclusive=convert_to_exclusive, inclusive=convert_to_inclusive):
+                    all_values = metric_values.values_all(convert_to_exclusive, convert_to_inclusive)
+                    all_means = metric_values.means_all(convert_to_exclusive, convert_to_inclusive)
+                    for cnode in self.cubex.all_cnodes():
+                        self.assertAlmostEqual(
+                            metric_values.value(cnode, convert_to_exclusive, convert_to_inclusive),
+                            all_values[cnode.id])
+                        self.assertAlmostEqual(
+                            metric_values.mean(cnode, convert_to_exclusive, convert_to_inclusive),
+                            all_means[cnode.id])
 
 
 class TestHWCounterMeasurements2(unittest.TestCase):
@@ -0,0 +1,99 @@
+import unittest
+from pathlib import Path
+
+from pycubexr import CubexParser
+from pycubexr.utils.metric_cache import MetricCache, LFUMetricCache
+
+
+class TestMetricCache(unittest.TestCase):
+    cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+
+    def setUp(self):
+        with CubexParser(self.cubex_file_path) as cubex:
+            self.metric_names = ['time', 'visits', 'bytes_sent']
+            self.nbytes = {name: cubex.get_metric_values(cubex.get_metric_by_name(name)).nbytes
+                           for name in self.metric_names}
+
+    def load(self, cubex: CubexParser, *names: str):
+        for name in names:
+            cubex.get_metric_values(cubex.get_metric_by_name(name))
+
+    def cached_names(self, cubex: CubexParser):
+        return {metric.name for metric in cubex.get_metrics() if (metric.id, False) in cubex.get_metric_cache()}
+
+    def test_lru(self):
+        cache = MetricCache(max_bytes=self.nbytes['time'] + self.nbytes['visits'])
+        with CubexParser(self.cubex_file_path, cache=cache) as cubex:
+            self.load(cubex, 'time', 'visits', 'time', 'bytes_sent')
+            self.assertEqual({'time', 'bytes_sent'}, self.cached_names(cubex))
+            self.assertLessEqual(cache.nbytes, cache.max_bytes)
+            self.assertEqual((1, 3, 1), (cache.hits, cache.misses, cache.evictions))
+
+    def test_lfu(self):
+        cache = LFUMetricCache(max_bytes=self.nbytes['time'] + self.nbytes['visits'])
+        with CubexParser(self.cubex_file_path, cache=cache) as cubex:
+            self.load(cubex, 'visits', 'visits', 'time', 'bytes_sent')
+            self.assertEqual({'visits', 'bytes_sent'}, self.cached_names(cubex))
+            self.assertEqual(1, cache.evictions)
+
+    def test_pin_and_evict(self):
+        cache = MetricCache(max_bytes=0)
+        with CubexParser(self.cubex_file_path, cache=cache) as cubex:
+            time = cubex.get_metric_by_name('time')
+            cache.pin(time)
+            self.load(cubex, 'time', 'visits')
+            self.assertEqual({'time'}, self.cached_names(cubex))
+            self.assertEqual(self.nbytes['time'], cache.nbytes)
+            cache.evict(time)
+            self.assertEqual(0, len(cache))
+            self.assertEqual(0, cache.nbytes)
+
+    def test_disabled(self):
+        with CubexParser(self.cubex_file_path, cache=False) as cubex:
+            metric = cubex.get_metric_by_name('time')
+            self.assertIsNot(cubex.get_metric_values(metric), cubex.get_metric_values(metric))
+            self.assertEqual(0, len(cubex.get_metric_cache()))
+        with CubexParser(self.cubex_file_path) as cubex:
+            metric = cubex.get_metric_by_name('time')
+            uncached = cubex.get_metric_values(metric, cache=False)
+            self.assertIsNot(uncached, cubex.get_metric_values(metric))
+            self.assertIs(cubex.get_metric_values(metric), cubex.get_metric_values(metric, cache=False))
+
+    def test_reduced_counters(self):
+        cache = MetricCache()
+        with CubexParser(self.cubex_file_path, cache=cache) as cubex:
+            time = cubex.get_metric_by_name('time')
+            cubex.get_metric_values(time, reduce='sum')
+            self.assertEqual((0, 1), (cache.hits, cache.misses))
+            cubex.get_metric_values(time, reduce='sum')
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+        with CubexParser(self.cubex_file_path, cache=False) as cubex:
+            time = cubex.get_metric_by_name('time')
+            cubex.get_metric_values(time)
+            cubex.get_metric_values(time)
+            # nothing is stored, so nothing is evicted
+            self.assertEqual((0, 2, 0), (cubex.get_metric_cache().hits, cubex.get_metric_cache().misses,
+                                         cubex.get_metric_cache().evictions))
+
+    def test_shared_cache(self):
+        cache = MetricCache()
+        with CubexParser(self.cubex_file_path, cache=cache) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+        # a given cache is not cleared on exit
+        self.assertEqual(1, len(cache))
+        with CubexParser(self.cubex_file_path, cache=cache) as cubex:
+            self.assertIs(metric_values, cubex.get_metric_values(cubex.get_metric_by_name('time')))
+
+    def test_converted_values(self):
+        with CubexParser(self.cubex_file_path) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            nbytes = cubex.get_metric_cache().nbytes
+            metric_values.to_inclusive_matrix()
+            # the size of the entry is updated when it is accessed again
+            cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            self.assertGreater(cubex.get_metric_cache().nbytes, nbytes)
+            self.assertEqual(metric_values.nbytes, cubex.get_metric_cache().nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,12 +4,18 @@ import unittest
 from itertools import groupby
 from operator import itemgetter
 from pathlib import Path
+from unittest import mock
 from zipfile import ZipFile
 
+import numpy as np
+
 from pycubexr import CubexParser
-from pycubexr.classes.values import CubeValues
+from pycubexr.classes import MetricValues
+from pycubexr.classes.values import CubeValues, MinMaxValues
 from pycubexr.utils.exceptions import MissingMetricError
 
+from helpers import raw_values
+
 
 class TestMetricValues(unittest.TestCase):
     def test_time_example(self):
@@ -42,6 +48,18 @@ class TestMetricValues(unittest.TestCase):
             with open(incl_file_path) as incl:
                 self.check_against_csv_dump(cubex, incl, inclusive=True)
 
+    def test_blast_example_memory_mapped(self):
+        cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+        excl_file_path = Path("../data/blast.p64.r1/excl.csv").resolve()
+        incl_file_path = Path("../data/blast.p64.r1/incl.csv").resolve()
+        with CubexParser(cubex_file_path, memory_map=True) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            self.assertIsInstance(metric_values.values.base, np.memmap)
+            with open(excl_file_path) as excl:
+                self.check_against_csv_dump(cubex, excl)
+            with open(incl_file_path) as incl:
+                self.check_against_csv_dump(cubex, incl, inclusive=True)
+
     def test_miniFE_example(self):
         cubex_file_path = Path("../data/miniFE/profile.cubex").resolve()
         csv_file_path = Path("../data/miniFE/csv.zip").resolve()
@@ -92,3 +110,162 @@ class TestMetricValues(unittest.TestCase):
                     self.assertTrue(all(int(r[metric_index]) == 0 for r in csvreader),
                                     msg=f"Metric {metric_name} was signaled as missing even though it should contain "
                                         f"values.")
+
+
+class TestBulkLoading(unittest.TestCase):
+    def test_all_metric_values(self):
+        cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+        with CubexParser(cubex_file_path) as cubex, CubexParser(cubex_file_path) as bulk_cubex:
+            all_metric_values = bulk_cubex.get_all_metric_values(max_workers=4)
+            for metric in cubex.get_metrics():
+                bulk_metric = bulk_cubex.get_metric_by_name(metric.name)
+                try:
+                    expected = cubex.get_metric_values(metric)
+                except MissingMetricError:
+                    self.assertNotIn(bulk_metric, all_metric_values)
+                    continue
+                actual = all_metric_values[bulk_metric]
+                self.assertIs(actual, bulk_cubex.get_metric_values(bulk_metric))
+                self.assertEqual(expected.cnode_indices, actual.cnode_indices)
+                np.testing.assert_array_equal(raw_values(expected.as_matrix()), raw_values(actual.as_matrix()))
+
+    def test_selected_metric_values(self):
+        cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+        with CubexParser(cubex_file_path) as cubex:
+            metrics = [cubex.get_metric_by_name('time'), cubex.get_metric_by_name('visits')]
+            all_metric_values = cubex.get_all_metric_values(metrics, cache=False)
+            self.assertEqual(metrics, list(all_metric_values))
+            self.assertEqual(0, len(cubex.get_metric_cache()))
+
+
+class TestMatrixView(unittest.TestCase):
+    def test_as_matrix(self):
+        with CubexParser(Path("../data/blast.p64.r1/profile.cubex").resolve()) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            matrix = metric_values.as_matrix()
+            self.assertEqual((len(metric_values.cnode_indices), metric_values.num_locations()), matrix.shape)
+            self.assertTrue(np.shares_memory(matrix, metric_values.values))
+            for cnode in cubex.all_cnodes():
+                row = metric_values.cnode_rows[cnode.id]
+                self.assertEqual(metric_values.cnode_indices.get(cnode.id, -1), row)
+                if row >= 0:
+                    np.testing.assert_array_equal(metric_values.cnode_values(cnode), matrix[row])
+
+    def test_take(self):
+        with CubexParser(Path("../data/call_tree_test/call_tree_test.cubex").resolve()) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('visits'))
+            cnodes = [cubex.get_cnode(3), cubex.get_cnode(0), cubex.get_cnode(17)]
+            expected = np.array([metric_values.cnode_values(cnode) for cnode in cnodes])
+            np.testing.assert_array_equal(expected, metric_values.take(cnodes))
+            np.testing.assert_array_equal(expected, metric_values.take(np.array([3, 0, 17])))
+            np.testing.assert_array_equal(expected[:, [0]], metric_values.take(cnodes, [0]))
+            np.testing.assert_array_equal(expected[:, :1], metric_values.take(cnodes, slice(0, 1)))
+            mask = np.zeros(metric_values.num_locations(), dtype=bool)
+            mask[0] = True
+            np.testing.assert_array_equal(expected[:, mask], metric_values.take(cnodes, mask))
+            np.testing.assert_array_equal(metric_values.as_matrix(), metric_values.take())
+            np.testing.assert_array_equal(np.zeros((1, metric_values.num_locations())), metric_values.take([1000]))
+
+    def test_values_all_without_conversion(self):
+        with CubexParser(Path("../data/call_tree_test/call_tree_test.cubex").resolve()) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('visits'))
+            # the values are not copied into a matrix of all cnodes if they are not converted
+            with mock.patch.object(MetricValues, '_cnode_matrix', side_effect=AssertionError):
+                all_values = metric_values.values_all(convert_to_exclusive=True)
+                all_means = metric_values.means_all()
+                aggregated = metric_values.aggregate(0)
+            for cnode in cubex.all_cnodes():
+                self.assertEqual(metric_values.value(cnode), all_values[cnode.id])
+                self.assertAlmostEqual(metric_values.mean(cnode), all_means[cnode.id])
+                self.assertEqual(metric_values.value(cnode), aggregated[cnode.id, 0])
+            np.testing.assert_array_equal(metric_values.to_exclusive_matrix().sum(axis=1), all_values)
+
+
+class TestAggregation(unittest.TestCase):
+    def test_location_groups(self):
+        # two processes with four threads each
+        with CubexParser(Path("../data/bt-mz_sum.p2.r1/cube4.8_with_checksum_bug.cubex").resolve()) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            matrix = metric_values.to_exclusive_matrix()
+            table = cubex.get_location_table()
+            for op, function in [('sum', np.sum), ('max', np.max), ('min', np.min), ('mean', np.mean)]:
+                with self.subTest(op=op):
+                    aggregated = metric_values.aggregate('location_group', op, convert_to_exclusive=True)
+                    self.assertEqual((len(matrix), 2), aggregated.shape)
+                    for group_index in range(2):
+                        expected = function(matrix[:, table.location_group_indices == group_index], axis=1)
+                        np.testing.assert_allclose(expected, aggregated[:, group_index])
+            np.testing.assert_allclose(metric_values.aggregate('location_group', max),
+                                       metric_values.aggregate('location_group', 'max'))
+
+    def test_reduced_locations(self):
+        with CubexParser(Path("../data/bt-mz_sum.p2.r1/cube4.8_with_checksum_bug.cubex").resolve()) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            reduced = metric_values.reduce_locations('location_group')
+            self.assertEqual(2, reduced.num_locations())
+            self.assertIsNone(reduced.location_table)
+            cnode_ids = np.fromiter(reduced.cnode_indices, dtype=np.int64)
+            np.testing.assert_allclose(metric_values.aggregate('location_group')[cnode_ids], reduced.as_matrix())
+            # the columns of reduced values are groups, not locations
+            with self.assertRaises(ValueError):
+                reduced.reduce_locations()
+            with self.assertRaises(ValueError):
+                reduced.select_locations(slice(1))
+
+    def test_system_tree_levels(self):
+        with CubexParser(Path("../data/time.p4.n2000.x1.r0/profile.cubex").resolve()) as cubex:
+            metric_values = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            inclusive = metric_values.to_inclusive_matrix()
+            np.testing.assert_allclose(inclusive.sum(axis=1, keepdims=True),
+                                       metric_values.aggregate(0, convert_to_inclusive=True))
+            # the root node contains no locations itself
+            by_node = metric_values.aggregate('system_tree_node', convert_to_inclusive=True)
+            np.testing.assert_array_equal(np.zeros(len(inclusive)), by_node[:, 0])
+            np.testing.assert_allclose(by_node[:, 1:], metric_values.aggregate(1, convert_to_inclusive=True))
+            self.assertTrue(np.all(np.isnan(metric_values.aggregate('system_tree_node', 'mean')[:, 0])))
+            self.assertEqual((len(inclusive), 0), metric_values.aggregate(2).shape)
+            with self.assertRaises(ValueError):
+                metric_values.aggregate('process')
+
+
+class TestConversionMatrix(unittest.TestCase):
+    def test_call_tree_example(self):
+        self.check_against_cnode_values(Path("../data/call_tree_test/call_tree_test.cubex").resolve())
+
+    def test_blast_example(self):
+        self.check_against_cnode_values(Path("../data/blast.p64.r1/profile.cubex").resolve())
+
+    def test_hw_counter_example(self):
+        self.check_against_cnode_values(Path("../data/hw_counter/L2_DCM_negative.cubex").resolve())
+        self.check_against_cnode_values(Path("../data/hw_counter/L3_DCA_negative.cubex").resolve())
+
+    def check_against_cnode_values(self, cubex_file_path):
+        with CubexParser(cubex_file_path) as cubex:
+            for metric in cubex.get_metrics():
+                for inclusive in [True, False]:
+                    with self.subTest(metric=metric.name, inclusive=inclusive):
+                        try:
+                            metric_values = cubex.get_metric_values(metric, cache=False)
+                        except MissingMetricError:
+                            continue
+                        expected = [metric_values.cnode_values(cnode, convert_to_exclusive=not inclusive,
+                                                               convert_to_inclusive=inclusive)
+                                    for cnode in cubex.all_cnodes()]
+                        if inclusive:
+                            matrix = metric_values.to_inclusive_matrix()
+                        else:
+                            matrix = metric_values.to_exclusive_matrix()
+                        for cnode, expected_values in zip(cubex.all_cnodes(), expected):
+                            self.assert_values_equal(expected_values, matrix[cnode.id])
+                            self.assert_values_equal(expected_values, metric_values.cnode_values(
+                                cnode, convert_to_exclusive=not inclusive, convert_to_inclusive=inclusive))
+
+    def assert_values_equal(self, expected, actual):
+        if isinstance(expected, MinMaxValues):
+            self.assertIs(type(expected), type(actual))
+        if isinstance(expected, CubeValues):
+            expected, actual = expected._values, actual._values
+        if np.issubdtype(expected.dtype, np.integer):
+            np.testing.assert_array_equal(expected, actual)
+        else:
+            np.testing.assert_allclose(expected, actual)
@@ -1,7 +1,9 @@
 import unittest
+from pathlib import Path
 
 import numpy as np
-from pycubexr.classes.metric_values import MetricValues
+from pycubexr import CubexParser
+from pycubexr.classes.metric_values import MetricValues, _exact_row_sums
 
 
 class TestOverflowDetection(unittest.TestCase):
@@ -55,3 +57,43 @@ class TestOverflowDetection(unittest.TestCase):
         self.assertSequenceEqual(
             list(range(np.iinfo(type_).max - 1000 + 100, np.iinfo(type_).max)) + [np.iinfo(type_).max] * 101,
             res.tolist())
+
+    def test_exact_row_sums_uint64(self):
+        type_ = np.uint64
+        matrix = np.array([[np.iinfo(type_).max] * 5, [1, 2, 3, 4, 5], [np.iinfo(type_).max, 1, 0, 0, 0]], dtype=type_)
+        self.assertEqual([sum(int(v) for v in row) for row in matrix], _exact_row_sums(matrix).tolist())
+        matrix = np.array([[np.iinfo(type_).max // 2, 3], [1, 2]], dtype=type_)
+        sums = _exact_row_sums(matrix)
+        self.assertEqual(type_, sums.dtype)
+        self.assertEqual([np.iinfo(type_).max // 2 + 3, 3], sums.tolist())
+
+    def test_exact_row_sums_int64(self):
+        type_ = np.int64
+        info = np.iinfo(type_)
+        matrix = np.array([[info.max] * 5, [info.min] * 5, [info.min, info.max, -1, 1, 0], [-5, 3, 2, 1, -100]],
+                          dtype=type_)
+        self.assertEqual([sum(int(v) for v in row) for row in matrix], _exact_row_sums(matrix).tolist())
+        sums = _exact_row_sums(matrix[2:])
+        self.assertEqual(type_, sums.dtype)
+        self.assertEqual([-1, -99], sums.tolist())
+
+    def test_reduce_locations_sum(self):
+        with CubexParser(Path("../data/blast.p64.r1/profile.cubex").resolve()) as cubex:
+            table = cubex.get_location_table()
+        info = np.iinfo(np.int64)
+        for values in [np.full((2, len(table)), info.max, dtype=np.int64),
+                       np.full((2, len(table)), np.iinfo(np.uint64).max, dtype=np.uint64),
+                       np.array([[info.min, info.max] * (len(table) // 2), [-5, 3] * (len(table) // 2)],
+                                dtype=np.int64),
+                       np.full((2, len(table)), np.iinfo(np.int16).max, dtype=np.int16)]:
+            with self.subTest(dtype=values.dtype):
+                expected = [[sum(int(v) for v in row[table.location_group_indices == group])
+                             for group in range(len(table.location_groups))] for row in values]
+                self.assertEqual(expected, table.reduce(values, 'location_group', 'sum').tolist())
+                self.assertEqual([[sum(row)] for row in expected], table.reduce(values, 0, 'sum').tolist())
+
+    def test_exact_row_sums_int16(self):
+        type_ = np.int16
+        matrix = np.array([[np.iinfo(type_).max] * 3, [np.iinfo(type_).min] * 3], dtype=type_)
+        self.assertEqual([3 * int(np.iinfo(type_).max), 3 * int(np.iinfo(type_).min)],
+                         _exact_row_sums(matrix).tolist())
@@ -0,0 +1,115 @@
+import gzip
+import io
+import tarfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from pycubexr import CubexParser
+from pycubexr.utils.exceptions import MissingMetricError
+
+from helpers import raw_values
+
+
+class Pipe(io.RawIOBase):
+    # a stream that cannot seek, like stdin
+    def __init__(self, data: bytes):
+        super().__init__()
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def position(self):
+        return self._data.tell()
+
+
+def anchor_first(cubex_file_path: Path) -> bytes:
+    # rewrites the archive with the anchor as the first member
+    output = io.BytesIO()
+    with tarfile.open(cubex_file_path) as source_file, tarfile.open(fileobj=output, mode='w') as target_file:
+        members = sorted(source_file.getmembers(), key=lambda member: member.name != 'anchor.xml')
+        for member in members:
+            target_file.addfile(member, source_file.extractfile(member))
+    return output.getvalue()
+
+
+class TestStreaming(unittest.TestCase):
+    cubex_file_path = Path("../data/blast.p64.r1/profile.cubex").resolve()
+
+    def assert_values_equal(self, cubex, streamed_values):
+        expected = cubex.get_metric_values(cubex.get_metric_by_name(streamed_values.metric.name))
+        self.assertEqual(expected.cnode_indices, streamed_values.cnode_indices)
+        np.testing.assert_array_equal(raw_values(expected.values), raw_values(streamed_values.values))
+
+    def test_all_metrics(self):
+        with CubexParser(self.cubex_file_path) as cubex:
+            expected_names = set()
+            for metric in cubex.get_metrics():
+                try:
+                    cubex.get_metric_values(metric)
+                    expected_names.add(metric.name)
+                except MissingMetricError:
+                    pass
+            streamed_names = set()
+            for metric_values in CubexParser.stream(self.cubex_file_path):
+                self.assert_values_equal(cubex, metric_values)
+                streamed_names.add(metric_values.metric.name)
+            self.assertEqual(expected_names, streamed_names)
+
+            # conversions use the call tree of the streamed anchor
+            metric_values = next(CubexParser.stream(self.cubex_file_path, ['time']))
+            expected = cubex.get_metric_values(cubex.get_metric_by_name('time'))
+            for cnode in cubex.all_cnodes():
+                self.assertAlmostEqual(expected.value(cnode, convert_to_inclusive=True),
+                                       metric_values.value(metric_values.call_tree.cnode(cnode.id),
+                                                           convert_to_inclusive=True))
+
+    def test_gzip_pipe(self):
+        pipe = Pipe(gzip.compress(self.cubex_file_path.read_bytes()))
+        with CubexParser(self.cubex_file_path) as cubex:
+            time_id = cubex.get_metric_by_name('time').id
+            streamed = list(CubexParser.stream(pipe, ['visits', time_id]))
+            self.assertEqual({'visits', 'time'}, {metric_values.metric.name for metric_values in streamed})
+            for metric_values in streamed:
+                self.assert_values_equal(cubex, metric_values)
+
+    def test_anchor_last(self):
+        with tarfile.open(self.cubex_file_path) as tar_file:
+            # the unmodified file, as written by Cube
+            self.assertEqual('anchor.xml', tar_file.getnames()[-1])
+        with CubexParser(self.cubex_file_path) as cubex:
+            time_id = cubex.get_metric_by_name('time').id
+            extracted = []
+            extractfile = tarfile.TarFile.extractfile
+
+            def recording_extractfile(tar_file, member, *args, **kwargs):
+                extracted.append(member.name)
+                return extractfile(tar_file, member, *args, **kwargs)
+
+            with mock.patch.object(tarfile.TarFile, 'extractfile', recording_extractfile):
+                streamed = list(CubexParser.stream(self.cubex_file_path, [time_id]))
+            # selected by id, only the members of the metric are buffered until the anchor is read
+            self.assertEqual(['{}.data'.format(time_id), '{}.index'.format(time_id), 'anchor.xml'], sorted(extracted))
+            self.assertEqual(1, len(streamed))
+            self.assert_values_equal(cubex, streamed[0])
+
+    def test_incremental(self):
+        archive = anchor_first(self.cubex_file_path)
+        pipe = Pipe(archive)
+        with CubexParser(self.cubex_file_path) as cubex:
+            metric_values = next(CubexParser.stream(pipe))
+            # the first metric is available before the whole archive is read
+            self.assertLess(pipe.position(), len(archive) // 2)
+            self.assert_values_equal(cubex, metric_values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,14 @@
+import io
+import struct
 import unittest
 from pathlib import Path
 
 from pycubexr import CubexParser
 from pycubexr.classes.metric import MetricType
-from pycubexr.utils.exceptions import MissingMetricError
+from pycubexr.parsers.data_parser import DATA_HEADER
+from pycubexr.parsers.index_parser import INDEX_HEADER
+from pycubexr.parsers.metrics_parser import extract_metric_values
+from pycubexr.utils.exceptions import MissingMetricError, CorruptIndexError
 
 
 class AbstractTestcase:
@@ -60,6 +65,7 @@ class AbstractTestcase:
             except MissingMetricError:
                 return
             self.assertEqual(len(cnode_indices), len(expected_mapping))
+            self.assertTrue(all(type(cid) is int for cid in cnode_indices))
             for index, cid, cname in expected_mapping:
                 self.assertEqual(cid, tree_index_to_cid_map[index])
                 # the following is only true for metrics that have data for all call paths
@@ -267,6 +273,14 @@ class TestProblematicCallTree(AbstractTestcase.Mapping):
 class TestBlast(AbstractTestcase.Mapping):
     path = "../data/blast.p64.r1/profile.cubex"
 
+    def test_invalid_tree_indices(self):
+        metric = self.cubex.get_metric_by_name('visits')
+        for tree_index in [-1, len(metric.tree_index_to_cid_map)]:
+            index_file = io.BytesIO(INDEX_HEADER + struct.pack('<ihbii', 1, 0, 0, 1, tree_index))
+            data_file = io.BytesIO(DATA_HEADER + bytes(8 * 64))
+            with self.subTest(tree_index=tree_index), self.assertRaises(CorruptIndexError):
+                extract_metric_values(metric=metric, index_file=index_file, data_file=data_file)
+
     expected_mapping_visits = [
         # index,cnode_id,cnode_mangled_name
         (0, 0, "PARALLEL"),